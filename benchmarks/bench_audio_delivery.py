@@ -0,0 +1,106 @@
+"""
+Бенчмарк отправки многофайлового аудио (аудиокнига, плейлист, сказка)
+
+Сравнивает последовательную подготовку (presign каждого файла, затем группа)
+с конвейером utils.media_pipeline: время до первого аудио и до последнего.
+S3 заменяется FakeS3Client, Telegram — заглушкой с задержкой отправки группы.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_audio_delivery --tracks 40 --runs 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Dict, List
+
+# Бакет и токен нужны только для импорта модулей бота, запросов к ним не будет
+os.environ.setdefault("S3_BUCKET", "bench")
+os.environ.setdefault("TOKEN", "123456:bench")
+
+from aiogram.types import InputMediaAudio  # noqa: E402
+
+from benchmarks.fake_s3 import FakeS3Client  # noqa: E402
+from utils import media_cache, media_pipeline, s3_service  # noqa: E402
+
+
+class FakeBot:
+    """Заглушка Telegram: группа отправляется за group_latency + per_file * файлов"""
+
+    def __init__(self, group_latency: float, per_file: float):
+        self.group_latency = group_latency
+        self.per_file = per_file
+        self.first_sent_at = None
+        self.last_sent_at = None
+
+    async def send_media_group(self, chat_id: int, media: List) -> List:
+        await asyncio.sleep(self.group_latency + self.per_file * len(media))
+        now = time.perf_counter()
+        self.first_sent_at = self.first_sent_at or now
+        self.last_sent_at = now
+        return []
+
+
+async def sequential(bot: FakeBot, prefix: str) -> None:
+    """Прежняя схема: файлы готовятся по одному, группа уходит после подготовки 10 файлов"""
+    group = []
+    async for file_info in media_pipeline.iter_files(prefix):
+        media = await media_cache.media_source(file_info['Key'], file_info.get('ETag'))
+        group.append(InputMediaAudio(media=media, title=file_info['Key'].split('/')[-1]))
+        if len(group) == 10:
+            await bot.send_media_group(chat_id=1, media=group)
+            group = []
+    if group:
+        await bot.send_media_group(chat_id=1, media=group)
+
+
+async def pipeline(bot: FakeBot, prefix: str) -> None:
+    await media_pipeline.deliver_audio(1, media_pipeline.iter_files(prefix), [])
+
+
+async def bench(mode, fake_bot_args: Dict, prefix: str, runs: int) -> Dict:
+    first: List[float] = []
+    total: List[float] = []
+    for _ in range(runs):
+        bot = FakeBot(**fake_bot_args)
+        media_pipeline.bot = bot
+        start = time.perf_counter()
+        await mode(bot, prefix)
+        first.append(bot.first_sent_at - start)
+        total.append(bot.last_sent_at - start)
+    return {"first": statistics.median(first) * 1000, "total": statistics.median(total) * 1000}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк отправки аудио группами")
+    parser.add_argument("--tracks", type=int, default=40, help="Файлов в папке")
+    parser.add_argument("--runs", type=int, default=10, help="Прогонов на режим")
+    parser.add_argument("--latency", type=float, default=0.02, help="Задержка вызова S3, сек")
+    parser.add_argument("--presign-latency", type=float, default=0.03,
+                        help="Время получения presigned URL (с очередью пула потоков), сек")
+    parser.add_argument("--group-latency", type=float, default=0.3, help="Отправка медиагруппы в Telegram, сек")
+    parser.add_argument("--per-file", type=float, default=0.02, help="Добавка за файл в группе, сек")
+    args = parser.parse_args()
+
+    fake = FakeS3Client(latency=args.latency, jitter=0.0, presign_latency=args.presign_latency)
+    prefix = "Контент/4-6/Аудиокниги/Бенчмарк/"
+    for i in range(args.tracks):
+        fake.put_object(f"{prefix}Глава {i:02d}.mp3", size=8_000_000)
+    s3_service.s3_client = fake
+    # Кэш file_id пуст: каждый файл требует presigned URL
+    media_cache.get_file_id = lambda key, etag: None
+
+    fake_bot_args = {"group_latency": args.group_latency, "per_file": args.per_file}
+    print(f"{args.tracks} файлов, presign {args.presign_latency * 1000:.0f} мс, "
+          f"группа {args.group_latency * 1000:.0f} мс + {args.per_file * 1000:.0f} мс/файл\n")
+    header = f"{'режим':<12} {'до 1-го аудио мс':>17} {'до последнего мс':>17}"
+    print(header)
+    print("-" * len(header))
+    for name, mode in (("sequential", sequential), ("pipeline", pipeline)):
+        row = await bench(mode, fake_bot_args, prefix, args.runs)
+        print(f"{name:<12} {row['first']:>17.0f} {row['total']:>17.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""
+Бенчмарк времени до подтверждения нажатия кнопки (answerCallbackQuery)
+
+Обработчики повторяют поведение бота: часть отвечает на нажатие после
+обращения к S3 и базе, часть — в начале, часть не отвечает вовсе, часть
+показывает уведомление или alert после загрузки. Задержка бэкенда случайная
+(--latency, --jitter). Строка plain — без middleware, ack — с
+middlewares.callback_ack.CallbackAckMiddleware. Время до подтверждения
+считается от передачи обновления в Dispatcher до answerCallbackQuery в
+сессии без сети; «без ответа» — нажатия, на которые бот не ответил (в
+Telegram часики на кнопке висят до тайм-аута); «сообщений» — поздние alert,
+доставленные сообщением (поздние уведомления отбрасываются).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_callback_ack --updates 2000 --latency 0.4 --jitter 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from typing import Dict, List
+
+# Токен нужен только для импорта модулей бота
+os.environ.setdefault("TOKEN", "123456:bench")
+
+from aiogram import Bot, Dispatcher, Router  # noqa: E402
+from aiogram.methods import AnswerCallbackQuery, SendMessage  # noqa: E402
+from aiogram.types import CallbackQuery, Update  # noqa: E402
+
+from benchmarks.fake_telegram import OfflineSession  # noqa: E402
+from middlewares.callback_ack import CallbackAckMiddleware  # noqa: E402
+
+TOKEN = "123456:bench"
+# Вид обработчика и его доля в потоке нажатий
+KINDS = [("answer_after_work", 5), ("answer_first", 2), ("no_answer", 2), ("alert_after_work", 1),
+         ("toast_after_work", 1)]
+
+
+def make_router(rnd: random.Random, latency: float, jitter: float) -> Router:
+    router = Router()
+
+    async def backend() -> None:
+        await asyncio.sleep(max(0.0, latency + rnd.uniform(-jitter, jitter)))
+
+    @router.callback_query()
+    async def handler(query: CallbackQuery) -> None:
+        if query.data == "answer_first":
+            await query.answer()
+            await backend()
+        elif query.data == "answer_after_work":
+            await backend()
+            await query.answer()
+        elif query.data == "alert_after_work":
+            await backend()
+            await query.answer("Категория пуста.", show_alert=True)
+        elif query.data == "toast_after_work":
+            await backend()
+            await query.answer("Загружено")
+        else:
+            await backend()
+
+    return router
+
+
+def make_updates(count: int, rnd: random.Random) -> List[Dict]:
+    kinds = [kind for kind, _ in KINDS]
+    weights = [weight for _, weight in KINDS]
+    updates = []
+    for update_id, kind in enumerate(rnd.choices(kinds, weights, k=count), start=1):
+        user = {"id": 10_000 + update_id, "is_bot": False, "first_name": "Аня"}
+        updates.append({"update_id": update_id, "callback_query": {
+            "id": str(update_id), "from": user, "chat_instance": "1", "data": kind,
+            "message": {"message_id": 1, "date": 0, "chat": {"id": user["id"], "type": "private"}, "text": "x"},
+        }})
+    return updates
+
+
+async def run(updates: List[Dict], args, with_ack: bool) -> Dict:
+    session = OfflineSession()
+    bot = Bot(TOKEN, session=session)
+    dp = Dispatcher()
+    dp.include_router(make_router(random.Random(7), args.latency, args.jitter))
+    if with_ack:
+        ack = CallbackAckMiddleware(delay=args.delay)
+        session.middleware(ack.intercept)
+        dp.callback_query.outer_middleware(ack)
+
+    started: Dict[str, float] = {}
+
+    async def feed(update: Update, delay: float) -> None:
+        await asyncio.sleep(delay)
+        started[update.callback_query.id] = time.monotonic()
+        await dp.feed_update(bot, update)
+
+    parsed = [Update.model_validate(data, context={"bot": bot}) for data in updates]
+    # Нажатия приходят равномерно за секунду на каждые args.rate обновлений
+    await asyncio.gather(*(feed(update, i / args.rate) for i, update in enumerate(parsed)))
+
+    acked = {method.callback_query_id: at for at, method in session.requests
+             if isinstance(method, AnswerCallbackQuery)}
+    waits = sorted(acked[query_id] - start for query_id, start in started.items() if query_id in acked)
+    return {
+        "p50": statistics.median(waits) * 1000,
+        "p99": waits[int(len(waits) * 0.99) - 1] * 1000,
+        "unanswered": len(started) - len(acked),
+        "messages": sum(isinstance(method, SendMessage) for _, method in session.requests),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Время до подтверждения нажатия кнопки")
+    parser.add_argument("--updates", type=int, default=2000, help="Нажатий")
+    parser.add_argument("--rate", type=float, default=500, help="Нажатий в секунду")
+    parser.add_argument("--latency", type=float, default=0.4, help="Средняя задержка S3 и базы в обработчике, сек")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Разброс задержки, сек")
+    parser.add_argument("--delay", type=float, default=0.1, help="CALLBACK_ACK_DELAY, сек")
+    args = parser.parse_args()
+
+    updates = make_updates(args.updates, random.Random(42))
+    header = f"{'режим':<6} {'p50 мс':>8} {'p99 мс':>8} {'без ответа':>11} {'сообщений':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, with_ack in (("plain", False), ("ack", True)):
+        row = await run(updates, args, with_ack)
+        print(f"{name:<6} {row['p50']:>8.1f} {row['p99']:>8.1f} {row['unanswered']:>11} {row['messages']:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
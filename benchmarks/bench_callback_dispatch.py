@@ -0,0 +1,131 @@
+"""
+Бенчмарк маршрутизации нажатий кнопок (callback_query)
+
+Строится копия роутеров бота из handlers.routers: те же вложенность,
+порядок и фильтры, но обработчики пустые, поэтому замеряется только путь
+обновления через Dispatcher. Строка linear — обычный обход aiogram по всем
+роутерам, index — utils.callback_routing.CallbackIndex. Нажатия берутся
+из типичной смеси кнопок меню, списков, пагинации и админки.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_callback_dispatch --updates 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Dict, List, Tuple
+
+# Токен и бакет нужны только для импорта модулей бота
+os.environ.setdefault("S3_BUCKET", "bench")
+os.environ.setdefault("TOKEN", "123456:bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from aiogram import Bot, Dispatcher, Router  # noqa: E402
+from aiogram.types import CallbackQuery, Update  # noqa: E402
+
+TOKEN = "123456:bench"
+
+# callback_data и их доля в потоке нажатий
+CALLBACKS = [
+    ("menu_music", 8), ("menu_cartoons", 8), ("menu_fairy_tales", 6), ("menu_books", 4), ("menu_useful", 4),
+    ("checkmusic_6dcod5jkcw_4-6", 10), ("checkmult_lzzc2txtvt_4-6", 10), ("checkfairy_abcdefghij_0-3", 6),
+    ("checkbook_abcdefghij_7-10", 4), ("checkuseful_abcdefghij_4-6", 4), ("listen_abcdefghij_7-10", 2),
+    ("mult_next", 8), ("mult_prev", 3), ("content_next", 3), ("back_to_main", 8), ("select_age_4-6", 2),
+    ("change_age", 1), ("support", 1), ("subscription", 1), ("require_subscription", 1), ("ai_assistant", 1),
+    ("game_english_1", 1), ("back_to_eng", 1), ("admin_panel", 1), ("admin_stat", 1), ("toggle_lock_3", 1),
+]
+
+
+def mirror(source: Router, calls: List[str]) -> Router:
+    """Копия роутера с теми же фильтрами и флагами, обработчик только отмечает вызов"""
+    router = Router(name=source.name)
+    for handler in source.callback_query.handlers:
+        name = handler.callback.__name__
+
+        async def noop(query: CallbackQuery, name: str = name) -> None:
+            calls.append(name)
+
+        filters = [f.magic or f.callback for f in handler.filters or ()]
+        router.callback_query.register(noop, *filters, flags=handler.flags)
+    for sub_router in source.sub_routers:
+        router.include_router(mirror(sub_router, calls))
+    return router
+
+
+def make_updates(count: int) -> List[Dict]:
+    rnd = random.Random(42)
+    values = [data for data, _ in CALLBACKS]
+    weights = [weight for _, weight in CALLBACKS]
+    updates = []
+    for update_id, data in enumerate(rnd.choices(values, weights, k=count), start=1):
+        user = {"id": 10_000 + update_id % 500, "is_bot": False, "first_name": "Аня"}
+        updates.append({
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": user,
+                "chat_instance": "1",
+                "data": data,
+                "message": {"message_id": 1, "date": 0, "chat": {"id": user["id"], "type": "private"}, "text": "x"},
+            },
+        })
+    return updates
+
+
+async def run(source: Dispatcher, updates: List[Dict], index: bool) -> Tuple[float, List[str]]:
+    calls: List[str] = []
+    dp = Dispatcher()
+    for sub_router in source.sub_routers:
+        dp.include_router(mirror(sub_router, calls))
+
+    if index:
+        from utils.callback_routing import CallbackIndex
+        callback_index = CallbackIndex()
+        callback_index.compile(dp)
+        dp.callback_query.outer_middleware(callback_index)
+
+    bot = Bot(TOKEN)
+    parsed = [Update.model_validate(data, context={"bot": bot}) for data in updates]
+    for update in parsed[:200]:
+        await dp.feed_update(bot, update)
+
+    start = time.perf_counter()
+    for update in parsed:
+        await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - start
+    await bot.session.close()
+
+    # Обработчики у кнопок из смеси должны найтись в обоих режимах
+    assert len(calls) == len(parsed) + 200, f"unhandled updates: {len(parsed) + 200 - len(calls)}"
+    return elapsed / len(parsed) * 1e6, calls
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк маршрутизации callback_query")
+    parser.add_argument("--updates", type=int, default=20000, help="Нажатий на замер")
+    parser.add_argument("--linear-only", action="store_true", help="Только обычный обход (для дерева без индекса)")
+    args = parser.parse_args()
+
+    from handlers.routers import setup_routers
+    source = Dispatcher()
+    setup_routers(source)
+
+    updates = make_updates(args.updates)
+    print(f"{args.updates} нажатий, {len(CALLBACKS)} видов callback_data\n")
+    header = f"{'режим':<8} {'мкс/обновление':>15}"
+    print(header)
+    print("-" * len(header))
+    modes = (("linear", False),) if args.linear_only else (("linear", False), ("index", True))
+    handled = []
+    for name, index in modes:
+        per_update, calls = await run(source, updates, index)
+        handled.append(calls)
+        print(f"{name:<8} {per_update:>15.1f}")
+    # Индекс должен выбирать те же обработчики, что и обычный обход
+    assert all(calls == handled[0] for calls in handled), "index picked different handlers"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""
+Бенчмарк памяти FSM-хранилища на активных пользователей
+
+Каждый пользователь открыл список музыки и мультик с сериями — типичное
+состояние бота. Строка memory — MemoryStorage с прежним содержимым состояния
+(объекты файлов с presigned URL), memory-refs — MemoryStorage с именами файлов
+вместо объектов, sqlite — utils.fsm_storage.SQLiteStorage с именами файлов.
+Каждый вариант замеряется в отдельном процессе: прирост RSS после заполнения,
+размер файла базы и время update_data + get_data на одно нажатие.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_fsm_storage --users 10000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Dict
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from utils.fsm_storage import SQLiteStorage
+
+BOT_ID = 123456
+EPISODES = 12
+SONGS = 30
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def presigned_url(key: str) -> str:
+    # Длина и вид URL с подписью SigV4, как у generate_presigned_url
+    return (f"https://s3.example.com/bucket/{key}?X-Amz-Algorithm=AWS4-HMAC-SHA256"
+            f"&X-Amz-Credential=AKIAEXAMPLEKEY%2F20260101%2Fru-central1%2Fs3%2Faws4_request"
+            f"&X-Amz-Date=20260101T000000Z&X-Amz-Expires=3600&X-Amz-SignedHeaders=host"
+            f"&X-Amz-Signature={'0123456789abcdef' * 4}")
+
+
+def user_state(user_id: int, compact: bool) -> Dict:
+    path = f"Контент/4-6/Мультики/Мультик {user_id % 300}"
+    names = [f"Серия {i + 1}.mp4" for i in range(EPISODES)]
+    if compact:
+        files = names
+    else:
+        # Прежний формат get_url: отдельный класс на каждый файл
+        files = [
+            type('Obj', (object,), {
+                "type": "file", "name": name, "file": presigned_url(f"{path}/{name}"),
+                "key": f"{path}/{name}", "etag": f'"{user_id:032x}"'
+            })
+            for name in names
+        ]
+    return {
+        "type_age": "4-6",
+        "message_to_delete": 100000 + user_id,
+        "music_item_names": tuple(f"Песенка {i}" for i in range(SONGS)),
+        "mult_files": files,
+        "mult_index": 0,
+        "mult_name": f"Мультик {user_id % 300}",
+        "mult_type": "4-6",
+        "mult_path": path,
+        "mult_poster_source": (f"{path}/poster.jpg", f'"{user_id:032x}"'),
+    }
+
+
+async def measure(kind: str, users: int, db_file: str) -> Dict:
+    storage = SQLiteStorage(db_file) if kind == "sqlite" else MemoryStorage()
+    keys = [StorageKey(bot_id=BOT_ID, chat_id=user_id, user_id=user_id) for user_id in range(users)]
+
+    before = rss_kb()
+    for user_id, key in enumerate(keys):
+        await storage.set_state(key, "Content:viewing")
+        await storage.set_data(key, user_state(user_id, compact=kind != "memory"))
+    after = rss_kb()
+
+    # Нажатие «След. ➡️»: обновить индекс и прочитать состояние для показа
+    start = time.perf_counter()
+    for key in keys:
+        await storage.update_data(key, {"mult_index": 1})
+        await storage.get_data(key)
+    per_op = (time.perf_counter() - start) / users * 1e6
+
+    await storage.close()
+    return {
+        "rss": (after - before) / 1024,
+        "disk": os.path.getsize(db_file) / 1024 / 1024 if kind == "sqlite" else 0.0,
+        "op_us": per_op,
+    }
+
+
+def run(kind: str, users: int, db_file: str, results) -> None:
+    results.put((kind, asyncio.run(measure(kind, users, db_file))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Память FSM-хранилища на активных пользователей")
+    parser.add_argument("--users", type=int, default=10000, help="Активных пользователей")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    print(f"{args.users} пользователей с открытым мультиком ({EPISODES} серий) и списком музыки ({SONGS})\n")
+    header = f"{'хранилище':<12} {'RSS МБ':>8} {'диск МБ':>8} {'мкс/нажатие':>12}"
+    print(header)
+    print("-" * len(header))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in ("memory", "memory-refs", "sqlite"):
+            process = context.Process(target=run, args=(kind, args.users, os.path.join(tmp, "fsm.db"), results))
+            process.start()
+            _, row = results.get()
+            process.join()
+            print(f"{kind:<12} {row['rss']:>8.1f} {row['disk']:>8.1f} {row['op_us']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
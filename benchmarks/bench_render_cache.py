@@ -0,0 +1,199 @@
+"""
+Бенчмарк вызовов Bot API на переходы между экранами
+
+Пользователи нажимают кнопки настоящего Dispatcher бота (configure_dispatcher):
+кнопка берется из клавиатуры последнего показанного экрана, как в клиенте
+Telegram. В сценарии есть повторные нажатия (двойной тап, нажатие на уже
+открытую тему, «назад» на главном меню) и листание серий мультика с одним
+постером. Telegram заменяется сессией без сети, S3 — FakeS3Client, база и
+FSM-хранилище создаются во временной папке.
+
+Сессия проверяет правки как Telegram («message is not modified», текст в
+медиа-сообщении). Режим по умолчанию — с кэшем MessageRenderer, --nocache —
+тот же код с выключенным кэшем (maxsize=0): каждый показ экрана становится
+попыткой правки. Для сравнения с деревом до MessageRenderer достаточно
+запустить скрипт на нем (строка «сэкономлено» тогда не печатается).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_render_cache --users 50
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Токен и бакет нужны только для импорта модулей бота
+os.environ.setdefault("S3_BUCKET", "bench")
+os.environ.setdefault("TOKEN", "123456:bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+# Ограничитель тяжелых операций не должен отклонять нажатия бенчмарка
+os.environ.setdefault("USER_RATE", "1000000")
+os.environ.setdefault("USER_BURST", "1000000")
+
+from aiogram.methods import AnswerCallbackQuery, DeleteMessage, GetMe  # noqa: E402
+from aiogram.types import InlineKeyboardMarkup, Update  # noqa: E402
+from prometheus_client import REGISTRY  # noqa: E402
+
+from benchmarks.fake_telegram import OfflineSession  # noqa: E402
+
+# Сценарий: (шаг, кнопка). Кнопка — callback_data или начало текста кнопки
+# текущего экрана; «again» — повторное нажатие на тот же экран до его смены
+SCENARIO = [
+    ("/start", "/start"),
+    ("useful", "menu_useful"),
+    ("useful x2", "again"),
+    ("topic", "Тема 0"),
+    ("topic x2", "again"),
+    ("topics", "menu_useful"),
+    ("topic again", "Тема 0"),
+    ("topics again", "menu_useful"),
+    ("main", "back_to_main"),
+    ("main x2", "again"),
+    ("cartoons", "menu_cartoons"),
+    ("cartoon", "Мультик 0"),
+    ("next", "mult_next"),
+    ("next x2", "again"),
+    ("prev", "mult_prev"),
+    ("age", "change_age"),
+    ("same age", "select_age_4-6"),
+]
+
+
+class Screen:
+    """Последний экран пользователя: сообщение и его клавиатура"""
+
+    def __init__(self):
+        self.message_id = 0
+        self.markup: Optional[InlineKeyboardMarkup] = None
+
+    def find(self, label: str) -> str:
+        for row in self.markup.inline_keyboard if self.markup else []:
+            for button in row:
+                if button.callback_data and (button.callback_data == label or button.text.startswith(label)):
+                    return button.callback_data
+        return label
+
+
+def make_update(update_id: int, user_id: int, data: str, message_id: int) -> Dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "Аня"}
+    chat = {"id": user_id, "type": "private"}
+    if data.startswith("/"):
+        return {"update_id": update_id, "message": {
+            "message_id": update_id, "date": 0, "chat": chat, "from": user, "text": data,
+        }}
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": user, "chat_instance": "1", "data": data,
+        "message": {"message_id": message_id, "date": 0, "chat": chat, "text": "x"},
+    }}
+
+
+def saved_calls() -> Dict[str, float]:
+    saved = {}
+    for metric in REGISTRY.collect():
+        if metric.name == "tg_render_calls_saved":
+            for sample in metric.samples:
+                if sample.name.endswith("_total"):
+                    saved[sample.labels["screen"]] = sample.value
+    return saved
+
+
+async def run(users: int, cache: bool) -> Tuple[Dict[str, List[int]], Counter, Dict[str, float]]:
+    import main
+    from benchmarks.fake_s3 import FakeS3Client
+    from database.database import db
+    from utils import library, s3_service
+    from utils.send_gateway import send_gateway
+    try:
+        from utils.renderer import renderer
+    except ImportError:
+        # Дерево до MessageRenderer: строка «до» для сравнения
+        renderer = None
+
+    logging.disable(logging.WARNING)
+    client = FakeS3Client(latency=0, jitter=0)
+    client.seed_catalog()
+    s3_service.s3_client = client
+    session = OfflineSession()
+    library.bot.session = session
+    main.configure_dispatcher()
+    # Лимиты скорости Telegram к сессии без сети не относятся
+    send_gateway.set_rate(1e9)
+    send_gateway.chat_rate, send_gateway.chat_burst = 1e9, 10 ** 6
+    if renderer is not None and not cache:
+        renderer.maxsize = 0
+    bot, dp = library.bot, library.dp
+
+    for user_id in range(1, users + 1):
+        db.add_user(user_id, f"user{user_id}", "Аня")
+        db.set_user_age(user_id, "4-6")
+
+    calls: Dict[str, List[int]] = defaultdict(list)
+    methods: Counter = Counter()
+    screens = {user_id: Screen() for user_id in range(1, users + 1)}
+    update_id = 0
+    for user_id, screen in screens.items():
+        previous = None
+        for step, label in SCENARIO:
+            data, message_id = previous if label == "again" else (screen.find(label), screen.message_id)
+            previous = data, message_id
+            update_id += 1
+            update = Update.model_validate(make_update(update_id, user_id, data, message_id), context={"bot": bot})
+            first = len(session.requests)
+            await dp.feed_update(bot, update)
+
+            count = 0
+            for number, (_, method) in enumerate(session.requests[first:], start=first + 1):
+                # Подтверждение нажатия и getMe не зависят от кэша
+                if isinstance(method, (AnswerCallbackQuery, GetMe)):
+                    continue
+                count += 1
+                methods[type(method).__name__] += 1
+                markup = getattr(method, "reply_markup", None)
+                if isinstance(markup, InlineKeyboardMarkup):
+                    screen.message_id = getattr(method, "message_id", None) or number
+                    screen.markup = markup
+                elif isinstance(method, DeleteMessage) and method.message_id == screen.message_id:
+                    screen.markup = None
+            calls[step].append(count)
+    return calls, methods, saved_calls()
+
+
+async def amain() -> None:
+    parser = argparse.ArgumentParser(description="Вызовы Bot API на переходы между экранами")
+    parser.add_argument("--users", type=int, default=50, help="Пользователей, проходящих сценарий")
+    parser.add_argument("--nocache", action="store_true", help="Выключить кэш MessageRenderer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Database и FSM-хранилище открывают bot_database.db в текущей папке
+        os.chdir(tmp)
+        calls, methods, saved = await run(args.users, not args.nocache)
+
+    print(f"режим: {'nocache' if args.nocache else 'cache'}, пользователей: {args.users}\n")
+    header = f"{'шаг':<14} {'вызовов API':>12}"
+    print(header)
+    print("-" * len(header))
+    steps = []
+    for step, _ in SCENARIO:
+        if step not in steps:
+            steps.append(step)
+    total = 0
+    for step in steps:
+        values = calls[step]
+        total += sum(values)
+        print(f"{step:<14} {sum(values) / args.users:>12.2f}")
+    print(f"\nвсего {total / args.users:.2f} вызовов на сценарий из {len(SCENARIO)} шагов")
+    print("по методам: " + ", ".join(f"{name} {count / args.users:.2f}" for name, count in methods.most_common()))
+    if saved:
+        print("сэкономлено по экранам: " + ", ".join(f"{screen} {value / args.users:.2f}"
+                                                   for screen, value in sorted(saved.items())))
+
+
+if __name__ == "__main__":
+    asyncio.run(amain())
@@ -0,0 +1,147 @@
+"""
+Бенчмарк экранов каталога на локальной замене S3
+
+Подменяет s3_client в utils/s3_service.py на FakeS3Client и замеряет функции,
+из которых собираются экраны бота: задержку p50/p99 и число вызовов S3 на экран.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_s3_screens --runs 50 --latency 0.02 --jitter 0.01
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List
+
+# Бакет нужен только для параметров вызовов, фейковый клиент его не проверяет
+os.environ.setdefault("S3_BUCKET", "bench")
+# Токен нужен только для импорта обработчиков, запросов к Telegram не будет
+os.environ.setdefault("TOKEN", "123456:bench")
+# Ключ OpenAI проверяется при импорте обработчиков ИИ, запросов к нему не будет
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from benchmarks.fake_s3 import AGE_GROUPS, FakeS3Client  # noqa: E402
+from utils import s3_service  # noqa: E402
+from utils.category_lists import category_lists  # noqa: E402
+from utils.media_pipeline import iter_files  # noqa: E402
+# Импорт обработчиков регистрирует отрисовку их списков
+from handlers.categories.audio_book import is_audio_file  # noqa: E402
+import handlers.categories.cartoons  # noqa: E402,F401
+import handlers.categories.fairy_tales  # noqa: E402,F401
+import handlers.categories.music  # noqa: E402,F401
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def open_useful_topic(path: str) -> List:
+    """Листинг темы и URL только для показанного файла"""
+    items = await s3_service.list_tree(path)
+    files = [item for item in items if item.type == 'file']
+    if files:
+        await s3_service.generate_presigned_url(f"{path}/{files[0].name}")
+    return items
+
+
+async def list_book(path: str) -> List[Dict]:
+    """Главы книги в порядке, в котором их получает deliver_audio"""
+    return [file_info async for file_info in iter_files(path, is_audio_file)]
+
+
+def build_screens(age: str) -> Dict[str, Callable[[], Awaitable]]:
+    """Экраны бота и вызовы S3, из которых они собираются"""
+    root = f"Контент/{age}"
+    return {
+        # useful.show_useful_categories / other_category
+        "useful_categories": lambda: s3_service.get_files_useful(f"{root}/Полезное", age, "useful_"),
+        # useful.check_useful_category (папки нет в дереве доступа) / show_useful_content
+        "useful_topic": lambda: open_useful_topic(f"{root}/Полезное/Тема 0"),
+        # useful.other_category / admin_categories.show_folder_contents (замки по подпапкам)
+        "useful_tree": lambda: s3_service.list_tree(f"{root}/Полезное", depth=2),
+        # Списки разделов без кэша (прежняя схема: листинг S3 на каждое нажатие)
+        "music_list": lambda: s3_service.get_files(f"{root}/Музыка", age, "checkmusic_"),
+        "fairy_list": lambda: s3_service.get_files(f"{root}/Сказки", age, "checkfairy_"),
+        "books_list": lambda: s3_service.get_files(f"{root}/Аудиокниги", age, "checkbook_"),
+        # music.send_music / fairy_tales.send_fairy / audio_book.send_book / cartoons.handle_cartoons
+        "music_cached": lambda: category_lists.get("music", age),
+        "fairy_cached": lambda: category_lists.get("fairy", age),
+        "books_cached": lambda: category_lists.get("books", age),
+        "cartoons_cached": lambda: category_lists.get("cartoons", age),
+        # audio_book.handle_book_selection: листинг глав для конвейера deliver_audio
+        "book_open": lambda: list_book(f"{root}/Аудиокниги/Книга 0"),
+        # music.handle_music_selection
+        "playlist_open": lambda: s3_service.get_folder_contents(f"{root}/Музыка/Плейлист 0"),
+        # cartoons.check_mult: имена и ETag серий, URL подписывается только для показанной (show_mult)
+        "cartoon_open": lambda: s3_service.list_tree(f"{root}/Мультики/Мультик 0"),
+    }
+
+
+async def bench_screen(fake: FakeS3Client, factory: Callable[[], Awaitable], runs: int,
+                       concurrency: int) -> Dict:
+    """Прогоняет экран runs раз с заданным числом одновременных пользователей"""
+    latencies: List[float] = []
+    calls = Counter()
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            result = await factory()
+            latencies.append(time.perf_counter() - start)
+            if not result or result == ([], []):
+                failures += 1
+
+    fake.reset_calls()
+    await asyncio.gather(*(one() for _ in range(runs)))
+    calls.update(fake.calls)
+
+    return {
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "mean": statistics.mean(latencies) * 1000,
+        "list_calls": calls["list_objects_v2"] / runs,
+        "get_calls": calls["get_object"] / runs,
+        "presign": calls["presign"] / runs,
+        "failures": failures,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк экранов каталога на фейковом S3")
+    parser.add_argument("--runs", type=int, default=50, help="Прогонов на экран")
+    parser.add_argument("--concurrency", type=int, default=10, help="Одновременных пользователей")
+    parser.add_argument("--latency", type=float, default=0.02, help="Задержка вызова S3, сек")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Разброс задержки, сек")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля вызовов с ошибкой")
+    parser.add_argument("--age", default=AGE_GROUPS[1], choices=AGE_GROUPS)
+    parser.add_argument("--screen", action="append", help="Замерить только указанные экраны")
+    args = parser.parse_args()
+
+    fake = FakeS3Client(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    total = fake.seed_catalog()
+    s3_service.s3_client = fake
+
+    print(f"Объектов в каталоге: {total}; задержка {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} мс, "
+          f"ошибки {args.error_rate:.0%}, {args.runs} прогонов x {args.concurrency} параллельно\n")
+    header = f"{'экран':<18} {'p50 мс':>8} {'p99 мс':>8} {'list/экр':>9} {'get/экр':>8} {'presign':>8} {'сбоев':>6}"
+    print(header)
+    print("-" * len(header))
+
+    for name, factory in build_screens(args.age).items():
+        if args.screen and name not in args.screen:
+            continue
+        row = await bench_screen(fake, factory, args.runs, args.concurrency)
+        print(f"{name:<18} {row['p50']:>8.1f} {row['p99']:>8.1f} {row['list_calls']:>9.1f} "
+              f"{row['get_calls']:>8.1f} {row['presign']:>8.1f} {row['failures']:>6}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+"""
+Микробенчмарк статических экранов
+
+Для каждого зарегистрированного экрана и варианта сравнивает прежнюю схему
+(построитель вызывается на каждое обновление) с получением готового
+экземпляра из реестра utils.screens.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_screens --number 20000
+"""
+import argparse
+import os
+import timeit
+
+# Токен и ключ OpenAI нужны только для импорта модулей бота, запросов к Telegram и OpenAI не будет
+os.environ.setdefault("S3_BUCKET", "bench")
+os.environ.setdefault("TOKEN", "123456:bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+# Импорт обработчиков регистрирует их экраны
+import handlers.admin_panel.admin_panel  # noqa: E402,F401
+import handlers.categories.english  # noqa: E402,F401
+import handlers.categories.games  # noqa: E402,F401
+import handlers.categories.support  # noqa: E402,F401
+import handlers.common  # noqa: E402,F401
+from utils.screens import screens  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк статических экранов")
+    parser.add_argument("--number", type=int, default=20000, help="Вызовов на замер")
+    parser.add_argument("--repeat", type=int, default=5, help="Замеров, берется лучший")
+    args = parser.parse_args()
+
+    print(f"Построено экранов: {screens.build_all()}\n")
+    header = f"{'экран':<28} {'сборка мкс':>11} {'реестр мкс':>11} {'ускорение':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, builder in screens._builders.items():
+        for variant in screens._variants[name]:
+            build = min(timeit.repeat(lambda: builder(*variant), number=args.number, repeat=args.repeat))
+            cached = min(timeit.repeat(lambda: screens.get(name, *variant), number=args.number, repeat=args.repeat))
+            build_us = build / args.number * 1e6
+            cached_us = cached / args.number * 1e6
+            label = f"{name}{list(variant) if variant else ''}"
+            print(f"{label:<28} {build_us:>11.2f} {cached_us:>11.3f} {build_us / cached_us:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Бенчмарк задержки обновлений: polling против webhook
+
+Telegram заменяется локальным aiohttp-сервером с задержкой сети (rtt):
+в режиме polling бот получает обновления длинными запросами getUpdates,
+в режиме webhook «Telegram» отправляет каждое обновление POST-запросом
+на маршрут WebhookServer. Замеряется время от появления обновления
+до начала обработчика.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_update_latency --updates 300 --rate 50 --rtt 0.06
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+# Токен и бакет нужны только для импорта модулей бота
+os.environ.setdefault("S3_BUCKET", "bench")
+os.environ.setdefault("TOKEN", "123456:bench")
+
+from aiohttp import ClientSession, web  # noqa: E402
+from aiogram import Bot, Dispatcher, Router  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+from aiogram.types import Message  # noqa: E402
+
+from payments.webhook_server import WebhookServer  # noqa: E402
+
+TOKEN = "123456:bench"
+SECRET = "bench-secret"
+API_PORT = 18081
+WEBHOOK_PORT = 18082
+
+
+class FakeTelegram:
+    """Сервер Bot API: getMe и длинный getUpdates с задержкой сети в каждую сторону"""
+
+    def __init__(self, one_way: float):
+        self.one_way = one_way
+        self.updates: List[Dict] = []
+        self.arrived = asyncio.Event()
+
+    def push(self, update: Dict) -> None:
+        self.updates.append(update)
+        self.arrived.set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = await request.post()
+        await asyncio.sleep(self.one_way)
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        elif method == "getUpdates":
+            result = await self.get_updates(int(data.get("offset") or 0), float(data.get("timeout") or 0))
+        else:
+            result = True
+        await asyncio.sleep(self.one_way)
+        return web.json_response({"ok": True, "result": result})
+
+    async def get_updates(self, offset: int, timeout: float) -> List[Dict]:
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates:
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        return self.updates[:100]
+
+
+def make_update(update_id: int) -> Dict:
+    user = {"id": 1000 + update_id % 50, "is_bot": False, "first_name": "user"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user["id"], "type": "private"},
+            "from": user,
+            "text": "ping",
+        },
+    }
+
+
+def make_dispatcher(created: Dict[int, float], latencies: List[float], total: int, done: asyncio.Event) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message) -> None:
+        latencies.append(time.perf_counter() - created[message.message_id])
+        if len(latencies) == total:
+            done.set()
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def produce(count: int, rate: float, created: Dict[int, float], deliver) -> None:
+    for update_id in range(1, count + 1):
+        created[update_id] = time.perf_counter()
+        deliver(make_update(update_id))
+        await asyncio.sleep(1 / rate)
+
+
+async def run_polling(args, telegram: FakeTelegram) -> List[float]:
+    created: Dict[int, float] = {}
+    latencies: List[float] = []
+    done = asyncio.Event()
+    dp = make_dispatcher(created, latencies, args.updates, done)
+    bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{API_PORT}")))
+
+    polling = asyncio.create_task(dp.start_polling(bot, polling_timeout=10, handle_signals=False))
+    await asyncio.sleep(0.5)
+    await produce(args.updates, args.rate, created, telegram.push)
+    await asyncio.wait_for(done.wait(), timeout=60)
+    await dp.stop_polling()
+    await polling
+    await bot.session.close()
+    return latencies
+
+
+async def run_webhook(args) -> List[float]:
+    created: Dict[int, float] = {}
+    latencies: List[float] = []
+    done = asyncio.Event()
+    dp = make_dispatcher(created, latencies, args.updates, done)
+    bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{API_PORT}")))
+
+    server = WebhookServer(
+        bot=bot, db=None, payment_handler=SimpleNamespace(return_url=None), dp=dp,
+        host="127.0.0.1", port=WEBHOOK_PORT, telegram_path="/telegram-webhook", telegram_secret=SECRET
+    )
+    await server.start()
+
+    url = f"http://127.0.0.1:{WEBHOOK_PORT}/telegram-webhook"
+    connections = asyncio.Semaphore(args.max_connections)
+    tasks = []
+
+    async with ClientSession() as session:
+        async def post(update: Dict) -> None:
+            async with connections:
+                await asyncio.sleep(args.rtt / 2)
+                async with session.post(url, json=update,
+                                        headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as response:
+                    await response.read()
+
+        await produce(args.updates, args.rate, created,
+                      lambda update: tasks.append(asyncio.create_task(post(update))))
+        await asyncio.gather(*tasks)
+        await asyncio.wait_for(done.wait(), timeout=60)
+
+    await bot.session.close()
+    return latencies
+
+
+def summary(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+
+    def pct(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] * 1000
+
+    return {"p50": statistics.median(ordered) * 1000, "p95": pct(95), "p99": pct(99), "max": ordered[-1] * 1000}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк задержки обновлений: polling и webhook")
+    parser.add_argument("--updates", type=int, default=300, help="Обновлений на режим")
+    parser.add_argument("--rate", type=float, default=50, help="Обновлений в секунду")
+    parser.add_argument("--rtt", type=float, default=0.06, help="Время сети туда и обратно до Telegram, сек")
+    parser.add_argument("--max-connections", type=int, default=40, help="Одновременных запросов вебхука")
+    args = parser.parse_args()
+
+    telegram = FakeTelegram(one_way=args.rtt / 2)
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", telegram.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", API_PORT).start()
+
+    print(f"{args.updates} обновлений, {args.rate:.0f}/с, RTT {args.rtt * 1000:.0f} мс\n")
+    header = f"{'режим':<10} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} {'max мс':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, run in (("polling", lambda: run_polling(args, telegram)), ("webhook", lambda: run_webhook(args))):
+        row = summary(await run())
+        print(f"{name:<10} {row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f} {row['max']:>8.1f}")
+
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""
+Бенчмарк обращений к базе на одно обновление
+
+Обновления проходят через настоящий Dispatcher бота (configure_dispatcher:
+middleware, роутеры, обработчики). Telegram заменяется сессией без сети,
+S3 — FakeS3Client, база и FSM-хранилище создаются во временной папке.
+Запросы считаются через trace callback соединения Database, поэтому скрипт
+работает и на дереве без UserContextMiddleware — так получается строка
+«до» для сравнения.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_user_context --rounds 200
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Токен и бакет нужны только для импорта модулей бота
+os.environ.setdefault("S3_BUCKET", "bench")
+os.environ.setdefault("TOKEN", "123456:bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+# Ограничитель тяжелых операций не должен отклонять нажатия бенчмарка
+os.environ.setdefault("USER_RATE", "1000000")
+os.environ.setdefault("USER_BURST", "1000000")
+
+from aiogram.types import Update  # noqa: E402
+
+from benchmarks.fake_telegram import OfflineSession  # noqa: E402
+
+USERS = 200
+# Типичные нажатия: (название, callback_data или текст сообщения)
+ACTIONS = [
+    ("/start", "/start"),
+    ("menu_music", "menu_music"),
+    ("menu_useful", "menu_useful"),
+    ("back_to_main", "back_to_main"),
+    ("change_age", "change_age"),
+    ("select_age", "select_age_4-6"),
+]
+
+
+def make_update(update_id: int, user_id: int, action: str) -> Dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "Аня"}
+    chat = {"id": user_id, "type": "private"}
+    if action.startswith("/"):
+        return {"update_id": update_id, "message": {
+            "message_id": update_id, "date": 0, "chat": chat, "from": user, "text": action,
+        }}
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": user, "chat_instance": "1", "data": action,
+        "message": {"message_id": update_id, "date": 0, "chat": chat, "text": "x"},
+    }}
+
+
+async def run(rounds: int) -> Tuple[Dict[str, List[int]], Dict[str, float]]:
+    import main
+    from benchmarks.fake_s3 import FakeS3Client
+    from database.database import db
+    from utils import library, s3_service
+    from utils.send_gateway import send_gateway
+
+    logging.disable(logging.WARNING)
+    client = FakeS3Client(latency=0, jitter=0)
+    client.seed_catalog()
+    s3_service.s3_client = client
+    library.bot.session = OfflineSession()
+    main.configure_dispatcher()
+    # Лимиты скорости Telegram к сессии без сети не относятся
+    send_gateway.set_rate(1e9)
+    send_gateway.chat_rate, send_gateway.chat_burst = 1e9, 10 ** 6
+    bot, dp = library.bot, library.dp
+
+    for user_id in range(1, USERS + 1):
+        db.add_user(user_id, f"user{user_id}", "Аня")
+        db.set_user_age(user_id, "4-6")
+        if user_id % 4 == 0:
+            db.set_premium_status(user_id, True, 30)
+
+    queries = [0]
+
+    def trace(sql: str) -> None:
+        if sql.lstrip().split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+            queries[0] += 1
+
+    db.connection.set_trace_callback(trace)
+    counts: Dict[str, List[int]] = defaultdict(list)
+    elapsed: Dict[str, float] = defaultdict(float)
+    update_id = 0
+    for _ in range(rounds):
+        for user_id in range(1, USERS + 1, max(1, USERS // 20)):
+            for name, action in ACTIONS:
+                update_id += 1
+                update = Update.model_validate(make_update(update_id, user_id, action), context={"bot": bot})
+                queries[0] = 0
+                start = time.perf_counter()
+                await dp.feed_update(bot, update)
+                elapsed[name] += time.perf_counter() - start
+                counts[name].append(queries[0])
+    db.connection.set_trace_callback(None)
+    return counts, elapsed
+
+
+async def amain() -> None:
+    parser = argparse.ArgumentParser(description="Запросы к базе на одно обновление")
+    parser.add_argument("--rounds", type=int, default=200, help="Проходов по смеси нажатий")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Database и FSM-хранилище открывают bot_database.db в текущей папке
+        os.chdir(tmp)
+        counts, elapsed = await run(args.rounds)
+
+    header = f"{'обновление':<14} {'запросов':>9} {'макс':>5} {'мкс':>8}"
+    print(header)
+    print("-" * len(header))
+    total = 0
+    for name, _ in ACTIONS:
+        values = counts[name]
+        total += sum(values)
+        print(f"{name:<14} {sum(values) / len(values):>9.2f} {max(values):>5} "
+              f"{elapsed[name] / len(values) * 1e6:>8.0f}")
+    updates = sum(len(values) for values in counts.values())
+    print(f"\nв среднем {total / updates:.2f} запроса к базе на обновление ({updates} обновлений)")
+
+
+if __name__ == "__main__":
+    asyncio.run(amain())
@@ -0,0 +1,117 @@
+"""
+Бенчмарк пропускной способности обработки обновлений по числу процессов
+
+Супервизор utils.workers раздает обновления воркерам по user_id, каждый
+воркер разбирает обновление в pydantic, прогоняет через Dispatcher и
+собирает ответ (клавиатура + сериализация запроса), не обращаясь к сети.
+Строка inline — тот же обработчик в одном процессе без межпроцессной очереди.
+Рост ограничен числом ядер: на 1 ядре несколько воркеров только добавляют накладные расходы.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_workers --updates 20000 --max-workers 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.methods import SendMessage
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, Update
+
+from utils.workers import UpdateSupervisor
+
+TOKEN = "123456:bench"
+
+
+def build_dispatcher(bot: Bot) -> Dispatcher:
+    """Обработчик с типичной для бота работой на CPU: клавиатура и сериализация ответа"""
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message) -> None:
+        buttons = [
+            InlineKeyboardButton(text=f"Раздел {i} 🎵", callback_data=f"checkmusic_{i}_4-6")
+            for i in range(12)
+        ]
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons[i:i + 2] for i in range(0, len(buttons), 2)])
+        method = SendMessage(chat_id=message.chat.id, text=f"Привет, {message.from_user.first_name}!",
+                             reply_markup=keyboard)
+        json.dumps(bot.session.prepare_value(method.model_dump(exclude_none=True), bot=bot, files={}))
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def setup_bench_worker(index: int, count: int):
+    bot = Bot(TOKEN)
+    return bot, build_dispatcher(bot)
+
+
+def make_updates(count: int, users: int) -> List[Dict]:
+    updates = []
+    for update_id in range(1, count + 1):
+        user = {"id": 10_000 + update_id % users, "is_bot": False, "first_name": "Аня", "language_code": "ru"}
+        updates.append({
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user["id"], "type": "private", "first_name": "Аня"},
+                "from": user,
+                "text": "Музыка 🎶",
+            },
+        })
+    return updates
+
+
+async def run_inline(updates: List[Dict]) -> float:
+    bot = Bot(TOKEN)
+    dp = build_dispatcher(bot)
+    start = time.perf_counter()
+    for data in updates:
+        await dp.feed_update(bot, Update.model_validate(data, context={"bot": bot}))
+    elapsed = time.perf_counter() - start
+    await bot.session.close()
+    return elapsed
+
+
+async def run_workers(workers: int, updates: List[Dict]) -> float:
+    supervisor = UpdateSupervisor(workers, setup_bench_worker)
+    await supervisor.start()
+    start = time.perf_counter()
+    for data in updates:
+        supervisor.dispatch(data)
+    # stop() возвращается, когда воркеры обработали все полученные обновления
+    await supervisor.stop()
+    return time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк обработки обновлений в нескольких процессах")
+    parser.add_argument("--updates", type=int, default=20000, help="Обновлений на замер")
+    parser.add_argument("--users", type=int, default=1000, help="Разных пользователей")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="До скольких воркеров мерить")
+    args = parser.parse_args()
+
+    updates = make_updates(args.updates, args.users)
+    print(f"{args.updates} обновлений от {args.users} пользователей, ядер: {os.cpu_count()}\n")
+    header = f"{'режим':<12} {'обн/с':>9} {'ускорение':>10}"
+    print(header)
+    print("-" * len(header))
+
+    inline = args.updates / await run_inline(updates)
+    print(f"{'inline':<12} {inline:>9.0f} {'':>10}")
+
+    base = None
+    for workers in range(1, args.max_workers + 1):
+        rate = args.updates / await run_workers(workers, updates)
+        base = base or rate
+        print(f"{f'workers={workers}':<12} {rate:>9.0f} {rate / base:>9.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,219 @@
+"""
+Бенчмарк HTTP-клиента ЮКассы: общая keep-alive сессия против сессии на запрос
+
+ЮКасса заменяется локальным HTTPS-сервером (самоподписанный сертификат
+от openssl) за прокси, который задерживает данные на rtt / 2 в каждую
+сторону и на rtt — установку соединения (TCP handshake). Платежи идут
+через настоящий YooKassaPayment: create_regular_payment, затем
+check_payment_status, как при оплате подписки. База создается во
+временной папке.
+
+Режим per-call закрывает сессию после каждого запроса — так раньше работал
+каждый метод (новый ClientSession, новое TCP- и TLS-соединение). Режим
+shared — общая сессия YooKassaPayment. Соединения считает прокси.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_yookassa_client --payments 200 --concurrency 10 --rtt 0.04
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Токен и бакет нужны только для импорта модулей бота
+os.environ.setdefault("S3_BUCKET", "bench")
+os.environ.setdefault("TOKEN", "123456:bench")
+
+SERVER_PORT = 18443
+PROXY_PORT = 18444
+
+
+def make_certificate(folder: str) -> ssl.SSLContext:
+    """Самоподписанный сертификат для 127.0.0.1; клиент доверяет ему через SSL_CERT_FILE"""
+    cert, key = os.path.join(folder, "cert.pem"), os.path.join(folder, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+                    "-nodes", "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=127.0.0.1",
+                    "-addext", "subjectAltName=IP:127.0.0.1"], check=True, capture_output=True)
+    os.environ["SSL_CERT_FILE"] = cert
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+# aiohttp создает SSL-контекст по умолчанию при импорте: сертификат нужен раньше
+CERT_DIR = tempfile.mkdtemp(prefix="bench_yookassa_")
+SERVER_SSL = make_certificate(CERT_DIR)
+
+from aiohttp import web  # noqa: E402
+
+
+class FakeYooKassa:
+    """API платежей: POST /v3/payments и GET /v3/payments/{id}"""
+
+    def __init__(self):
+        self.requests = 0
+
+    async def create(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if "Authorization" not in request.headers or "Idempotence-Key" not in request.headers:
+            return web.json_response({"type": "error", "code": "invalid_request"}, status=400)
+        data = await request.json()
+        return web.json_response({
+            "id": str(uuid.uuid4()), "status": "pending", "amount": data["amount"],
+            "confirmation": {"type": "redirect", "confirmation_url": "https://yoomoney.ru/checkout"},
+        })
+
+    async def get(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        return web.json_response({"id": request.match_info["payment_id"], "status": "succeeded"})
+
+
+class DelayProxy:
+    """TCP-прокси с задержкой сети: rtt на установку соединения и rtt / 2 на каждый пакет"""
+
+    def __init__(self, rtt: float, target_port: int):
+        self.rtt = rtt
+        self.target_port = target_port
+        self.connections = 0
+        self.tasks = set()
+
+    async def handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self.tasks.add(asyncio.current_task())
+        asyncio.current_task().add_done_callback(self.tasks.discard)
+        # SYN / SYN-ACK до удаленного сервера
+        await asyncio.sleep(self.rtt)
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", self.target_port)
+        await asyncio.gather(self._pipe(client_reader, server_writer), self._pipe(server_reader, client_writer),
+                             return_exceptions=True)
+
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Пакеты задерживаются, но не выстраиваются в очередь за задержкой друг друга
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def deliver() -> None:
+            while True:
+                due, chunk = await queue.get()
+                await asyncio.sleep(max(0.0, due - time.monotonic()))
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+            writer.close()
+
+        sender = asyncio.create_task(deliver())
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                queue.put_nowait((time.monotonic() + self.rtt / 2, chunk))
+                if not chunk:
+                    break
+        finally:
+            await sender
+
+
+async def run(make_handler, proxy: DelayProxy, payments: int, concurrency: int, shared: bool) -> Dict:
+    from database.database import db
+
+    proxy.connections = 0
+    common = make_handler()
+    durations: Dict[str, List[float]] = {"create": [], "status": []}
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(operation: str, call):
+        # Как раньше: без общей сессии каждый запрос открывает и закрывает свою
+        handler = common if shared else make_handler()
+        started = time.perf_counter()
+        try:
+            return await call(handler)
+        finally:
+            durations[operation].append(time.perf_counter() - started)
+            if not shared:
+                await handler.close()
+
+    async def pay(user_id: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            db.add_user(user_id, f"user{user_id}", "Аня")
+            payment = await timed("create", lambda handler: handler.create_regular_payment(user_id))
+            status = payment and await timed("status", lambda handler: handler.check_payment_status(payment["id"]))
+            if not status:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(pay(user_id) for user_id in range(1, payments + 1)))
+    elapsed = time.perf_counter() - started
+    await common.close()
+    everything = sorted(durations["create"] + durations["status"])
+    return {
+        "create": statistics.median(durations["create"]) * 1000,
+        "status": statistics.median(durations["status"]) * 1000,
+        "p99": everything[max(0, int(len(everything) * 0.99) - 1)] * 1000,
+        "connections": proxy.connections,
+        "rate": payments / elapsed,
+        "failures": failures,
+    }
+
+
+async def amain() -> None:
+    parser = argparse.ArgumentParser(description="HTTP-клиент ЮКассы: общая сессия против сессии на запрос")
+    parser.add_argument("--payments", type=int, default=200, help="Оплат (создание + проверка статуса)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Одновременных оплат")
+    parser.add_argument("--rtt", type=float, default=0.04, help="Время сети туда и обратно до ЮКассы, сек")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Database открывает bot_database.db в текущей папке
+        os.chdir(tmp)
+        os.environ["YOOKASSA_BASE_URL"] = f"https://127.0.0.1:{PROXY_PORT}/v3"
+
+        from database.database import db
+        from payments.payment_handler import YooKassaPayment
+
+        fake = FakeYooKassa()
+        app = web.Application()
+        app.router.add_post("/v3/payments", fake.create)
+        app.router.add_get("/v3/payments/{payment_id}", fake.get)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", SERVER_PORT, ssl_context=SERVER_SSL).start()
+        proxy = DelayProxy(args.rtt, SERVER_PORT)
+        proxy_server = await asyncio.start_server(proxy.handle, "127.0.0.1", PROXY_PORT)
+
+        def make_handler() -> YooKassaPayment:
+            return YooKassaPayment(shop_id="bench", api_key="bench", db=db, return_url="https://t.me/bench")
+
+        print(f"{args.payments} оплат, {args.concurrency} одновременно, RTT {args.rtt * 1000:.0f} мс, HTTPS\n")
+        header = (f"{'режим':<9} {'create p50':>11} {'status p50':>11} {'p99 мс':>8} "
+                  f"{'соединений':>11} {'оплат/с':>8} {'ошибок':>7}")
+        print(header)
+        print("-" * len(header))
+        for name, shared in (("per-call", False), ("shared", True)):
+            row = await run(make_handler, proxy, args.payments, args.concurrency, shared)
+            print(f"{name:<9} {row['create']:>11.1f} {row['status']:>11.1f} {row['p99']:>8.1f} "
+                  f"{row['connections']:>11} {row['rate']:>8.1f} {row['failures']:>7}")
+
+        # Соединения закрываются через прокси с задержкой: ждем, пока они догорят
+        if proxy.tasks:
+            await asyncio.wait(proxy.tasks, timeout=5)
+        proxy_server.close()
+        await runner.cleanup()
+        db.connection.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(amain())
+    finally:
+        shutil.rmtree(CERT_DIR, ignore_errors=True)
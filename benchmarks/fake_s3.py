@@ -0,0 +1,185 @@
+"""
+Локальная замена S3 для бенчмарков utils/s3_service.py
+
+FakeS3Client реализует подмножество API boto3, которое использует бот
+(list_objects_v2 с пагинацией, get_paginator, generate_presigned_url,
+get_object), хранит объекты в памяти и умеет имитировать сетевую
+задержку, разброс задержки и ошибки.
+"""
+import hashlib
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+AGE_GROUPS = ("0-3", "4-6", "7-10")
+PAGE_SIZE = 1000
+
+
+class FakeS3Client:
+    def __init__(self, latency: float = 0.02, jitter: float = 0.01, error_rate: float = 0.0, seed: int = 42,
+                 presign_latency: float = 0.0):
+        """
+        :param latency: Средняя задержка сетевого вызова в секундах
+        :param jitter: Максимальное отклонение задержки в секундах
+        :param error_rate: Доля вызовов, завершающихся ошибкой SlowDown
+        :param seed: Зерно генератора для воспроизводимости
+        :param presign_latency: Время подписи URL (по умолчанию подпись мгновенная, как в boto3)
+        """
+        self.latency = latency
+        self.presign_latency = presign_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.objects: Dict[str, Dict] = {}
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sorted_keys: Optional[List[str]] = None
+
+    # ==================== Наполнение ====================
+    def put_object(self, key: str, size: int = 1024, body: bytes = None) -> None:
+        """Добавляет объект с вычисленным ETag"""
+        body = body if body is not None else key.encode("utf-8")
+        self.objects[key] = {
+            "Key": key,
+            "Size": size,
+            "ETag": '"%s"' % hashlib.md5(body).hexdigest(),
+            "Body": body,
+        }
+        self._sorted_keys = None
+
+    def seed_catalog(self, books: int = 40, tracks: int = 25, useful_topics: int = 12,
+                     useful_subtopics: int = 6, useful_files: int = 8, cartoons: int = 30,
+                     episodes: int = 12, fairy_tales: int = 40) -> int:
+        """
+        Создает синтетическое дерево Контент/{age}/... близкое к реальному каталогу
+
+        :return: Количество созданных объектов
+        """
+        for age in AGE_GROUPS:
+            root = f"Контент/{age}"
+            for c in range(cartoons):
+                for e in range(episodes):
+                    self.put_object(f"{root}/Мультики/Мультик {c}/Серия {e}.mp4", size=50_000_000)
+                self.put_object(f"{root}/Мультики/Мультик {c}/poster.jpg", size=200_000)
+            for g in range(8):
+                for t in range(tracks):
+                    self.put_object(f"{root}/Музыка/Плейлист {g}/Трек {t}.mp3", size=4_000_000)
+            for f in range(fairy_tales):
+                self.put_object(f"{root}/Сказки/Сказка {f}/Сказка {f}.mp3", size=6_000_000)
+            for b in range(books):
+                for t in range(tracks):
+                    self.put_object(f"{root}/Аудиокниги/Книга {b}/Глава {t:02d}.mp3", size=8_000_000)
+                self.put_object(f"{root}/Аудиокниги/Книга {b}/cover.jpg", size=150_000)
+                self.put_object(f"{root}/Аудиокниги/Книга {b}/description.txt",
+                                body=f"Описание книги {b}".encode("utf-8"))
+            for topic in range(useful_topics):
+                for sub in range(useful_subtopics):
+                    for n in range(useful_files):
+                        ext = ("pdf", "jpg", "mp4")[n % 3]
+                        self.put_object(f"{root}/Полезное/Тема {topic}/Раздел {sub}/Файл {n}.{ext}")
+        return len(self.objects)
+
+    # ==================== Имитация сети ====================
+    def _network(self, operation: str) -> None:
+        """Учитывает вызов, ждет задержку и при необходимости выбрасывает ошибку"""
+        with self._lock:
+            self.calls[operation] += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise ClientError({"Error": {"Code": "SlowDown", "Message": "Injected error"}}, operation)
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+    # ==================== API boto3 ====================
+    def _keys(self) -> List[str]:
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self.objects)
+        return self._sorted_keys
+
+    def list_objects_v2(self, Bucket: str = None, Prefix: str = "", Delimiter: str = None,
+                        ContinuationToken: str = None, MaxKeys: int = PAGE_SIZE, **kwargs) -> Dict:
+        self._network("list_objects_v2")
+        start_after = ContinuationToken or ""
+        contents, prefixes = [], []
+        seen_prefixes = set()
+        truncated = False
+        last_key = None
+
+        for key in self._keys():
+            if not key.startswith(Prefix) or key <= start_after:
+                continue
+            if len(contents) + len(prefixes) >= MaxKeys:
+                truncated = True
+                break
+            rest = key[len(Prefix):]
+            if Delimiter and Delimiter in rest:
+                common = Prefix + rest.split(Delimiter, 1)[0] + Delimiter
+                if common not in seen_prefixes:
+                    seen_prefixes.add(common)
+                    prefixes.append({"Prefix": common})
+                # Пропускаем все ключи внутри общего префикса
+                last_key = common + "￿"
+                start_after = last_key
+                continue
+            obj = self.objects[key]
+            contents.append({k: obj[k] for k in ("Key", "Size", "ETag")})
+            last_key = key
+
+        response = {"IsTruncated": truncated, "KeyCount": len(contents) + len(prefixes), "Prefix": Prefix}
+        if contents:
+            response["Contents"] = contents
+        if prefixes:
+            response["CommonPrefixes"] = prefixes
+        if truncated and last_key:
+            response["NextContinuationToken"] = last_key
+        return response
+
+    def get_paginator(self, operation: str) -> "FakePaginator":
+        assert operation == "list_objects_v2"
+        return FakePaginator(self)
+
+    def generate_presigned_url(self, client_method: str, Params: Dict = None, ExpiresIn: int = 3600) -> str:
+        # Подпись в boto3 вычисляется локально, без сетевого вызова
+        with self._lock:
+            self.calls["presign"] += 1
+        if self.presign_latency:
+            time.sleep(self.presign_latency)
+        return f"https://fake-s3.local/{Params['Key']}?X-Amz-Expires={ExpiresIn}&sig={time.monotonic_ns()}"
+
+    def get_object(self, Bucket: str = None, Key: str = None, Range: str = None, **kwargs) -> Dict:
+        self._network("get_object")
+        obj = self.objects.get(Key)
+        if obj is None:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": Key}}, "GetObject")
+        return {"Body": _Body(obj["Body"]), "ETag": obj["ETag"]}
+
+
+class FakePaginator:
+    def __init__(self, client: FakeS3Client):
+        self.client = client
+
+    def paginate(self, **kwargs) -> Iterator[Dict]:
+        token = None
+        while True:
+            page = self.client.list_objects_v2(ContinuationToken=token, **kwargs)
+            yield page
+            if not page.get("IsTruncated"):
+                break
+            token = page["NextContinuationToken"]
+
+
+class _Body:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self) -> bytes:
+        return self.data
@@ -0,0 +1,120 @@
+"""
+Сессия Bot API без сети для бенчмарков
+
+OfflineSession сразу отвечает на любой метод: для методов, возвращающих
+Message, — синтетическим сообщением (медиа — с file_id, как у Telegram),
+для getMe — пользователем-ботом,
+для остальных — True. Каждый запрос записывается в requests
+(время monotonic и сам метод), чтобы бенчмарк мог посчитать вызовы API.
+
+Содержимое отправленных сообщений запоминается, и правки проверяются как в
+Telegram: правка без изменений — ошибка «message is not modified», текст
+нельзя поставить в медиа-сообщение, подпись — в текстовое.
+"""
+import datetime
+import hashlib
+import time
+from typing import Dict, List, Tuple
+
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import (
+    DeleteMessage, EditMessageCaption, EditMessageMedia, EditMessageReplyMarkup, EditMessageText, SendAnimation,
+    SendMessage, SendPhoto, SendVideo, TelegramMethod
+)
+from aiogram.types import Animation, Chat, Message, PhotoSize, User, Video
+
+SEND_MEDIA = {SendPhoto: "photo", SendVideo: "video", SendAnimation: "animation"}
+
+
+class OfflineSession(BaseSession):
+    """Сессия Bot API без сети: любой метод сразу завершается успешно"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests: List[Tuple[float, TelegramMethod]] = []
+        # (chat_id, message_id) -> (вид, содержимое, клавиатура)
+        self.messages: Dict[Tuple[int, int], Tuple[str, str, str]] = {}
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests.append((time.monotonic(), method))
+        self._check_edit(method)
+        returning = method.__returning__
+        # edit_message_text и подобные возвращают Union[Message, bool]
+        if returning is Message or Message in getattr(returning, "__args__", ()):
+            chat_id = getattr(method, "chat_id", None) or 1
+            # Правка возвращает то же сообщение, отправка — новое
+            message_id = getattr(method, "message_id", None) or len(self.requests)
+            self._remember(method, chat_id, message_id)
+            return self._message(chat_id, message_id)
+        if returning is User:
+            return User(id=123456, is_bot=True, first_name="bench")
+        if isinstance(method, DeleteMessage):
+            self.messages.pop((method.chat_id, method.message_id), None)
+        return True
+
+    def _message(self, chat_id: int, message_id: int) -> Message:
+        """Сообщение с текущим содержимым: у медиа file_id, как в ответе Telegram"""
+        kind, body, _ = self.messages.get((chat_id, message_id), ("text", "ok", ""))
+        fields = {}
+        if kind == "text":
+            fields["text"] = body or "ok"
+        else:
+            source, caption = body.split("|", 1)
+            file_id = source if source.startswith("file-") else f"file-{hashlib.md5(source.encode()).hexdigest()}"
+            ids = {"file_id": file_id, "file_unique_id": file_id[5:21]}
+            size = {"width": 640, "height": 480}
+            if kind == "photo":
+                fields["photo"] = [PhotoSize(**ids, **size)]
+            elif kind == "video":
+                fields["video"] = Video(**ids, **size, duration=1)
+            else:
+                fields["animation"] = Animation(**ids, **size, duration=1)
+            fields["caption"] = caption if caption != "None" else None
+        return Message(message_id=message_id, date=datetime.datetime.now(),
+                       chat=Chat(id=chat_id, type="private"), **fields)
+
+    @staticmethod
+    def _markup(method: TelegramMethod) -> str:
+        markup = getattr(method, "reply_markup", None)
+        return markup.model_dump_json(exclude_none=True) if markup is not None else ""
+
+    def _content(self, method: TelegramMethod, known: Tuple[str, str, str]) -> Tuple[str, str, str]:
+        """Содержимое сообщения после метода"""
+        kind, body, _ = known
+        if isinstance(method, (SendMessage, EditMessageText)):
+            return "text", method.text, self._markup(method)
+        for method_type, field in SEND_MEDIA.items():
+            if isinstance(method, method_type):
+                return field, f"{getattr(method, field)}|{method.caption}", self._markup(method)
+        if isinstance(method, EditMessageMedia):
+            return method.media.type, f"{method.media.media}|{method.media.caption}", self._markup(method)
+        if isinstance(method, EditMessageCaption):
+            return kind, f"{body.split('|')[0]}|{method.caption}", self._markup(method)
+        return kind, body, self._markup(method)
+
+    def _check_edit(self, method: TelegramMethod) -> None:
+        if not isinstance(method, (EditMessageText, EditMessageMedia, EditMessageCaption, EditMessageReplyMarkup)):
+            return
+        known = self.messages.get((method.chat_id, method.message_id))
+        if known is None:
+            # Сообщение пришло в обновлении: содержимое неизвестно, правка проходит
+            return
+        if isinstance(method, EditMessageText) and known[0] != "text":
+            raise TelegramBadRequest(method=method, message="Bad Request: there is no text in the message to edit")
+        if isinstance(method, EditMessageCaption) and known[0] == "text":
+            raise TelegramBadRequest(method=method, message="Bad Request: there is no caption in the message to edit")
+        if self._content(method, known) == known:
+            raise TelegramBadRequest(method=method, message="Bad Request: message is not modified")
+
+    def _remember(self, method: TelegramMethod, chat_id: int, message_id: int) -> None:
+        if isinstance(method, (SendMessage, EditMessageText, EditMessageMedia, EditMessageCaption,
+                               EditMessageReplyMarkup, *SEND_MEDIA)):
+            known = self.messages.get((chat_id, message_id), ("text", "", ""))
+            self.messages[(chat_id, message_id)] = self._content(method, known)
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
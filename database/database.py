@@ -1,17 +1,64 @@
 import sqlite3
 import datetime
-from typing import Optional, Dict, Any, List
+import json
+from contextvars import ContextVar
+from typing import Callable, Optional, Dict, Any, Iterator, List, Tuple
 from datetime import date
+from database.segments import Segment
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+
+class QueryCounter:
+    """Число запросов к базе за одно обновление (задается middlewares.user_context)"""
+
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+current_queries: ContextVar[Optional[QueryCounter]] = ContextVar("current_queries", default=None)
+
+
+class CountingCursor(sqlite3.Cursor):
+    """Курсор, который учитывает запросы в счетчике текущего обновления"""
+
+    def execute(self, sql, parameters=(), /):
+        counter = current_queries.get()
+        if counter is not None:
+            counter.count += 1
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        counter = current_queries.get()
+        if counter is not None:
+            counter.count += 1
+        return super().executemany(sql, seq_of_parameters)
+
+
 class Database:
     def __init__(self, db_file: str = "bot_database.db"):
         self.connection = sqlite3.connect(db_file)
-        self.cursor = self.connection.cursor()
+        self.cursor = self.connection.cursor(factory=CountingCursor)
+        # Подписчики на изменение данных пользователя (сброс кэша UserContext)
+        self.user_listeners: List[Callable[[int], Any]] = []
+        # WAL: чтения не ждут записи, несколько процессов-воркеров работают с одной базой
+        self.cursor.execute("PRAGMA journal_mode=WAL")
         self._create_tables()
         self._create_indexes()
+
+    def subscribe_user_changes(self, listener: Callable[[int], Any]) -> None:
+        """Подписка на изменения профиля: listener получает user_id"""
+        self.user_listeners.append(listener)
+
+    def _user_changed(self, user_id: int) -> None:
+        for listener in self.user_listeners:
+            try:
+                listener(user_id)
+            except Exception as e:
+                logger.error("user_listener_failed", user_id=user_id, error=str(e))
     
     def _create_indexes(self) -> None:
         """Создание индексов для оптимизации запросов"""
@@ -21,6 +68,12 @@ class Database:
             "CREATE INDEX IF NOT EXISTS idx_users_premium ON users(is_premium)",
             "CREATE INDEX IF NOT EXISTS idx_users_premium_until ON users(premium_until)",
             "CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users(last_activity)",
+            # Частичные индексы по доставляемым пользователям для массовых отправок
+            "CREATE INDEX IF NOT EXISTS idx_users_deliverable ON users(user_id) WHERE blocked_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_users_deliverable_activity ON users(last_activity) WHERE blocked_at IS NULL",
+            # Индексы для сегментов рассылок
+            "CREATE INDEX IF NOT EXISTS idx_users_age_group ON users(age_group)",
+            "CREATE INDEX IF NOT EXISTS idx_users_registration ON users(registration_date)",
             
             # Индексы для таблицы payments
             "CREATE INDEX IF NOT EXISTS idx_payments_user_id ON payments(user_id)",
@@ -34,7 +87,11 @@ class Database:
             # Индексы для таблицы gift_subscriptions
             "CREATE INDEX IF NOT EXISTS idx_gift_status ON gift_subscriptions(is_redeemed)",
             "CREATE INDEX IF NOT EXISTS idx_gift_sender ON gift_subscriptions(sender_id)",
-            "CREATE INDEX IF NOT EXISTS idx_gift_recipient ON gift_subscriptions(redeemed_by)"
+            "CREATE INDEX IF NOT EXISTS idx_gift_recipient ON gift_subscriptions(redeemed_by)",
+
+            # Индексы для рассылок
+            "CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs(status)",
+            "CREATE INDEX IF NOT EXISTS idx_notification_plan_due ON notification_plan(status, send_at)"
         ]
         
         for index in indexes:
@@ -123,6 +180,9 @@ class Database:
             columns = [column[1] for column in self.cursor.fetchall()]
             if "last_activity" not in columns:
                 self.cursor.execute("ALTER TABLE users ADD COLUMN last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+            # Когда пользователь заблокировал бота (NULL — сообщения доставляются)
+            if "blocked_at" not in columns:
+                self.cursor.execute("ALTER TABLE users ADD COLUMN blocked_at TIMESTAMP")
 
             self.cursor.execute('''
                 CREATE TABLE IF NOT EXISTS admins (
@@ -165,6 +225,85 @@ class Database:
                 ''')
             self.connection.commit()
 
+            # Кэш Telegram file_id для медиа из S3 (ключ объекта + ETag)
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS telegram_files (
+                    s3_key TEXT NOT NULL,
+                    etag TEXT NOT NULL,
+                    media_type TEXT,
+                    file_id TEXT NOT NULL,
+                    file_unique_id TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (s3_key, etag)
+                )
+                ''')
+            self.connection.commit()
+
+            # Версии объектов S3, которые Telegram отклонил при предзагрузке (повтор — только после смены ETag)
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS media_warm_failures (
+                    s3_key TEXT NOT NULL,
+                    etag TEXT NOT NULL,
+                    error TEXT,
+                    failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (s3_key, etag)
+                )
+                ''')
+            self.connection.commit()
+
+            # Рассылки: задание и статус отправки каждому получателю (для возобновления после рестарта)
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    admin_id INTEGER NOT NULL,
+                    text TEXT,
+                    media_type TEXT,
+                    media_id TEXT,
+                    source_chat_id INTEGER,
+                    source_message_id INTEGER,
+                    status TEXT NOT NULL DEFAULT 'running',
+                    total INTEGER DEFAULT 0,
+                    sent INTEGER DEFAULT 0,
+                    failed INTEGER DEFAULT 0,
+                    skipped INTEGER DEFAULT 0,
+                    segment TEXT,
+                    last_user_id INTEGER DEFAULT 0,
+                    progress_chat_id INTEGER,
+                    progress_message_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+                ''')
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                    job_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (job_id, user_id)
+                )
+                ''')
+            # План отправки напоминаний: время для каждого получателя кампании (переживает рестарт)
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS notification_plan (
+                    campaign TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    send_at TIMESTAMP NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    PRIMARY KEY (campaign, user_id)
+                )
+                ''')
+            self.connection.commit()
+
+            self.cursor.execute("PRAGMA table_info(broadcast_jobs)")
+            columns = [column[1] for column in self.cursor.fetchall()]
+            if "skipped" not in columns:
+                self.cursor.execute("ALTER TABLE broadcast_jobs ADD COLUMN skipped INTEGER DEFAULT 0")
+            if "segment" not in columns:
+                self.cursor.execute("ALTER TABLE broadcast_jobs ADD COLUMN segment TEXT")
+            self.connection.commit()
+
             logger.info("tables_created_successfully")
         except sqlite3.Error as e:
             logger.error("table_creation_failed", error=str(e))
@@ -204,6 +343,246 @@ class Database:
         self.cursor.execute("SELECT category_name FROM locked_categories")
         return [row[0] for row in self.cursor.fetchall()]
     
+    def get_telegram_file(self, s3_key: str, etag: str) -> Optional[Dict[str, Any]]:
+        """Возвращает сохраненный file_id для версии объекта S3"""
+        self.cursor.execute(
+            "SELECT media_type, file_id, file_unique_id FROM telegram_files WHERE s3_key = ? AND etag = ?",
+            (s3_key, etag)
+        )
+        row = self.cursor.fetchone()
+        if not row:
+            return None
+        return {
+            "media_type": row[0],
+            "file_id": row[1],
+            "file_unique_id": row[2]
+        }
+
+    def save_telegram_file(self, s3_key: str, etag: str, media_type: str,
+                           file_id: str, file_unique_id: str = None) -> None:
+        """Сохраняет file_id, полученный от Telegram после отправки объекта S3"""
+        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO telegram_files (s3_key, etag, media_type, file_id, file_unique_id, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (s3_key, etag, media_type, file_id, file_unique_id, current_time)
+        )
+        self.connection.commit()
+
+    def get_telegram_file_versions(self) -> set:
+        """Возвращает множество (s3_key, etag), для которых уже есть file_id"""
+        self.cursor.execute("SELECT s3_key, etag FROM telegram_files")
+        return {(row[0], row[1]) for row in self.cursor.fetchall()}
+
+    def delete_telegram_file(self, s3_key: str, etag: str) -> None:
+        """Удаляет устаревший или недействительный file_id"""
+        self.cursor.execute(
+            "DELETE FROM telegram_files WHERE s3_key = ? AND etag = ?",
+            (s3_key, etag)
+        )
+        self.connection.commit()
+
+    def save_media_warm_failure(self, s3_key: str, etag: str, error: str) -> None:
+        """Запоминает версию объекта S3, которую не удалось предзагрузить (прежние версии забываются)"""
+        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.cursor.execute("DELETE FROM media_warm_failures WHERE s3_key = ? AND etag != ?", (s3_key, etag))
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO media_warm_failures (s3_key, etag, error, failed_at) VALUES (?, ?, ?, ?)",
+            (s3_key, etag, error, current_time)
+        )
+        self.connection.commit()
+
+    def get_media_warm_failures(self) -> set:
+        """Возвращает множество (s3_key, etag), которые не удалось предзагрузить"""
+        self.cursor.execute("SELECT s3_key, etag FROM media_warm_failures")
+        return {(row[0], row[1]) for row in self.cursor.fetchall()}
+
+    # ==================== Рассылки ====================
+    def create_broadcast(self, admin_id: int, text: Optional[str], media_type: Optional[str],
+                         media_id: Optional[str], source_chat_id: Optional[int],
+                         source_message_id: Optional[int], total: int, skipped: int = 0,
+                         segment: Optional[Segment] = None) -> int:
+        """Создает задание рассылки и возвращает его ID"""
+        self.cursor.execute(
+            "INSERT INTO broadcast_jobs (admin_id, text, media_type, media_id, source_chat_id, "
+            "source_message_id, total, skipped, segment) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (admin_id, text, media_type, media_id, source_chat_id, source_message_id, total, skipped,
+             json.dumps(segment.to_dict(), ensure_ascii=False) if segment else None)
+        )
+        self.connection.commit()
+        return self.cursor.lastrowid
+
+    def get_broadcast(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Возвращает задание рассылки"""
+        self.cursor.execute("SELECT * FROM broadcast_jobs WHERE job_id = ?", (job_id,))
+        row = self.cursor.fetchone()
+        if not row:
+            return None
+        columns = [desc[0] for desc in self.cursor.description]
+        job = dict(zip(columns, row))
+        job["segment"] = Segment.from_dict(json.loads(job["segment"])) if job["segment"] else Segment()
+        return job
+
+    def get_broadcasts_by_status(self, status: str) -> List[int]:
+        """Возвращает ID рассылок в указанном статусе"""
+        self.cursor.execute("SELECT job_id FROM broadcast_jobs WHERE status = ? ORDER BY job_id", (status,))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def set_broadcast_status(self, job_id: int, status: str) -> None:
+        """Меняет статус рассылки (running, paused, cancelled, done)"""
+        finished_at = None
+        if status in ("cancelled", "done"):
+            finished_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.cursor.execute(
+            "UPDATE broadcast_jobs SET status = ?, finished_at = ? WHERE job_id = ?",
+            (status, finished_at, job_id)
+        )
+        self.connection.commit()
+
+    def set_broadcast_progress_message(self, job_id: int, chat_id: int, message_id: int) -> None:
+        """Сохраняет сообщение администратора, в котором показывается прогресс"""
+        self.cursor.execute(
+            "UPDATE broadcast_jobs SET progress_chat_id = ?, progress_message_id = ? WHERE job_id = ?",
+            (chat_id, message_id, job_id)
+        )
+        self.connection.commit()
+
+    def set_broadcast_cursor(self, job_id: int, last_user_id: int) -> None:
+        """Запоминает последнего полностью обработанного получателя"""
+        self.cursor.execute(
+            "UPDATE broadcast_jobs SET last_user_id = ? WHERE job_id = ?",
+            (last_user_id, job_id)
+        )
+        self.connection.commit()
+
+    def record_broadcast_result(self, job_id: int, user_id: int, sent: bool, error: str = None) -> None:
+        """Сохраняет результат отправки одному получателю и обновляет счетчики задания"""
+        self.cursor.execute(
+            "INSERT OR IGNORE INTO broadcast_recipients (job_id, user_id, status, error) VALUES (?, ?, ?, ?)",
+            (job_id, user_id, "sent" if sent else "failed", error)
+        )
+        if self.cursor.rowcount:
+            column = "sent" if sent else "failed"
+            self.cursor.execute(
+                f"UPDATE broadcast_jobs SET {column} = {column} + 1 WHERE job_id = ?",
+                (job_id,)
+            )
+        self.connection.commit()
+
+    def get_broadcast_processed(self, job_id: int, user_ids: List[int]) -> set:
+        """Возвращает получателей из списка, которым рассылка уже отправлялась"""
+        if not user_ids:
+            return set()
+        placeholders = ",".join("?" * len(user_ids))
+        self.cursor.execute(
+            f"SELECT user_id FROM broadcast_recipients WHERE job_id = ? AND user_id IN ({placeholders})",
+            (job_id, *user_ids)
+        )
+        return {row[0] for row in self.cursor.fetchall()}
+
+    # ==================== План напоминаний ====================
+    def add_notification_plan(self, campaign: str, plan: List[Tuple[int, str]]) -> int:
+        """
+        Сохраняет время отправки для получателей кампании
+
+        Уже запланированные получатели не перезаписываются, поэтому повторное
+        построение плана после рестарта не приводит к повторной отправке.
+
+        :param plan: [(user_id, send_at), ...]
+        :return: Сколько получателей добавлено
+        """
+        before = self.connection.total_changes
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO notification_plan (campaign, user_id, send_at) VALUES (?, ?, ?)",
+            [(campaign, user_id, send_at) for user_id, send_at in plan]
+        )
+        self.connection.commit()
+        return self.connection.total_changes - before
+
+    def get_due_notifications(self, now: str, limit: int) -> List[Tuple[str, int]]:
+        """Получатели, время отправки которых наступило: [(campaign, user_id), ...]"""
+        self.cursor.execute(
+            "SELECT campaign, user_id FROM notification_plan "
+            "WHERE status = 'pending' AND send_at <= ? ORDER BY send_at LIMIT ?",
+            (now, limit)
+        )
+        return self.cursor.fetchall()
+
+    def set_notification_status(self, campaign: str, user_id: int, status: str) -> None:
+        self.cursor.execute(
+            "UPDATE notification_plan SET status = ? WHERE campaign = ? AND user_id = ?",
+            (status, campaign, user_id)
+        )
+        self.connection.commit()
+
+    def expire_notifications(self, send_before: str) -> int:
+        """Отменяет неотправленные напоминания, запланированные раньше send_before"""
+        self.cursor.execute(
+            "UPDATE notification_plan SET status = 'expired' WHERE status = 'pending' AND send_at < ?",
+            (send_before,)
+        )
+        self.connection.commit()
+        return self.cursor.rowcount
+
+    def get_notification_stats(self, campaign: str) -> Dict[str, int]:
+        """Количество получателей кампании по статусам"""
+        self.cursor.execute(
+            "SELECT status, COUNT(*) FROM notification_plan WHERE campaign = ? GROUP BY status",
+            (campaign,)
+        )
+        return dict(self.cursor.fetchall())
+
+    # ==================== Сегменты ====================
+    def get_segment_ids_after(self, segment: Segment, after_user_id: int, limit: int = 500) -> List[int]:
+        """Постраничная выборка ID пользователей сегмента по возрастанию (keyset, без OFFSET)"""
+        where, params = segment.compile()
+        self.cursor.execute(
+            f"SELECT user_id FROM users WHERE {where} AND user_id > ? ORDER BY user_id LIMIT ?",
+            (*params, after_user_id, limit)
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def iter_segment_ids(self, segment: Segment, batch_size: int = 500) -> Iterator[int]:
+        """Потоково отдает ID пользователей сегмента, не загружая всю выборку в память"""
+        last_user_id = 0
+        while True:
+            user_ids = self.get_segment_ids_after(segment, last_user_id, batch_size)
+            if not user_ids:
+                return
+            yield from user_ids
+            last_user_id = user_ids[-1]
+
+    def count_segment(self, segment: Segment) -> int:
+        """Размер сегмента (точный COUNT(*) по частичным индексам сегментов)"""
+        where, params = segment.compile()
+        self.cursor.execute(f"SELECT COUNT(*) FROM users WHERE {where}", params)
+        return self.cursor.fetchone()[0]
+
+    def count_users(self) -> int:
+        """Количество пользователей"""
+        self.cursor.execute("SELECT COUNT(*) FROM users")
+        return self.cursor.fetchone()[0]
+
+    # ==================== Доставляемость ====================
+    def mark_user_blocked(self, user_id: int) -> bool:
+        """
+        Отмечает, что пользователь заблокировал бота или чат недоступен
+
+        :return: True, если отметка поставлена впервые
+        """
+        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.cursor.execute(
+            "UPDATE users SET blocked_at = ? WHERE user_id = ? AND blocked_at IS NULL",
+            (current_time, user_id)
+        )
+        self.connection.commit()
+        marked = bool(self.cursor.rowcount)
+        if marked:
+            logger.info("user_marked_blocked", user_id=user_id)
+            # Иначе закэшированный UserContext не увидит отметку и не снимет ее при следующем нажатии
+            self._user_changed(user_id)
+        return marked
+
     def add_user(self, user_id: int, username: str = None, first_name: str = None) -> None:
         """Добавление нового пользователя в базу данных"""
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -212,6 +591,8 @@ class Database:
             (user_id, username, first_name, current_time)
         )
         self.connection.commit()
+        if self.cursor.rowcount:
+            self._user_changed(user_id)
 
     def increment_age_selection(self, age_group: str) -> None:
         """Увеличивает счетчик выбора возрастной группы"""
@@ -277,6 +658,38 @@ class Database:
             )
             raise
 
+    def get_user_context(self, user_id: int, usage_date: date) -> Dict[str, Any]:
+        """
+        Профиль пользователя для обработки обновления одним запросом:
+        возраст, подписка, пробный период, права администратора и число
+        запросов к AI за usage_date. Строка возвращается и для пользователя,
+        которого еще нет в users (registered=False).
+        """
+        self.cursor.execute(
+            """
+            SELECT u.user_id IS NOT NULL, u.age_group, u.is_premium, u.premium_until,
+                   u.trial_used, u.last_activity, u.blocked_at IS NOT NULL,
+                   a.user_id IS NOT NULL, COALESCE(q.count, 0)
+            FROM (SELECT ? AS user_id) AS k
+            LEFT JOIN users u ON u.user_id = k.user_id
+            LEFT JOIN admins a ON a.user_id = k.user_id
+            LEFT JOIN ai_usage q ON q.user_id = k.user_id AND q.usage_date = ?
+            """,
+            (user_id, usage_date.strftime('%Y-%m-%d'))
+        )
+        row = self.cursor.fetchone()
+        return {
+            "registered": bool(row[0]),
+            "age_group": row[1] or None,
+            "is_premium": bool(row[2]),
+            "premium_until": row[3],
+            "trial_used": bool(row[4]),
+            "last_activity": row[5],
+            "blocked": bool(row[6]),
+            "is_admin": bool(row[7]),
+            "ai_usage": row[8]
+        }
+
     def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
         """Получение информации о пользователе по никнейму"""
         try:
@@ -332,6 +745,7 @@ class Database:
             (is_premium, premium_until, user_id)
         )
         self.connection.commit()
+        self._user_changed(user_id)
     
     def set_trial_used(self, user_id: int, trial_used: bool = True) -> None:
         """Отметка об использовании триального периода"""
@@ -340,6 +754,7 @@ class Database:
             (trial_used, user_id)
         )
         self.connection.commit()
+        self._user_changed(user_id)
     
     def save_payment_method(self, user_id: int, payment_method_id: str) -> None:
         """Сохранение метода оплаты пользователя"""
@@ -433,6 +848,7 @@ class Database:
             (age_group, user_id)
         )
         self.connection.commit()
+        self._user_changed(user_id)
     
     def get_user_age(self, user_id: int) -> Optional[str]:
         """Получение возрастной группы пользователя"""
@@ -466,23 +882,32 @@ class Database:
             (user_id, date_str)
         )
         self.connection.commit()
+        self._user_changed(user_id)
     
     def update_user_activity(self, user_id: int) -> None:
-        """Обновляет время последней активности пользователя."""
+        """Обновляет время последней активности пользователя и снимает отметку о блокировке."""
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.cursor.execute(
             "UPDATE users SET last_activity = ? WHERE user_id = ?",
             (current_time, user_id)
         )
+        self.cursor.execute(
+            "UPDATE users SET blocked_at = NULL WHERE user_id = ? AND blocked_at IS NOT NULL",
+            (user_id,)
+        )
+        unblocked = bool(self.cursor.rowcount)
         self.connection.commit()
+        # Профиль в кэшах процессов сбрасывается, только если отметка действительно снята
+        if unblocked:
+            self._user_changed(user_id)
     
     def get_inactive_users(self, days: int = 2) -> List[Dict[str, Any]]:
-        """Получает список пользователей, неактивных более указанного количества дней."""
+        """Получает список пользователей, неактивных более указанного количества дней (без заблокировавших бота)."""
         cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
         
         self.cursor.execute(
             "SELECT user_id, username, first_name, last_activity, age_group FROM users "
-            "WHERE last_activity < ?",
+            "WHERE blocked_at IS NULL AND last_activity < ?",
             (cutoff_date,)
         )
         
@@ -534,6 +959,7 @@ class Database:
         self.cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
 
         self.connection.commit()
+        self._user_changed(user_id)
 
     def add_admin(self, user_id: int, username: str = None) -> None:
         """Добавление администратора в базу данных"""
@@ -542,6 +968,7 @@ class Database:
             (user_id, username)
         )
         self.connection.commit()
+        self._user_changed(user_id)
 
     def remove_admin(self, user_id: int) -> None:
         """Удаление администратора из базы данных"""
@@ -550,6 +977,7 @@ class Database:
             (user_id,)
         )
         self.connection.commit()
+        self._user_changed(user_id)
 
     def get_admin(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получение информации об администраторе"""
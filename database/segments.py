@@ -0,0 +1,136 @@
+import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _format_time(value) -> str:
+    if isinstance(value, datetime.datetime):
+        return value.strftime(DATE_FORMAT)
+    if isinstance(value, datetime.date):
+        return value.strftime("%Y-%m-%d 00:00:00")
+    return str(value)
+
+
+class Segment:
+    # Поля, которые сохраняются в состоянии и в задании рассылки
+    FIELDS = (
+        "age_groups", "premium", "trial_used", "inactive_days", "active_days",
+        "registered_after", "registered_before", "deliverable"
+    )
+
+    def __init__(self, age_groups: Optional[Sequence[str]] = None, premium: Optional[bool] = None,
+                 trial_used: Optional[bool] = None, inactive_days: Optional[int] = None,
+                 active_days: Optional[int] = None, registered_after=None, registered_before=None,
+                 deliverable: Optional[bool] = True):
+        """
+        Аудитория для массовых отправок — фильтр по таблице users
+
+        Каждый заданный параметр сужает выборку (условия объединяются через AND),
+        None означает «не важно».
+
+        :param age_groups: Возрастные группы ('0-3', '4-6', '7-10')
+        :param premium: Есть ли действующая подписка
+        :param trial_used: Использован ли пробный период
+        :param inactive_days: Не заходили в бота больше стольких дней
+        :param active_days: Заходили в бота за последние столько дней
+        :param registered_after: Зарегистрированы не раньше (datetime или строка БД)
+        :param registered_before: Зарегистрированы раньше (datetime или строка БД)
+        :param deliverable: True — только не заблокировавшие бота, False — только заблокировавшие
+        """
+        self.age_groups = list(age_groups) if age_groups else None
+        self.premium = premium
+        self.trial_used = trial_used
+        self.inactive_days = inactive_days
+        self.active_days = active_days
+        self.registered_after = _format_time(registered_after) if registered_after is not None else None
+        self.registered_before = _format_time(registered_before) if registered_before is not None else None
+        self.deliverable = deliverable
+
+    def compile(self) -> Tuple[str, List[Any]]:
+        """
+        Собирает условие WHERE для таблицы users
+
+        Условия записаны так, чтобы SQLite мог использовать индексы:
+        частичные индексы по blocked_at IS NULL, индексы по age_group,
+        last_activity и registration_date.
+
+        :return: (условие, параметры); пустой сегмент дает "1"
+        """
+        now = datetime.datetime.now()
+        conditions = []
+        params: List[Any] = []
+
+        if self.deliverable is True:
+            conditions.append("blocked_at IS NULL")
+        elif self.deliverable is False:
+            conditions.append("blocked_at IS NOT NULL")
+
+        if self.age_groups:
+            conditions.append(f"age_group IN ({', '.join('?' for _ in self.age_groups)})")
+            params.extend(self.age_groups)
+
+        if self.premium is not None:
+            active = "(COALESCE(is_premium, 0) = 1 AND (premium_until IS NULL OR premium_until > ?))"
+            conditions.append(active if self.premium else f"NOT {active}")
+            params.append(now.strftime(DATE_FORMAT))
+
+        if self.trial_used is not None:
+            conditions.append("trial_used = 1" if self.trial_used else "COALESCE(trial_used, 0) = 0")
+
+        if self.inactive_days is not None:
+            conditions.append("last_activity < ?")
+            params.append((now - datetime.timedelta(days=self.inactive_days)).strftime(DATE_FORMAT))
+
+        if self.active_days is not None:
+            conditions.append("last_activity >= ?")
+            params.append((now - datetime.timedelta(days=self.active_days)).strftime(DATE_FORMAT))
+
+        if self.registered_after is not None:
+            conditions.append("registration_date >= ?")
+            params.append(self.registered_after)
+
+        if self.registered_before is not None:
+            conditions.append("registration_date < ?")
+            params.append(self.registered_before)
+
+        return (" AND ".join(conditions) or "1"), params
+
+    def without_delivery_filter(self) -> "Segment":
+        """Тот же сегмент без учета блокировки (для подсчета пропущенных)"""
+        data = self.to_dict()
+        data["deliverable"] = None
+        return Segment.from_dict(data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "Segment":
+        if data is None:
+            return cls()
+        params = {field: data[field] for field in cls.FIELDS if field in data}
+        params.setdefault("deliverable", None)
+        return cls(**params)
+
+    def describe(self) -> str:
+        """Описание сегмента для администратора"""
+        parts = []
+        if self.age_groups:
+            parts.append(f"возраст {', '.join(self.age_groups)}")
+        if self.premium is not None:
+            parts.append("с подпиской" if self.premium else "без подписки")
+        if self.trial_used is not None:
+            parts.append("пробный период использован" if self.trial_used else "без пробного периода")
+        if self.inactive_days is not None:
+            parts.append(f"не заходили {self.inactive_days}+ дн.")
+        if self.active_days is not None:
+            parts.append(f"заходили за {self.active_days} дн.")
+        if self.registered_after is not None:
+            parts.append(f"зарегистрированы с {self.registered_after[:10]}")
+        if self.registered_before is not None:
+            parts.append(f"зарегистрированы до {self.registered_before[:10]}")
+        return ", ".join(parts) or "все пользователи"
+
+    def __repr__(self) -> str:
+        return f"Segment({self.to_dict()})"
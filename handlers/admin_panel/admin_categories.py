@@ -1,10 +1,11 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 
-from utils.s3_service import get_url
+from utils.access_tree import access_tree
 from utils.library import bot
+from utils.callback_routing import CallbackExact, CallbackPrefix
 
 router = Router()
 
@@ -13,7 +14,7 @@ class AdminContent(StatesGroup):
     browsing_folder = State()
 
 
-@router.callback_query(F.data == 'admin_category')
+@router.callback_query(CallbackExact('admin_category'))
 async def admin_category(query: CallbackQuery):
     await bot.delete_message(chat_id=query.message.chat.id,
                              message_id=query.message.message_id)
@@ -40,7 +41,7 @@ async def admin_category(query: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("admin_age_"))
+@router.callback_query(CallbackPrefix("admin_age_"), flags={"heavy": True})
 async def admin_age(query: CallbackQuery, state: FSMContext):
     age_group = query.data.split('_')[2]
 
@@ -53,11 +54,14 @@ async def admin_age(query: CallbackQuery, state: FSMContext):
         path_stack=[base_path]
     )
 
+    # Администратор видит актуальный каталог: перечитываем его при входе в раздел
+    await access_tree.rebuild()
+
     await bot.delete_message(query.message.chat.id, query.message.message_id)
     await show_folder_contents(query, state)
 
 
-@router.callback_query(F.data == "admin_nav_back")
+@router.callback_query(CallbackExact("admin_nav_back"), flags={"heavy": True})
 async def admin_nav_back(query: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     path_stack = data.get("path_stack", [])
@@ -73,7 +77,7 @@ async def admin_nav_back(query: CallbackQuery, state: FSMContext):
     await show_folder_contents(query, state)
 
 
-@router.callback_query(F.data.startswith("admin_folder_"))
+@router.callback_query(CallbackPrefix("admin_folder_"), flags={"heavy": True})
 async def admin_open_folder(query: CallbackQuery, state: FSMContext):
     folder_name = query.data.split("_", 2)[2]
     data = await state.get_data()
@@ -90,40 +94,26 @@ async def admin_open_folder(query: CallbackQuery, state: FSMContext):
 
 
 async def show_folder_contents(query: CallbackQuery, state: FSMContext):
-    from main import db
     data = await state.get_data()
     path = data["current_path"]
     age_group = data["age_group"]
 
-    items = await get_url(path)
-
-    subfolders = [item for item in items if item.type == 'dir']
-    files = [item for item in items if item.type == 'file']
-    locked = db.get_all_locked_categories()
+    await access_tree.ensure_built()
+    node = access_tree.get(path)
+    subfolders = node.subfolders if node else []
+    files = node.files if node else []
     folder_name = path.split("/")[-1]
 
     # === 🧠 Авторазблокировка родителя, если есть хотя бы одна открыт. подпапка ===
-    unlocked_subfolder_exists = any(folder.name not in locked for folder in subfolders)
-    if unlocked_subfolder_exists and folder_name in locked:
-        db.remove_locked_category(folder_name)
-        locked.remove(folder_name)
+    unlocked_subfolder_exists = any(not folder.own for folder in subfolders)
+    if unlocked_subfolder_exists and node and node.own:
+        access_tree.set_locked(path, False)
 
     buttons = []
 
-    # === Подпапки ===
-    # === Подпапки с корректной иконкой (по содержимому) ===
+    # === Подпапки с корректной иконкой (замок рассчитан деревом доступа) ===
     for folder in subfolders:
-        folder_path = f"{path}/{folder.name}"
-        subitems = await get_url(folder_path)
-        sub_subfolders = [item for item in subitems if item.type == 'dir']
-
-        # Проверка: все ли подпапки внутри этой папки заблокированы
-        if sub_subfolders:
-            all_sub_locked = all(sub.name in locked for sub in sub_subfolders)
-            icon = "❌" if all_sub_locked else "✅"
-        else:
-            # Если подпапок нет — ориентируемся на саму папку
-            icon = "❌" if folder.name in locked else "✅"
+        icon = "❌" if folder.locked else "✅"
 
         buttons.append([InlineKeyboardButton(
             text=f"{folder.name} {icon}",
@@ -132,7 +122,7 @@ async def show_folder_contents(query: CallbackQuery, state: FSMContext):
 
     # === 🔁 Кнопка "Заблокировать все / Разблокировать все"
     if subfolders and path != f"/Контент/{age_group}/Полезное":
-        all_locked = all(folder.name in locked for folder in subfolders)
+        all_locked = all(folder.own for folder in subfolders)
         if all_locked:
             btn_text = "✅ Разблокировать все"
             btn_data = "unlock_all"
@@ -145,8 +135,8 @@ async def show_folder_contents(query: CallbackQuery, state: FSMContext):
         ])
 
     # === Кнопка блокировки текущей папки ===
-    if files or not items:  # ← разрешаем блокировку даже если папка пуста
-        if folder_name in locked:
+    if files or not subfolders:  # ← разрешаем блокировку даже если папка пуста
+        if node and node.own:
             lock_btn = InlineKeyboardButton(
                 text="✅ Разблокировать эту папку",
                 callback_data=f"toggle_lock_{folder_name}"
@@ -172,36 +162,27 @@ async def show_folder_contents(query: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("toggle_lock_"))
+@router.callback_query(CallbackPrefix("toggle_lock_"), flags={"heavy": True})
 async def toggle_lock(query: CallbackQuery, state: FSMContext):
-    from main import db
-    folder_name = query.data.split("_", 2)[2]
+    data = await state.get_data()
+    path = data["current_path"]
 
-    if db.is_category_locked(folder_name):
-        db.remove_locked_category(folder_name)
-    else:
-        db.add_locked_category(folder_name)
+    # Замок хранится по полному пути: одинаковые имена в разных возрастах не пересекаются
+    node = access_tree.get(path)
+    access_tree.set_locked(path, not (node and node.own))
 
     await bot.delete_message(query.message.chat.id, query.message.message_id)
     await show_folder_contents(query, state)
 
 
-@router.callback_query(F.data.in_(["lock_all", "unlock_all"]))
+@router.callback_query(CallbackExact("lock_all", "unlock_all"), flags={"heavy": True})
 async def toggle_all_subfolders(query: CallbackQuery, state: FSMContext):
-    from main import db
     data = await state.get_data()
     path = data["current_path"]
-    items = await get_url(path)
-    subfolders = [item for item in items if item.type == 'dir']
-
-    if query.data == "lock_all":
-        for folder in subfolders:
-            if not db.is_category_locked(folder.name):
-                db.add_locked_category(folder.name)
-    else:  # unlock_all
-        for folder in subfolders:
-            if db.is_category_locked(folder.name):
-                db.remove_locked_category(folder.name)
+    node = access_tree.get(path)
+    subfolders = node.subfolders if node else []
+
+    access_tree.set_many((folder.path for folder in subfolders), query.data == "lock_all")
 
     await bot.delete_message(query.message.chat.id, query.message.message_id)
     await show_folder_contents(query, state)
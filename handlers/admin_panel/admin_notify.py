@@ -1,11 +1,15 @@
+import datetime
 from typing import Union
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 import logging
 
 from utils.library import bot
+from utils.callback_routing import CallbackExact, CallbackPrefix
+from utils.broadcast import broadcast_manager
+from database.segments import Segment
 
 
 router = Router()
@@ -17,6 +21,23 @@ class NotifyState(StatesGroup):
     confirmation = State()
 
 
+# Готовые аудитории рассылки: ключ -> (название, фабрика сегмента)
+AUDIENCES = {
+    "all": ("Все пользователи", lambda: Segment()),
+    "age_0-3": ("Возраст 0-3", lambda: Segment(age_groups=["0-3"])),
+    "age_4-6": ("Возраст 4-6", lambda: Segment(age_groups=["4-6"])),
+    "age_7-10": ("Возраст 7-10", lambda: Segment(age_groups=["7-10"])),
+    "premium": ("С подпиской", lambda: Segment(premium=True)),
+    "free": ("Без подписки", lambda: Segment(premium=False)),
+    "no_trial": ("Не пробовали подписку", lambda: Segment(premium=False, trial_used=False)),
+    "inactive_7": ("Не заходили 7+ дней", lambda: Segment(inactive_days=7)),
+    # registration_date заполняется CURRENT_TIMESTAMP, то есть в UTC
+    "new_7": ("Новые за 7 дней", lambda: Segment(
+        registered_after=datetime.datetime.utcnow() - datetime.timedelta(days=7)
+    )),
+}
+
+
 async def cleanup_chat(chat_id: int, message_ids: list):
     """Удаление нескольких сообщений в чате"""
     for msg_id in message_ids:
@@ -29,7 +50,7 @@ async def cleanup_chat(chat_id: int, message_ids: list):
 
 
 
-@router.callback_query(F.data == "admin_notify")
+@router.callback_query(CallbackExact("admin_notify"))
 async def notify_start(query: CallbackQuery, state: FSMContext):
     """Начало процесса создания рассылки"""
     from main import db
@@ -99,7 +120,7 @@ async def notify_get_text(message: Message, state: FSMContext):
 
 
 
-@router.callback_query(F.data == "skip_media", NotifyState.waiting_for_media)
+@router.callback_query(CallbackExact("skip_media"), NotifyState.waiting_for_media)
 async def skip_media(query: CallbackQuery, state: FSMContext):
     """Пропуск медиа"""
     try:
@@ -181,16 +202,11 @@ async def show_confirmation(update: Union[Message, CallbackQuery], state: FSMCon
         sent_message = await bot.send_message(chat_id=update.from_user.id, text=text)
         preview_message_id = sent_message.message_id
 
-    # Кнопки подтверждения
-    menu_buttons = [
-        [InlineKeyboardButton(text="Отправить рассылку ✅", callback_data="confirm_send")],
-        [InlineKeyboardButton(text="Отмена 🚫", callback_data="admin_cancel")]
-    ]
-    menu = InlineKeyboardMarkup(inline_keyboard=menu_buttons)
-
+    audience = data.get("audience", "all")
+    text, menu = confirmation_view(audience)
     confirm_msg = await bot.send_message(
         chat_id=update.from_user.id,
-        text="🔍 Вот как будет выглядеть ваше сообщение. Подтвердите отправку:",
+        text=text,
         reply_markup=menu
     )
 
@@ -199,71 +215,125 @@ async def show_confirmation(update: Union[Message, CallbackQuery], state: FSMCon
     await state.update_data(
         preview_message_id=preview_message_id,
         confirm_message_id=confirm_msg.message_id,
+        audience=audience,
         messages_to_delete=[]
     )
 
 
+def confirmation_view(audience: str):
+    """Текст и кнопки подтверждения с выбранной аудиторией и ее размером"""
+    from main import db
+    title, make_segment = AUDIENCES[audience]
+    count = db.count_segment(make_segment())
+
+    text = (
+        f"🔍 Вот как будет выглядеть ваше сообщение.\n\n"
+        f"👥 Аудитория: {title}\n"
+        f"📨 Получателей: {count}\n\n"
+        f"Подтвердите отправку:"
+    )
+    menu_buttons = [
+        [InlineKeyboardButton(text="Отправить рассылку ✅", callback_data="confirm_send")],
+        [InlineKeyboardButton(text="Выбрать аудиторию 👥", callback_data="notify_audience")],
+        [InlineKeyboardButton(text="Отмена 🚫", callback_data="admin_cancel")]
+    ]
+    return text, InlineKeyboardMarkup(inline_keyboard=menu_buttons)
+
+
+@router.callback_query(CallbackExact("notify_audience"), NotifyState.confirmation)
+async def choose_audience(query: CallbackQuery, state: FSMContext):
+    """Список готовых аудиторий"""
+    buttons = [
+        InlineKeyboardButton(text=title, callback_data=f"notify_segment_{key}")
+        for key, (title, _) in AUDIENCES.items()
+    ]
+    menu_buttons = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    menu_buttons.append([InlineKeyboardButton(text="Отмена 🚫", callback_data="admin_cancel")])
+
+    await query.message.edit_text(
+        "👥 Кому отправить рассылку?",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=menu_buttons)
+    )
+    await query.answer()
+
+
+@router.callback_query(CallbackPrefix("notify_segment_"), NotifyState.confirmation)
+async def set_audience(query: CallbackQuery, state: FSMContext):
+    """Выбор аудитории и возврат к подтверждению"""
+    audience = query.data[len("notify_segment_"):]
+    if audience not in AUDIENCES:
+        await query.answer()
+        return
+
+    await state.update_data(audience=audience)
+    text, menu = confirmation_view(audience)
+    await query.message.edit_text(text, reply_markup=menu)
+    await query.answer()
+
+
 
 
-@router.callback_query(F.data == "confirm_send", NotifyState.confirmation)
+@router.callback_query(CallbackExact("confirm_send"), NotifyState.confirmation)
 async def confirm_send(query: CallbackQuery, state: FSMContext):
-    """Подтверждение и отправка рассылки"""
+    """Подтверждение и запуск рассылки в фоне"""
     from main import db
+    if not db.is_admin(query.from_user.id):
+        return
+
     data = await state.get_data()
-    text = data.get("text")
-    media_type = data.get("media_type")
-    media_id = data.get("media_id")
     preview_message_id = data.get("preview_message_id")
-    confirm_message_id = data.get("confirm_message_id")
 
-    # Удаляем сообщения предпросмотра и подтверждения
-    await cleanup_chat(query.from_user.id, [preview_message_id, confirm_message_id])
+    # Предпросмотр остается в чате: рассылка копирует его без повторной загрузки медиа
+    await cleanup_chat(query.from_user.id, [data.get("confirm_message_id")])
+    await state.clear()
 
-    users = db.get_all_users()
-    total_users = len(users)
-    success = 0
-    failed = 0
+    _, make_segment = AUDIENCES.get(data.get("audience"), AUDIENCES["all"])
+
+    # Прогресс и кнопки управления — в отдельном сообщении, обработчик сразу освобождается
+    job_id = await broadcast_manager.create(
+        admin_id=query.from_user.id,
+        text=data.get("text"),
+        media_type=data.get("media_type"),
+        media_id=data.get("media_id"),
+        source_chat_id=query.from_user.id if preview_message_id else None,
+        source_message_id=preview_message_id,
+        segment=make_segment()
+    )
+    logging.info(f"Администратор {query.from_user.id} запустил рассылку #{job_id}")
 
-    for user in users:
-        try:
-            if media_type == "photo":
-                await bot.send_photo(user['user_id'], media_id, caption=text)
-            elif media_type == "video":
-                await bot.send_video(user['user_id'], media_id, caption=text)
-            elif media_type == "document":
-                await bot.send_document(user['user_id'], media_id, caption=text)
-            elif media_type == "audio":
-                await bot.send_audio(user['user_id'], media_id, caption=text)
-            else:
-                await bot.send_message(user['user_id'], text)
-            success += 1
-        except Exception as e:
-            logging.error(f"Ошибка при отправке {user['user_id']}: {e}")
-            failed += 1
 
-    # Итоговое сообщение
-    menu_buttons = [
-        [InlineKeyboardButton(text="Вернуться в админ-панель ⏪", callback_data="admin_panel")]
-    ]
-    menu = InlineKeyboardMarkup(inline_keyboard=menu_buttons)
+@router.callback_query(CallbackPrefix("broadcast_"))
+async def broadcast_control(query: CallbackQuery):
+    """Пауза, продолжение и отмена рассылки"""
+    from main import db
+    if not db.is_admin(query.from_user.id):
+        return
 
-    result_text = (
-        f"📤 Рассылка завершена!\n\n"
-        f"✅ Успешно: {success}\n"
-        f"❌ Не удалось: {failed}\n"
-        f"📊 Охват: {success / total_users * 100:.1f}%"
-    )
+    try:
+        _, action, job_id = query.data.split("_")
+        job_id = int(job_id)
+    except ValueError:
+        logging.error(f"Ошибка разбора callback_data в broadcast_control: {query.data}")
+        await query.answer()
+        return
 
-    await bot.send_message(
-        chat_id=query.from_user.id,
-        text=result_text,
-        reply_markup=menu
-    )
+    actions = {
+        "pause": (broadcast_manager.pause, "Рассылка приостановлена ⏸"),
+        "resume": (broadcast_manager.resume, "Рассылка продолжена ▶️"),
+        "cancel": (broadcast_manager.cancel, "Рассылка отменена ⛔️"),
+    }
+    if action not in actions:
+        await query.answer()
+        return
 
-    await state.clear()
+    handler, done_text = actions[action]
+    if await handler(job_id):
+        await query.answer(done_text)
+    else:
+        await query.answer("Рассылка уже завершена или в другом состоянии", show_alert=True)
 
 
-@router.callback_query(F.data == "admin_cancel")
+@router.callback_query(CallbackExact("admin_cancel"))
 async def admin_cancel(query: CallbackQuery, state: FSMContext):
     """Отмена рассылки и очистка состояния"""
     data = await state.get_data()
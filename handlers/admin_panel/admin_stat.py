@@ -1,6 +1,7 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from utils.library import bot
+from utils.callback_routing import CallbackExact
 from datetime import datetime, timedelta
 from collections import Counter
 
@@ -137,7 +138,7 @@ async def get_statistics_message(db) -> str:
     
     return message
 
-@router.callback_query(F.data == 'admin_stat')
+@router.callback_query(CallbackExact('admin_stat'))
 async def admin_stat(query: CallbackQuery):
     await bot.delete_message(chat_id=query.message.chat.id,
                            message_id=query.message.message_id)
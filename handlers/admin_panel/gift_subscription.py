@@ -1,8 +1,9 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from utils.library import bot
+from utils.callback_routing import CallbackExact, CallbackPrefix
 from database.database import db
 from handlers.admin_panel.error_notify import notify_admins
 from utils.logger import get_logger
@@ -17,7 +18,7 @@ class GiftSubscriptionState(StatesGroup):
 
 MAIN_ADMIN_ID = 768903494
 
-@router.callback_query(F.data == "admin_gift_subscription")
+@router.callback_query(CallbackExact("admin_gift_subscription"))
 async def gift_subscription_start(query: CallbackQuery, state: FSMContext):
     """Начало процесса дарения подписки"""
     if query.from_user.id != MAIN_ADMIN_ID:
@@ -124,7 +125,7 @@ async def process_username(message: Message, state: FSMContext):
     )
     await state.set_state(GiftSubscriptionState.waiting_for_duration)
 
-@router.callback_query(lambda c: c.data.startswith('gift_duration_'))
+@router.callback_query(CallbackPrefix('gift_duration_'))
 async def process_duration(query: CallbackQuery, state: FSMContext):
     """Обработка выбранной длительности подписки"""
     if query.from_user.id != MAIN_ADMIN_ID:
@@ -1,18 +1,41 @@
-import logging
 import asyncio
+import hashlib
+import logging
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from aiogram import Bot
 from database.database import Database
+from database.segments import Segment
+from utils.send_gateway import BULK, run_bulk, send_gateway
+
+PLAN_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # время в плане — московское
+EXPIRE_GRACE_MINUTES = 60  # сколько ждать после конца окна, прежде чем отменить неотправленное
+MIN_BATCH = 1
+BATCH_STEP = 5
 
 class InactiveUserNotifier:
-    def __init__(self, bot: Bot, db: Database):
+    def __init__(self, bot: Bot, db: Database, inactive_days: int = 2, window_minutes: int = 180,
+                 tick_seconds: float = 5.0, max_batch: int = 100):
+        """
+        Args:
+            inactive_days (int): Через сколько дней без активности отправлять напоминание
+            window_minutes (int): Окно, на которое растягивается кампания после времени запуска
+            tick_seconds (float): Как часто проверять план отправки
+            max_batch (int): Максимум отправок за одну проверку
+        """
         self.bot = bot
         self.db = db
+        self.inactive_days = inactive_days
+        self.window_minutes = window_minutes
+        self.tick_seconds = tick_seconds
+        self.max_batch = max_batch
+        self.batch_limit = max(MIN_BATCH, max_batch // 4)
         self.scheduler = AsyncIOScheduler()
         self.moscow_tz = pytz.timezone('Europe/Moscow')
+        self._campaigns = set()
+        self._task = None
         
         # Тексты уведомлений
         self.notifications = {
@@ -58,15 +81,16 @@ class InactiveUserNotifier:
             id="friday_notification"
         )
         
-        # Запуск планировщика
+        # Запуск планировщика и отправки по плану (незавершенные кампании продолжаются после рестарта)
         self.scheduler.start()
+        self._task = asyncio.create_task(self._deliver_loop())
         logging.info(f"Планировщик уведомлений запущен. Следующие уведомления:")
         for job in self.scheduler.get_jobs():
             next_run = job.next_run_time.astimezone(self.moscow_tz).strftime("%d.%m.%Y %H:%M:%S")
             logging.info(f"- {job.id}: {next_run} (МСК)")
     
     async def send_notification(self, notification_type: str):
-        """Отправляет уведомления неактивным пользователям.
+        """Строит план отправки кампании: каждому неактивному пользователю — свое время в окне.
         
         Args:
             notification_type (str): Тип уведомления ('tuesday' или 'friday')
@@ -75,40 +99,94 @@ class InactiveUserNotifier:
             logging.error(f"Неизвестный тип уведомления: {notification_type}")
             return
         
-        notification_text = self.notifications[notification_type]["text"]
-        logging.info(f"Отправка уведомлений ({notification_type})...")
+        now = datetime.now(self.moscow_tz)
+        campaign = f"{notification_type}:{now.strftime('%Y-%m-%d')}"
+        logging.info(f"Планирование уведомлений ({campaign}) на {self.window_minutes} мин...")
         
-        # Получаем неактивных более 2 дней пользователей
-        inactive_users = self.db.get_inactive_users(days=2)
+        # Неактивные пользователи (заблокировавшие бота пропускаются)
+        segment = Segment(inactive_days=self.inactive_days)
+        skipped_count = self.db.count_segment(Segment(inactive_days=self.inactive_days, deliverable=False))
+        user_ids = list(self.db.iter_segment_ids(segment))
         
-        if not inactive_users:
-            logging.info("Нет неактивных пользователей для отправки уведомлений")
+        if not user_ids:
+            logging.info(f"Нет неактивных пользователей для отправки уведомлений (пропущено заблокировавших: {skipped_count})")
             return
         
-        success_count = 0
-        error_count = 0
-        
-        for user in inactive_users:
-            user_id = user["user_id"]
+        plan = [
+            (user_id, (now + timedelta(seconds=self.jitter(campaign, user_id))).strftime(PLAN_TIME_FORMAT))
+            for user_id in user_ids
+        ]
+        added = self.db.add_notification_plan(campaign, plan)
+        logging.info(f"Кампания {campaign}: запланировано {added} из {len(user_ids)}, "
+                     f"пропущено заблокировавших: {skipped_count}")
+        self._campaigns.add(campaign)
+
+    def jitter(self, campaign: str, user_id: int) -> int:
+        """Детерминированная задержка пользователя внутри окна (одинакова после рестарта)"""
+        digest = hashlib.sha256(f"{campaign}:{user_id}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") % max(1, self.window_minutes * 60)
+
+    async def _deliver_loop(self):
+        """Отправляет напоминания, время которых наступило, подстраивая темп под ответы 429"""
+        while True:
             try:
-                # Отправка уведомления пользователю
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=notification_text
-                )
-                success_count += 1
-                
-                # Небольшая задержка между отправками, чтобы не получить блокировку от Telegram
-                # Для больших баз данных рекомендуется увеличить задержку
-                await asyncio.sleep(0.05)
-                
+                await self._deliver_due()
             except Exception as e:
-                logging.error(f"Ошибка при отправке уведомления пользователю {user_id}: {e}")
-                error_count += 1
-        
-        logging.info(f"Отправка уведомлений завершена. Успешно: {success_count}, ошибок: {error_count}")
+                logging.error(f"Ошибка при отправке запланированных уведомлений: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    async def _deliver_due(self):
+        now = datetime.now(self.moscow_tz)
+        # Напоминания, не отправленные до конца окна с запасом (бот был выключен), уже неактуальны
+        expired = self.db.expire_notifications(
+            (now - timedelta(minutes=self.window_minutes + EXPIRE_GRACE_MINUTES)).strftime(PLAN_TIME_FORMAT)
+        )
+        if expired:
+            logging.info(f"Просрочено запланированных уведомлений: {expired}")
+
+        due = self.db.get_due_notifications(now.strftime(PLAN_TIME_FORMAT), self.batch_limit)
+        if not due:
+            self._report_finished()
+            return
+
+        retry_after_before = send_gateway.retry_after_events[BULK]
+
+        async def send_to(item) -> None:
+            campaign, user_id = item
+            self._campaigns.add(campaign)
+            notification = self.notifications.get(campaign.split(":")[0])
+            if notification is None:
+                self.db.set_notification_status(campaign, user_id, "failed")
+                return
+            try:
+                await self.bot.send_message(chat_id=user_id, text=notification["text"])
+            except Exception:
+                self.db.set_notification_status(campaign, user_id, "failed")
+                raise
+            self.db.set_notification_status(campaign, user_id, "sent")
+
+        await run_bulk(due, send_to)
+
+        # AIMD: при 429 темп падает вдвое, без них — растет понемногу
+        if send_gateway.retry_after_events[BULK] > retry_after_before:
+            self.batch_limit = max(MIN_BATCH, self.batch_limit // 2)
+            logging.warning(f"Получены ответы 429, темп уведомлений снижен до {self.batch_limit} за {self.tick_seconds} с")
+        else:
+            self.batch_limit = min(self.max_batch, self.batch_limit + BATCH_STEP)
+
+    def _report_finished(self):
+        """Пишет итог по кампаниям, в которых не осталось ожидающих получателей"""
+        for campaign in list(self._campaigns):
+            stats = self.db.get_notification_stats(campaign)
+            if stats.get("pending"):
+                continue
+            self._campaigns.discard(campaign)
+            logging.info(f"Отправка уведомлений {campaign} завершена. Успешно: {stats.get('sent', 0)}, "
+                         f"ошибок: {stats.get('failed', 0)}, просрочено: {stats.get('expired', 0)}")
     
     async def stop(self):
         """Останавливает планировщик."""
         self.scheduler.shutdown()
+        if self._task:
+            self._task.cancel()
         logging.info("Планировщик уведомлений остановлен") 
\ No newline at end of file
@@ -13,8 +13,10 @@ from aiogram.exceptions import TelegramBadRequest
 from openai import AsyncOpenAI, OpenAIError
 from dotenv import load_dotenv
 
-from database.database import Database
+from database.database import db
 from utils.library import bot # Импортируем bot из library
+from utils.callback_routing import CallbackExact
+from middlewares.user_context import UserContext
 
 from handlers.admin_panel.error_notify import notify_admins
 load_dotenv()
@@ -31,9 +33,6 @@ if https_proxy:
 http_client = httpx.AsyncClient()
 client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
 
-# Инициализация базы данных (предполагаем, что она синглтон или передается)
-db = Database()
-
 router = Router()
 
 # Константы
@@ -59,27 +58,28 @@ finish_keyboard = ReplyKeyboardMarkup(
     one_time_keyboard=False # Оставляем клавиатуру видимой
 )
 
-async def check_and_update_usage(user_id: int) -> bool:
+async def check_and_update_usage(user_context: UserContext) -> bool:
     """Проверяет лимит запросов и обновляет счетчик. Возвращает True, если лимит не превышен."""
-    user = db.get_user(user_id)
-    if not user:
+    user_id = user_context.user_id
+    if not user_context.registered:
         # На всякий случай, если пользователя нет в БД
         db.add_user(user_id)
-        user = db.get_user(user_id)
 
-    is_subscriber = db.is_subscribed(user_id)
-    limit = SUBSCRIBED_LIMIT if is_subscriber else NON_SUBSCRIBED_LIMIT
-    
+    limit = SUBSCRIBED_LIMIT if user_context.is_premium else NON_SUBSCRIBED_LIMIT
+
     today = date.today()
-    usage_count = db.get_ai_usage(user_id, today)
+    usage_count = user_context.ai_usage_today
 
     if usage_count >= limit:
         return False # Лимит превышен
 
     db.increment_ai_usage(user_id, today)
+    # Профиль общий для одновременных сообщений пользователя: счетчик в нем тоже увеличиваем
+    user_context.ai_usage = usage_count + 1
+    user_context.ai_usage_date = today
     return True # Лимит не превышен
 
-@router.callback_query(F.data == "ai_assistant")
+@router.callback_query(CallbackExact("ai_assistant"))
 async def start_ai_assistant(query: CallbackQuery, state: FSMContext):
     """Обработчик входа в режим AI-помощника."""
     user_id = query.from_user.id
@@ -92,9 +92,6 @@ async def start_ai_assistant(query: CallbackQuery, state: FSMContext):
     #     await query.answer("AI помощник доступен только для пользователей с премиум подпиской", show_alert=True)
     #     return
  
-    # Обновляем время последней активности
-    db.update_user_activity(user_id)
-    
     await state.set_state(AIState.in_conversation)
     
     # Удаляем предыдущее сообщение с инлайн-клавиатурой
@@ -121,7 +118,7 @@ async def start_ai_assistant(query: CallbackQuery, state: FSMContext):
     await query.answer() # Закрываем уведомление о нажатии кнопки
 
 @router.message(AIState.in_conversation, F.text == "Завершить диалог")
-async def finish_ai_conversation(message: Message, state: FSMContext):
+async def finish_ai_conversation(message: Message, state: FSMContext, user_context: UserContext):
     """Обработчик кнопки 'Завершить диалог'."""
     # Импортируем show_main_menu здесь
     from handlers.common import show_main_menu
@@ -131,26 +128,22 @@ async def finish_ai_conversation(message: Message, state: FSMContext):
     await message.answer("Рад был помочь! Возвращаю в главное меню.", reply_markup=ReplyKeyboardRemove())
     
     # Получаем возраст пользователя
-    age_group = db.get_user_age(user_id)
+    age_group = user_context.age_group
     
     if age_group:
         # Показываем главное меню с правильными аргументами
-        await show_main_menu(user_id=user_id, age_group=age_group, state=state)
+        await show_main_menu(user_id=user_id, age_group=age_group, state=state, is_premium=user_context.is_premium)
     else:
         # Если возраст не найден
         await message.answer("Не удалось определить вашу возрастную группу. Пожалуйста, используйте /start для настройки.")
 
-@router.message(AIState.in_conversation, F.text & ~F.text.startswith('/')) # Обрабатываем текст, кроме команд
-async def handle_text_message(message: Message, state: FSMContext):
+@router.message(AIState.in_conversation, F.text & ~F.text.startswith('/'), flags={"heavy": True}) # Обрабатываем текст, кроме команд
+async def handle_text_message(message: Message, state: FSMContext, user_context: UserContext):
     """Обработка текстовых сообщений в режиме AI."""
     user_id = message.from_user.id
-    
-    # Обновляем время последней активности
-    from main import db
-    db.update_user_activity(user_id)
-    
+
     # Проверка лимита на каждый запрос
-    if not await check_and_update_usage(user_id):
+    if not await check_and_update_usage(user_context):
         await message.reply(f"Извините, вы достигли дневного лимита в {SUBSCRIBED_LIMIT} запросов к AI-помощнику. Попробуйте завтра.")
         return
 
@@ -234,13 +227,13 @@ async def handle_text_message(message: Message, state: FSMContext):
              print(f"Непредвиденная ошибка при удалении сообщения 'Думаю...': {e}")
 
 
-@router.message(AIState.in_conversation, F.photo)
-async def handle_photo_message(message: Message, state: FSMContext):
+@router.message(AIState.in_conversation, F.photo, flags={"heavy": True})
+async def handle_photo_message(message: Message, state: FSMContext, user_context: UserContext):
     """Обработка сообщений с фото в режиме AI (с использованием Vision модели)."""
     user_id = message.from_user.id
     
     # Проверка лимита
-    if not await check_and_update_usage(user_id):
+    if not await check_and_update_usage(user_context):
         await message.reply(f"Извините, вы достигли дневного лимита в {SUBSCRIBED_LIMIT} запросов к AI-помощнику. Попробуйте завтра.")
         return
 
@@ -327,12 +320,12 @@ async def handle_photo_message(message: Message, state: FSMContext):
         base64_image = None
 
 
-@router.message(AIState.in_conversation, F.voice)
-async def handle_voice_message(message: Message, state: FSMContext):
+@router.message(AIState.in_conversation, F.voice, flags={"heavy": True})
+async def handle_voice_message(message: Message, state: FSMContext, user_context: UserContext):
     """Обработка голосовых сообщений в режиме AI."""
     user_id = message.from_user.id
 
-    if not await check_and_update_usage(user_id):
+    if not await check_and_update_usage(user_context):
         await message.reply(
             f"Извините, вы достигли дневного лимита в {SUBSCRIBED_LIMIT} запросов к AI-помощнику. Попробуйте завтра.")
         return
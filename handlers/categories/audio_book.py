@@ -1,16 +1,17 @@
 from aiogram import Router
-from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, InputMediaAudio
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from utils.library import bot
+from utils.callback_routing import CallbackPrefix
 import logging
-import aiohttp
-import ssl
-import time
-from functools import lru_cache
-from utils.s3_service import get_files, get_folder_contents, generate_download_url
+from utils.s3_service import get_folder_contents, read_object_text
+from utils.media_cache import media_source, remember_message, normalize_etag
+from utils.media_pipeline import deliver_audio, iter_files
+from utils.async_cache import AsyncTTLCache
+from utils.category_lists import category_lists, ListItem
+from utils.screens import Screen
 from handlers.admin_panel.error_notify import notify_admins
-from typing import List, Dict, Any, Optional
-import asyncio
+from typing import List, Dict, Any, Optional, Tuple
 
 router = Router()
 
@@ -18,7 +19,10 @@ router = Router()
 ALLOWED_AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.ogg', '.wav')
 ALLOWED_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
 CACHE_TIMEOUT = 3600  # 1 час в секундах
-MAX_RETRY_ATTEMPTS = 3  # Максимальное количество попыток отправки файла
+DEFAULT_DESCRIPTION = "Описание отсутствует"
+
+# Описания книг по (S3 key, ETag): изменение файла в бакете дает новый ключ кэша
+DESCRIPTION_CACHE = AsyncTTLCache(ttl=CACHE_TIMEOUT, maxsize=500)
 
 def is_audio_file(filename: str) -> bool:
     """Проверяет, является ли файл аудио файлом"""
@@ -27,79 +31,92 @@ def is_audio_file(filename: str) -> bool:
 def is_image_file(filename: str) -> bool:
     """Проверяет, является ли файл изображением"""
     return filename.lower().endswith(ALLOWED_IMAGE_EXTENSIONS)
-@lru_cache(maxsize=100)
-async def get_cached_description(url: str, timestamp: int) -> str:
+
+async def get_cached_description(key: str, etag: Optional[str]) -> str:
     """
     Получает кэшированное описание книги
     
     Args:
-        url (str): URL файла с описанием
-        timestamp (int): Временная метка для инвалидации кэша
+        key (str): Ключ .txt файла с описанием в S3
+        etag (Optional[str]): ETag объекта для инвалидации кэша
         
     Returns:
         str: Текст описания или сообщение об отсутствии описания
     """
-    return await read_txt_content(url)
+    try:
+        description = await DESCRIPTION_CACHE.get_or_load(
+            (key, normalize_etag(etag)),
+            lambda: read_object_text(key)
+        )
+    except Exception as e:
+        logging.error(f"Ошибка при чтении описания {key}: {e}")
+        return DEFAULT_DESCRIPTION
+    return description.strip() or DEFAULT_DESCRIPTION
 
-async def read_txt_content(url: str) -> str:
+def find_book_metadata(files: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
     """
-    Читает содержимое txt файла по URL
+    Находит в содержимом папки книги постер и файл описания
     
     Args:
-        url (str): URL файла для чтения
+        files (List[Dict[str, Any]]): Объекты S3 из папки книги
         
     Returns:
-        str: Содержимое файла или сообщение об ошибке
+        Tuple: (объект постера или None, объект .txt описания или None)
     """
-    try:
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-
-        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.text()
-                else:
-                    logging.error(f"Ошибка при получении файла. Статус: {response.status}")
-                    return "Описание отсутствует"
-    except Exception as e:
-        logging.error(f"Ошибка при чтении txt файла: {e}")
-        return "Описание отсутствует"
+    poster = None
+    description = None
+    for file_info in files:
+        if file_info['Key'].endswith('/'):
+            continue
+        file_name = file_info['Key'].split('/')[-1].lower()
+        if is_image_file(file_name) and poster is None:
+            poster = file_info
+        elif file_name.endswith('.txt') and description is None:
+            description = file_info
+    return poster, description
 
-async def send_book(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int) -> None:
+async def warn_no_books(age_group: str) -> None:
+    logging.warning(f"Не найдены книги для возрастной группы {age_group}")
+
+@category_lists.register("books", "Контент/{age_group}/Аудиокниги/", on_empty=warn_no_books)
+def books_list(age_group: str, items: List[ListItem]) -> Screen:
     """
-    Отправляет список книжных категорий
+    Список книжных категорий для возраста
     
     Args:
-        user_id (int): ID пользователя
-        state (FSMContext): Состояние FSM
         age_group (str): Возрастная группа
-        message_id_to_edit (int): ID сообщения для редактирования
+        items (List[ListItem]): ID и имена папок и файлов раздела
+        
+    Returns:
+        Screen: Текст и клавиатура списка
     """
-    file_path = f"Контент/{age_group}/Аудиокниги/"
-    buttons_data, item_names = await get_files(file_path, age_group, "checkbook_")
-
-    if not item_names:
-        logging.warning(f"Не найдены книги для возрастной группы {age_group}")
-
-    await state.update_data(books_item_names=item_names)
-
-    # Преобразуем данные в кнопки
-    buttons = [
-        InlineKeyboardButton(text=btn['text'], callback_data=btn['callback_data'])
-        for btn in buttons_data
-    ]
-
     back_button = InlineKeyboardButton(text="Назад в меню ⬅️", callback_data="back_to_main")
 
-    if not buttons:
+    if not items:
         text = "К сожалению, книги для этого возраста пока не добавлены. 😔"
         keyboard = InlineKeyboardMarkup(inline_keyboard=[[back_button]])
     else:
         text = "Выберите категорию книг которую вы желаете послушать:"
+        buttons = [
+            InlineKeyboardButton(text=name, callback_data=f"checkbook_{content_id}_{age_group}")
+            for content_id, name in items
+        ]
         buttons.append(back_button)
         keyboard = InlineKeyboardMarkup(inline_keyboard=[[button] for button in buttons])
+    return Screen(text, keyboard)
+
+async def send_book(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int) -> None:
+    """
+    Отправляет список книжных категорий
+    
+    Args:
+        user_id (int): ID пользователя
+        state (FSMContext): Состояние FSM
+        age_group (str): Возрастная группа
+        message_id_to_edit (int): ID сообщения для редактирования
+    """
+    listing = await category_lists.get("books", age_group)
+    text, keyboard = listing.text, listing.keyboard
 
     try:
         await bot.edit_message_text(
@@ -118,21 +135,17 @@ async def send_book(user_id: int, state: FSMContext, age_group: str, message_id_
         new_msg = await bot.send_message(user_id, text, reply_markup=keyboard)
         await state.update_data(message_to_delete=new_msg.message_id)
 
-async def send_audio_files(user_id: int, state: FSMContext) -> None:
+async def send_audio_files(user_id: int, name: Optional[str], folder_path: Optional[str]) -> None:
     """
     Отправляет аудиофайлы книги
     
     Args:
         user_id (int): ID пользователя
-        state (FSMContext): Состояние FSM
+        name (Optional[str]): Название книги
+        folder_path (Optional[str]): Папка книги в S3
     """
-    data = await state.get_data()
-    name = data.get('current_book_name')
-    folder_path = data.get('current_book_path')
-    files = data.get('book_files')
-    
-    if not all([name, folder_path, files]):
-        logging.error(f"Отсутствуют необходимые данные: name={name}, path={folder_path}, files={bool(files)}")
+    if not all([name, folder_path]):
+        logging.error(f"Отсутствуют необходимые данные: name={name}, path={folder_path}")
         await bot.send_message(
             chat_id=user_id,
             text="Произошла ошибка при получении данных книги. Попробуйте выбрать книгу заново.",
@@ -142,13 +155,36 @@ async def send_audio_files(user_id: int, state: FSMContext) -> None:
         )
         return
 
-    media_group = []
+    found_files = 0
     sent_files = 0
     errors = []
+    status_message = None
+
+    try:
+        status_message = await bot.send_message(
+            chat_id=user_id,
+            text=f"Загружаем книжку \"{name}\"..."
+        )
+
+        # Главы готовятся параллельно и уходят группами по 10, пока готовятся следующие
+        found_files, sent_files = await deliver_audio(
+            user_id,
+            iter_files(folder_path, is_audio_file),
+            errors,
+            caption=f"{name} 🎧"
+        )
+    except Exception as e:
+        logging.error(f"Ошибка при отправке книги '{name}': {e}")
+        errors.append(f"Ошибка при отправке книги: {str(e)}")
+    finally:
+        if status_message:
+            try:
+                await status_message.delete()
+            except Exception as e:
+                logging.warning(f"Не удалось удалить сообщение о статусе: {e}")
 
     # Проверяем наличие аудиофайлов
-    audio_files = [f for f in files if not f['Key'].endswith('/') and is_audio_file(f['Key'].split('/')[-1])]
-    if not audio_files:
+    if found_files == 0 and not errors:
         logging.error(f"Нет аудиофайлов в книге '{name}' по пути {folder_path}")
         await bot.send_message(
             chat_id=user_id,
@@ -160,79 +196,6 @@ async def send_audio_files(user_id: int, state: FSMContext) -> None:
         await notify_admins(f"Ошибка: В книге '{name}' нет аудиофайлов")
         return
 
-    # Подготавливаем аудиофайлы
-    for file_info in audio_files:
-        for attempt in range(MAX_RETRY_ATTEMPTS):
-            try:
-                file_url = await generate_download_url(file_info['Key'])
-                audio = InputMediaAudio(
-                    media=file_url,
-                    caption=f"{name} 🎧" if len(media_group) == 0 else None,
-                    title=file_info['Key'].split('/')[-1]
-                )
-                media_group.append(audio)
-                break
-            except Exception as e:
-                if attempt == MAX_RETRY_ATTEMPTS - 1:
-                    errors.append(f"Ошибка при подготовке {file_info['Key']}: {str(e)}")
-                    logging.error(f"Не удалось подготовить файл после {MAX_RETRY_ATTEMPTS} попыток: {e}")
-                else:
-                    await asyncio.sleep(1)  # Пауза перед повторной попыткой
-                continue
-
-    if media_group:
-        total_groups = len(media_group) // 10 + (1 if len(media_group) % 10 else 0)
-        status_message = None
-
-        try:
-            for i in range(0, len(media_group), 10):
-                current_group = i // 10 + 1
-                
-                if status_message:
-                    try:
-                        await status_message.edit_text(f"Загружаем книжку \"{name}\"...")
-                    except Exception as e:
-                        logging.warning(f"Не удалось обновить статус отправки: {e}")
-                else:
-                    status_message = await bot.send_message(
-                        chat_id=user_id,
-                        text=f"Загружаем книжку \"{name}\"..."
-                    )
-
-                for retry in range(MAX_RETRY_ATTEMPTS):
-                    try:
-                        await bot.send_media_group(
-                            chat_id=user_id,
-                            media=media_group[i:i + 10]
-                        )
-                        sent_files += len(media_group[i:i + 10])
-                        break
-                    except Exception as e:
-                        if retry == MAX_RETRY_ATTEMPTS - 1:
-                            logging.error(f"Ошибка при отправке группы аудио: {e}")
-                            # Пробуем отправить по одному
-                            for audio in media_group[i:i + 10]:
-                                try:
-                                    await bot.send_audio(
-                                        chat_id=user_id,
-                                        audio=audio.media,
-                                        caption=audio.caption,
-                                        title=audio.title
-                                    )
-                                    sent_files += 1
-                                except Exception as single_error:
-                                    errors.append(f"Ошибка при отправке {audio.title}: {str(single_error)}")
-                        else:
-                            await asyncio.sleep(1)  # Пауза перед повторной попыткой
-                            continue
-
-        finally:
-            if status_message:
-                try:
-                    await status_message.delete()
-                except Exception as e:
-                    logging.warning(f"Не удалось удалить сообщение о статусе: {e}")
-
     if sent_files > 0:
         await bot.send_message(
             chat_id=user_id,
@@ -253,7 +216,7 @@ async def send_audio_files(user_id: int, state: FSMContext) -> None:
         )
         await notify_admins(f"Ошибка⚠️\nНе удалось отправить книгу '{name}'.\nОшибки:\n{error_msg}")
 
-@router.callback_query(lambda c: c.data.startswith('checkbook_'))
+@router.callback_query(CallbackPrefix('checkbook_'), flags={"heavy": True})
 async def check_book(query: CallbackQuery, state: FSMContext) -> None:
     """
     Обрабатывает выбор конкретной книжной категории
@@ -263,23 +226,20 @@ async def check_book(query: CallbackQuery, state: FSMContext) -> None:
         state (FSMContext): Состояние FSM
     """
     try:
-        _, index_str, type_age = query.data.split("_")
-        item_index = int(index_str)
+        _, content_id, type_age = query.data.split("_")
     except ValueError:
         logging.error(f"Ошибка разбора callback_data в check_books: {query.data}")
         await query.answer("Ошибка данных. Попробуйте еще раз.")
         return
 
-    data = await state.get_data()
-    item_names = data.get('books_item_names')
+    name = await category_lists.resolve("books", type_age, content_id)
 
-    if not item_names or item_index >= len(item_names):
-        logging.error(f"Не найден список имен или индекс вне диапазона: index={item_index}, names={item_names}")
+    if name is None:
+        logging.error(f"Элемент {content_id} не найден в разделе books для возраста {type_age}")
         await query.answer("Ошибка получения данных. Пожалуйста, вернитесь в меню и попробуйте снова.")
         await send_book(query.from_user.id, state, type_age, query.message.message_id)
         return
 
-    name = item_names[item_index]
     folder_path = f"Контент/{type_age}/Аудиокниги/{name}/"
 
     try:
@@ -304,32 +264,20 @@ async def check_book(query: CallbackQuery, state: FSMContext) -> None:
         await send_book(query.from_user.id, state, type_age, loading_message.message_id)
         return
 
-    await state.update_data(
-        current_book_name=name,
-        current_book_path=folder_path,
-        book_files=files
-    )
-
     poster_url = None
-    description = "Описание отсутствует"
-    timestamp = int(time.time() / CACHE_TIMEOUT)
+    poster_source = None
+    description = DEFAULT_DESCRIPTION
+    poster_info, description_info = find_book_metadata(files)
 
-    for file_info in files:
-        if file_info['Key'].endswith('/'):
-            continue
+    if poster_info:
+        try:
+            poster_url = await media_source(poster_info['Key'], poster_info.get('ETag'))
+            poster_source = (poster_info['Key'], poster_info.get('ETag'))
+        except Exception as e:
+            logging.error(f"Ошибка при получении URL постера: {e}")
 
-        file_name = file_info['Key'].split('/')[-1].lower()
-        if is_image_file(file_name):
-            try:
-                poster_url = await generate_download_url(file_info['Key'])
-            except Exception as e:
-                logging.error(f"Ошибка при получении URL постера: {e}")
-        elif file_name.endswith('.txt'):
-            try:
-                description_url = await generate_download_url(file_info['Key'])
-                description = await get_cached_description(description_url, timestamp)
-            except Exception as e:
-                logging.error(f"Ошибка при чтении описания: {e}")
+    if description_info:
+        description = await get_cached_description(description_info['Key'], description_info.get('ETag'))
 
     try:
         if loading_message:
@@ -339,7 +287,7 @@ async def check_book(query: CallbackQuery, state: FSMContext) -> None:
 
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="🎧 Слушать книгу", callback_data=f"listen_{name}")],
+            InlineKeyboardButton(text="🎧 Слушать книгу", callback_data=f"listen_{content_id}_{type_age}")],
         [
             InlineKeyboardButton(text="⬅️ Назад", callback_data="menu_books")
         ]
@@ -347,12 +295,13 @@ async def check_book(query: CallbackQuery, state: FSMContext) -> None:
 
     try:
         if poster_url:
-            await bot.send_photo(
+            message = await bot.send_photo(
                 chat_id=query.from_user.id,
                 photo=poster_url,
                 caption=f"📚 {name}\n\n{description}",
                 reply_markup=keyboard
             )
+            remember_message(*poster_source, message)
         else:
             await bot.send_message(
                 chat_id=query.from_user.id,
@@ -369,7 +318,7 @@ async def check_book(query: CallbackQuery, state: FSMContext) -> None:
             ]])
         )
 
-@router.callback_query(lambda c: c.data.startswith('listen_'))
+@router.callback_query(CallbackPrefix('listen_'), flags={"heavy": True})
 async def listen_book(query: CallbackQuery, state: FSMContext) -> None:
     """
     Обработчик нажатия на кнопку 'Слушать книгу'
@@ -384,5 +333,13 @@ async def listen_book(query: CallbackQuery, state: FSMContext) -> None:
         await query.message.delete()
     except Exception as e:
         logging.error(f"Ошибка при удалении сообщения с постером: {e}")
-    
-    await send_audio_files(query.from_user.id, state)
\ No newline at end of file
+
+    try:
+        _, content_id, type_age = query.data.split("_")
+    except ValueError:
+        logging.error(f"Ошибка разбора callback_data в listen_book: {query.data}")
+        content_id, type_age = None, None
+
+    name = await category_lists.resolve("books", type_age, content_id) if content_id else None
+    folder_path = f"Контент/{type_age}/Аудиокниги/{name}/" if name else None
+    await send_audio_files(query.from_user.id, name, folder_path)
\ No newline at end of file
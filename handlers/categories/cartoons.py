@@ -3,33 +3,68 @@ from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardBut
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from utils.library import bot
-from utils.s3_service import get_files_useful, get_url as get_s3_url, generate_download_url as get_s3_download_url
-from aiogram.exceptions import TelegramBadRequest
+from utils.callback_routing import CallbackExact, CallbackPrefix
+from utils.s3_service import list_tree, generate_download_url as get_s3_download_url, generate_presigned_url
 import logging
 from handlers.admin_panel.error_notify import notify_admins
+from utils.media_cache import media_source, remember_message
+from utils.renderer import renderer
+from utils.category_lists import category_lists, ListItem
+from utils.screens import Screen
+from typing import List
 
 router = Router()
 
-async def handle_cartoons(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
-    """Показывает список доступных мультиков для выбранного возраста"""
-    file_path = f"Контент/{age_group}/Мультики"
-    buttons, item_names = await get_files_useful(file_path, age_group, "checkmult_")
+async def notify_no_cartoons(age_group: str) -> None:
+    await notify_admins(f"Ошибка\nНе загружены мультики в категории возраста: {age_group}")
 
-    await state.update_data(cartoon_item_names=item_names)
 
+@category_lists.register("cartoons", "Контент/{age_group}/Мультики/", on_empty=notify_no_cartoons)
+def cartoons_list(age_group: str, items: List[ListItem]) -> Screen:
+    """Список мультиков для возраста"""
     back_button = InlineKeyboardButton(text="Назад в меню ⬅️", callback_data="back_to_main")
 
-    if not buttons:
+    if not items:
         text = "К сожалению, мультики для этого возраста пока не добавлены. 😔"
-        error = f"Ошибка\nНе загружены мультики в категории возраста: {age_group}"
-        await notify_admins(error)
         keyboard = InlineKeyboardMarkup(inline_keyboard=[[back_button]])
     else:
         text = "Выберите мультик для просмотра:"
+        buttons = [
+            InlineKeyboardButton(text=name, callback_data=f"checkmult_{content_id}_{age_group}")
+            for content_id, name in items
+        ]
+        buttons.append(back_button)
+        keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+        )
+    return Screen(text, keyboard)
+
+
+@category_lists.register("soviet_cartoons", "Контент/{age_group}/Мультики/Советские мультики/")
+def soviet_cartoons_list(age_group: str, items: List[ListItem]) -> Screen:
+    """Список советских мультиков для возраста"""
+    back_button = InlineKeyboardButton(text="Назад к мультикам ⬅️", callback_data="menu_cartoons")
+
+    if not items:
+        text = "В разделе 'Советские мультики' пока пусто. 😔"
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[[back_button]])
+    else:
+        text = "Выберите советский мультик для просмотра:"
+        buttons = [
+            InlineKeyboardButton(text=name, callback_data=f"checksovmult_{content_id}_{age_group}")
+            for content_id, name in items
+        ]
         buttons.append(back_button)
         keyboard = InlineKeyboardMarkup(
             inline_keyboard=[buttons[i:i + 2] for i in range(0, len(buttons), 2)]
         )
+    return Screen(text, keyboard)
+
+
+async def handle_cartoons(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
+    """Показывает список доступных мультиков для выбранного возраста"""
+    listing = await category_lists.get("cartoons", age_group)
+    text, keyboard = listing.text, listing.keyboard
 
     try:
         await bot.edit_message_text(
@@ -45,14 +80,13 @@ async def handle_cartoons(user_id: int, state: FSMContext, age_group: str, messa
         await state.update_data(message_to_delete=new_msg.message_id)
 
 
-@router.callback_query(lambda c: c.data.startswith('checkmult_'))
+@router.callback_query(CallbackPrefix('checkmult_'), flags={"heavy": True})
 async def check_mult(query: CallbackQuery, state: FSMContext):
     try:
         # Пытаемся ответить на callback query в начале
         await query.answer()
         
-        _, index_str, type_age = query.data.split("_")
-        item_index = int(index_str)
+        _, content_id, type_age = query.data.split("_")
     except ValueError:
         error = f"Ошибка разбора callback_data в check_mult: {query.data}"
         logging.error(error)
@@ -60,43 +94,20 @@ async def check_mult(query: CallbackQuery, state: FSMContext):
         await query.answer("Ошибка данных. Попробуйте еще раз.")
         return
 
-    data = await state.get_data()
-    item_names = data.get('cartoon_item_names')
+    name = await category_lists.resolve("cartoons", type_age, content_id)
 
-    if not item_names or item_index >= len(item_names):
-        error = f"Не найден список имен или индекс вне диапазона в check_mult: index={item_index}, names={item_names}"
+    if name is None:
+        error = f"Элемент {content_id} не найден в разделе cartoons для возраста {type_age} в check_mult"
         logging.error(error)
         await notify_admins(f"Критическая ошибка\n{error}")
         await query.answer("Ошибка получения данных. Пожалуйста, вернитесь в меню и попробуйте снова.")
         await handle_cartoons(query.from_user.id, state, type_age, query.message.message_id)
         return
 
-    name = item_names[item_index]
-
     try:
         if name == 'Советские мультики':
-            try:
-                await query.message.edit_text(f"Загружаем '{name}'... ⏳", reply_markup=None)
-            except Exception as e:
-                logging.warning(f"Не удалось отредактировать на 'Загружаем': {e}")
-
-            file_path = f"Контент/{type_age}/Мультики/{name}"
-            soviet_buttons, soviet_item_names = await get_files_useful(file_path, type_age, "checksovmult_")
-
-            await state.update_data(soviet_cartoon_item_names=soviet_item_names)
-
-            back_button = InlineKeyboardButton(text="Назад к мультикам ⬅️", callback_data="menu_cartoons")
-
-            if not soviet_buttons:
-                text = f"В разделе '{name}' пока пусто. 😔"
-                error = f"Ошибка\nВ разделе {name} нету мультиков"
-                keyboard = InlineKeyboardMarkup(inline_keyboard=[[back_button]])
-            else:
-                text = "Выберите советский мультик для просмотра:"
-                soviet_buttons.append(back_button)
-                keyboard = InlineKeyboardMarkup(
-                    inline_keyboard=[soviet_buttons[i:i + 2] for i in range(0, len(soviet_buttons), 2)]
-                )
+            listing = await category_lists.get("soviet_cartoons", type_age)
+            text, keyboard = listing.text, listing.keyboard
 
             try:
                 await query.message.edit_text(text=text, reply_markup=keyboard)
@@ -113,7 +124,8 @@ async def check_mult(query: CallbackQuery, state: FSMContext):
             logging.warning(f"Не удалось отредактировать на 'Загружаем мультик': {e}")
 
         path = f"Контент/{type_age}/Мультики/{name}"
-        files = await get_s3_url(path)
+        # Только имена и ETag: URL подписывается для выбранной серии в show_mult
+        files = [f for f in await list_tree(path) if f.type == "file"]
 
         if not files:
             await query.answer(f"'{name}' – ещё не загружен или категория пуста.", show_alert=True)
@@ -123,24 +135,24 @@ async def check_mult(query: CallbackQuery, state: FSMContext):
             return
 
         # Находим и сохраняем постер один раз
-        poster_url = None
+        poster_source = None
         filtered_files = []
         image_exts = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
 
         for f in files:
             fname = f.name.lower()
-            if fname.endswith(image_exts) and not poster_url:
-                poster_url = f.file
+            if fname.endswith(image_exts) and not poster_source:
+                poster_source = (f.key, f.etag)
             else:
                 filtered_files.append(f)
 
         await state.update_data(
-            mult_files=filtered_files,
+            mult_files=[f.name for f in filtered_files],  # В состоянии только имена, URL — при показе
             mult_index=0,
             mult_name=name,
             mult_type=type_age,
             mult_path=path,
-            mult_poster_url=poster_url  # Сохраняем URL постера
+            mult_poster_source=poster_source  # Ключ и ETag постера: file_id или URL — при показе
         )
 
         await show_mult(query.from_user.id, query.message.message_id, state, path)
@@ -161,11 +173,10 @@ async def check_mult(query: CallbackQuery, state: FSMContext):
             logging.error(f"Не удалось отправить сообщение об ошибке: {send_error}")
 
 
-@router.callback_query(lambda c: c.data.startswith('checksovmult_'))
+@router.callback_query(CallbackPrefix('checksovmult_'), flags={"heavy": True})
 async def check_soviet_mult(query: CallbackQuery, state: FSMContext):
     try:
-        _, index_str, type_age = query.data.split("_")
-        item_index = int(index_str)
+        _, content_id, type_age = query.data.split("_")
     except ValueError:
         error = f"Ошибка разбора callback_data в check_soviet_mult: {query.data}"
         logging.error(error)
@@ -173,26 +184,29 @@ async def check_soviet_mult(query: CallbackQuery, state: FSMContext):
         await query.answer("Ошибка данных. Попробуйте еще раз.")
         return
 
-    data = await state.get_data()
-    soviet_item_names = data.get('soviet_cartoon_item_names')
+    name = await category_lists.resolve("soviet_cartoons", type_age, content_id)
 
-    if not soviet_item_names or item_index >= len(soviet_item_names):
-        error = f"Не найден список имен или индекс вне диапазона в check_soviet_mult: index={item_index}, names={soviet_item_names}"
+    if name is None:
+        error = f"Элемент {content_id} не найден в разделе soviet_cartoons для возраста {type_age} в check_soviet_mult"
         logging.error(error)
         await notify_admins(f"Критическая ошибка\n{error}")
         await query.answer("Ошибка получения данных. Пожалуйста, вернитесь в меню и попробуйте снова.")
         await handle_cartoons(query.from_user.id, state, type_age, query.message.message_id)
         return
 
-    name = soviet_item_names[item_index]
-
     try:
         await query.message.edit_text(f"Загружаем советский мультик '{name}'... ⏳", reply_markup=None)
     except Exception as e:
         logging.warning(f"Не удалось отредактировать на 'Загружаем советский мультик': {e}")
 
     path = f"Контент/{type_age}/Мультики/Советские мультики/{name}"
-    files = await get_s3_url(path)
+    try:
+        # Только имена и ETag: URL подписывается для выбранной серии в show_mult
+        files = [f for f in await list_tree(path) if f.type == "file"]
+    except Exception as e:
+        logging.error(f"Ошибка при получении серий из {path}: {e}")
+        await query.answer("Ошибка при загрузке данных. Попробуйте позже.")
+        return
 
     if not files:
         await query.answer(f"'{name}' – ещё не загружен или папка пуста.", show_alert=True)
@@ -201,24 +215,24 @@ async def check_soviet_mult(query: CallbackQuery, state: FSMContext):
         return
 
     # Находим и сохраняем постер один раз
-    poster_url = None
+    poster_source = None
     filtered_files = []
     image_exts = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
 
     for f in files:
         fname = f.name.lower()
-        if fname.endswith(image_exts) and not poster_url:
-            poster_url = f.file
+        if fname.endswith(image_exts) and not poster_source:
+            poster_source = (f.key, f.etag)
         else:
             filtered_files.append(f)
 
     await state.update_data(
-        mult_files=filtered_files,
+        mult_files=[f.name for f in filtered_files],  # В состоянии только имена, URL — при показе
         mult_index=0,
         mult_name=name,
         mult_type=type_age,
         mult_path=path,
-        mult_poster_url=poster_url  # Сохраняем URL постера
+        mult_poster_source=poster_source  # Ключ и ETag постера: file_id или URL — при показе
     )
     await show_mult(query.from_user.id, query.message.message_id, state, path)
 
@@ -229,7 +243,7 @@ async def show_mult(user_id, message_id_to_edit, state: FSMContext, path):
     mult_files = data.get('mult_files', [])
     idx = data.get('mult_index', 0)
     name = data.get('mult_name')
-    poster_url = data.get('mult_poster_url')
+    poster_source = data.get('mult_poster_source')
 
     if not all([mult_files, name]):
         logging.error(f"Отсутствуют данные для пагинации: {data}")
@@ -241,9 +255,12 @@ async def show_mult(user_id, message_id_to_edit, state: FSMContext, path):
         idx = 0
         await state.update_data(mult_index=idx)
 
-    file_info = mult_files[idx]
-    file_name = getattr(file_info, 'name', 'Неизвестный файл')
-    file_url = getattr(file_info, 'file', None)
+    file_name = mult_files[idx]
+    file_url = None
+    try:
+        file_url = await generate_presigned_url(f"{path}/{file_name}")
+    except Exception as e:
+        logging.error(f"Не удалось получить URL для {path}/{file_name}: {e}")
 
     caption = f"{name} (серия {idx + 1} из {len(mult_files)})"
 
@@ -265,9 +282,7 @@ async def show_mult(user_id, message_id_to_edit, state: FSMContext, path):
     if file_url:
         # URL для просмотра (обычный)
         action_buttons.append(InlineKeyboardButton(text="Смотреть 🌌", web_app=WebAppInfo(url=file_url)))
-        path_download = path+"/"+file_name
-        print(path_download)
-        download_url = await get_s3_download_url(path_download)
+        download_url = await get_s3_download_url(f"{path}/{file_name}")
         action_buttons.append(InlineKeyboardButton(text="Скачать ⤴️", url=download_url))
 
     if action_buttons:
@@ -276,37 +291,13 @@ async def show_mult(user_id, message_id_to_edit, state: FSMContext, path):
     # Кнопка "Назад"
     kb.row(InlineKeyboardButton(text="Назад к списку ⬅️", callback_data="menu_cartoons"))
 
+    # Подписанный URL живет час, а состояние — дни: file_id или URL постера берем при каждом показе
+    poster_url = await media_source(*poster_source) if poster_source else None
+    media = InputMediaPhoto(media=poster_url, caption=caption) if poster_url else None
     try:
-        if poster_url:
-            media = InputMediaPhoto(media=poster_url, caption=caption)
-            try:
-                await bot.edit_message_media(
-                    chat_id=user_id,
-                    message_id=message_id_to_edit,
-                    media=media,
-                    reply_markup=kb.as_markup()
-                )
-                return
-            except TelegramBadRequest:
-                msg = await bot.send_photo(
-                    chat_id=user_id,
-                    photo=poster_url,
-                    caption=caption,
-                    reply_markup=kb.as_markup()
-                )
-                await state.update_data(message_to_delete=msg.message_id)
-                try:
-                    await bot.delete_message(chat_id=user_id, message_id=message_id_to_edit)
-                except Exception:
-                    pass
-                return
-
-        await bot.edit_message_text(
-            chat_id=user_id,
-            message_id=message_id_to_edit,
-            text=caption,
-            reply_markup=kb.as_markup()
-        )
+        # Листание серий при том же постере меняет только подпись и клавиатуру
+        msg = await renderer.render(user_id, message_id_to_edit, text=None if media else caption, media=media,
+                                    reply_markup=kb.as_markup(), screen="cartoon")
     except Exception as e:
         logging.error(f"Ошибка при отправке сообщения: {e}")
         msg = await bot.send_message(
@@ -314,10 +305,13 @@ async def show_mult(user_id, message_id_to_edit, state: FSMContext, path):
             text=caption,
             reply_markup=kb.as_markup()
         )
+    if msg:
+        if media and poster_source:
+            remember_message(*poster_source, msg)
         await state.update_data(message_to_delete=msg.message_id)
 
 
-@router.callback_query(lambda c: c.data in ['mult_prev', 'mult_next'])
+@router.callback_query(CallbackExact('mult_prev', 'mult_next'), flags={"heavy": True})
 async def handle_pagination(query: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     idx = data.get('mult_index', 0)
@@ -1,9 +1,11 @@
 import os
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo, CallbackQuery, InputMediaPhoto
 from aiogram.fsm.context import FSMContext
 
 from utils.library import bot
+from utils.callback_routing import CallbackExact, CallbackPrefix
+from utils.screens import Screen, screens
 import logging
 
 router = Router()
@@ -39,9 +41,9 @@ PHOTO_URLS = {
 }
 
 
-async def english(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
-    """Отображает меню с кнопками для запуска игр Mini Apps english."""
-
+@screens.register("english")
+def english_screen() -> Screen:
+    """Меню уроков английского"""
     text = "Выберите игру, в которую хотите сыграть:"
 
     # Создаем кнопки с Mini Apps
@@ -69,6 +71,14 @@ async def english(user_id: int, state: FSMContext, age_group: str, message_id_to
                 InlineKeyboardButton(text="Назад в меню ⬅️", callback_data="back_to_main")
         ]
     ])
+    return Screen(text, games_keyboard)
+
+
+async def english(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
+    """Отображает меню с кнопками для запуска игр Mini Apps english."""
+
+    screen = screens.get("english")
+    text, games_keyboard = screen.text, screen.keyboard
 
     try:
         await bot.edit_message_text(
@@ -90,7 +100,7 @@ async def english(user_id: int, state: FSMContext, age_group: str, message_id_to
         await state.update_data(message_to_delete=new_msg.message_id)
 
 
-@router.callback_query(lambda c: c.data.startswith('game_english'))
+@router.callback_query(CallbackPrefix('game_english'))
 async def test_english(query: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     message_edit = data.get('message_to_delete')
@@ -189,7 +199,7 @@ async def test_english(query: CallbackQuery, state: FSMContext):
             await state.update_data(message_to_delete=msg.message_id)
 
 
-@router.callback_query(F.data == "back_to_eng")
+@router.callback_query(CallbackExact("back_to_eng"))
 async def back_to_eng(query : CallbackQuery, state : FSMContext):
     age = "None"
     message_id_to_edit = query.message.message_id
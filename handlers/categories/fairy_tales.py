@@ -2,36 +2,44 @@ from aiogram import Router
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from utils.library import bot
+from utils.callback_routing import CallbackPrefix
 import logging
-from utils.s3_service import get_files, get_folder_contents, generate_download_url
+from typing import List
+from utils.category_lists import category_lists, ListItem
+from utils.screens import Screen
+from utils.media_pipeline import deliver_audio, iter_files
 from handlers.admin_panel.error_notify import notify_admins
 
 router = Router()
 
 
-async def send_fairy(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
-    """Отправляет список доступных сказок"""
-    file_path = f"Контент/{age_group}/Сказки/"
-    buttons_data, item_names = await get_files(file_path, age_group, "checkfairy_")
-
-    await state.update_data(fairy_item_names=item_names)
+async def notify_no_fairy(age_group: str) -> None:
+    await notify_admins(f"Ошибка\nСказки для возраста {age_group} не добавлены")
 
-    # Преобразуем данные в кнопки
-    buttons = [
-        InlineKeyboardButton(text=btn['text'], callback_data=btn['callback_data'])
-        for btn in buttons_data
-    ]
 
+@category_lists.register("fairy", "Контент/{age_group}/Сказки/", on_empty=notify_no_fairy)
+def fairy_list(age_group: str, items: List[ListItem]) -> Screen:
+    """Список сказок для возраста"""
     back_button = InlineKeyboardButton(text="Назад в меню ⬅️", callback_data="back_to_main")
 
-    if not buttons:
+    if not items:
         text = "К сожалению, сказки для этого возраста пока не добавлены. 😔"
-        await notify_admins(f"Ошибка\nСказки для возраста {age_group} не добавлены")
         keyboard = InlineKeyboardMarkup(inline_keyboard=[[back_button]])
     else:
         text = "Выберите сказку для прослушивания:"
+        buttons = [
+            InlineKeyboardButton(text=name, callback_data=f"checkfairy_{content_id}_{age_group}")
+            for content_id, name in items
+        ]
         buttons.append(back_button)
         keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons[i:i + 2] for i in range(0, len(buttons), 2)])
+    return Screen(text, keyboard)
+
+
+async def send_fairy(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
+    """Отправляет список доступных сказок"""
+    listing = await category_lists.get("fairy", age_group)
+    text, keyboard = listing.text, listing.keyboard
 
     try:
         await bot.edit_message_text(
@@ -51,7 +59,7 @@ async def send_fairy(user_id: int, state: FSMContext, age_group: str, message_id
         await state.update_data(message_to_delete=new_msg.message_id)
 
 
-@router.callback_query(lambda c: c.data.startswith('checkfairy_'))
+@router.callback_query(CallbackPrefix('checkfairy_'), flags={"heavy": True})
 async def check_fairy(query: CallbackQuery, state: FSMContext):
     """Обрабатывает выбор конкретной сказки"""
     final_keyboard = InlineKeyboardMarkup(
@@ -64,8 +72,7 @@ async def check_fairy(query: CallbackQuery, state: FSMContext):
         # Пытаемся ответить на callback query в начале
         await query.answer()
         
-        _, index_str, type_age = query.data.split("_")
-        item_index = int(index_str)
+        _, content_id, type_age = query.data.split("_")
     except ValueError:
         error = f"Ошибка разбора callback_data в check_fairy: {query.data}"
         logging.error(error)
@@ -73,16 +80,14 @@ async def check_fairy(query: CallbackQuery, state: FSMContext):
         await query.answer("Ошибка данных. Попробуйте еще раз.")
         return
 
-    data = await state.get_data()
-    item_names = data.get('fairy_item_names')
+    name = await category_lists.resolve("fairy", type_age, content_id)
 
-    if not item_names or item_index >= len(item_names):
-        logging.error(f"Не найден список имен или индекс вне диапазона: index={item_index}, names={item_names}")
+    if name is None:
+        logging.error(f"Элемент {content_id} не найден в разделе fairy для возраста {type_age}")
         await query.answer("Ошибка получения данных. Пожалуйста, вернитесь в меню и попробуйте снова.")
         await send_fairy(query.from_user.id, state, type_age, query.message.message_id)
         return
 
-    name = item_names[item_index]
     folder_path = f"Контент/{type_age}/Сказки/{name}/"
 
     # Сохраняем сообщение "Загружаем сказку..." для последующего удаления
@@ -95,41 +100,33 @@ async def check_fairy(query: CallbackQuery, state: FSMContext):
         loading_message = query.message
 
     try:
-        files = await get_folder_contents(folder_path)
+        errors = []
+
+        async def remove_loading_message():
+            nonlocal loading_message
+            try:
+                if loading_message:
+                    await bot.delete_message(chat_id=query.from_user.id, message_id=loading_message.message_id)
+            except Exception as e:
+                logging.error(f"Не удалось удалить сообщение о загрузке: {e}")
+            loading_message = None
+
+        # Файлы сказки готовятся параллельно и уходят группами по 10
+        found_files, sent_files = await deliver_audio(
+            query.from_user.id,
+            iter_files(folder_path),
+            errors,
+            before_first_send=remove_loading_message
+        )
 
-        if not files:
+        if found_files == 0 and not errors:
             await query.answer(f"Сказка '{name}' не найдена.", show_alert=True)
             await notify_admins(f"Ошибка\nСказка {name} в возрасте {type_age} не найдена")
             await send_fairy(query.from_user.id, state, type_age, loading_message.message_id)
             return
 
-        sent_files = 0
-        errors = []
-
-        for file_info in files:
-            if file_info['Key'].endswith('/'):  # Пропускаем директории
-                continue
-
-            try:
-                file_url = await generate_download_url(file_info['Key'])
-                logging.info(f"Пытаемся отправить аудиофайл: {file_url}")
-
-                await bot.send_audio(
-                    chat_id=query.from_user.id,
-                    audio=file_url,
-                    title=file_info['Key'].split('/')[-1]
-                )
-                sent_files += 1
-            except Exception as e:
-                errors.append(f"Ошибка при отправке {file_info['Key']}: {str(e)}")
-                continue
-
-        # Удаляем сообщение "Загружаем сказку..."
-        try:
-            if loading_message:
-                await bot.delete_message(chat_id=query.from_user.id, message_id=loading_message.message_id)
-        except Exception as e:
-            logging.error(f"Не удалось удалить сообщение о загрузке: {e}")
+        # Удаляем сообщение "Загружаем сказку...", если оно еще не удалено
+        await remove_loading_message()
 
         if sent_files > 0:
             await bot.send_message(
@@ -3,6 +3,7 @@ from aiogram import Router
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
 from aiogram.fsm.context import FSMContext
 from utils.library import bot
+from utils.screens import Screen, screens
 import logging
 
 router = Router()
@@ -16,11 +17,11 @@ GAME_URLS = [
     ("🚗 Mr Racer", os.getenv("GAME_MR_RACER_URL")),
 ]
 
-async def games(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
-    """Отображает меню с кнопками для запуска игр Mini Apps."""
-    
+@screens.register("games")
+def games_screen() -> Screen:
+    """Меню игр: кнопки строятся по ссылкам из окружения"""
     text = "Выберите игру, в которую хотите сыграть:"
-    
+
     # Создаем кнопки с Mini Apps из переменных окружения
     rows = []
     row = []
@@ -35,8 +36,15 @@ async def games(user_id: int, state: FSMContext, age_group: str, message_id_to_e
         rows.append(row)
 
     rows.append([InlineKeyboardButton(text="Назад в меню ⬅️", callback_data="back_to_main")])
-    games_keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
+    return Screen(text, InlineKeyboardMarkup(inline_keyboard=rows))
+
+
+async def games(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
+    """Отображает меню с кнопками для запуска игр Mini Apps."""
     
+    screen = screens.get("games")
+    text, games_keyboard = screen.text, screen.keyboard
+
     try:
         await bot.edit_message_text(
             chat_id=user_id,
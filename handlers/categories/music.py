@@ -1,37 +1,42 @@
 from aiogram import Router
-from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, InputMediaAudio
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from utils.library import bot
+from utils.callback_routing import CallbackPrefix
 import logging
-from utils.s3_service import get_files, get_folder_contents, generate_download_url
+from typing import List
+from utils.category_lists import category_lists, ListItem
+from utils.screens import Screen
+from utils.media_pipeline import deliver_audio, iter_files
 
 from handlers.admin_panel.error_notify import notify_admins
 
 router = Router()
 
 
-async def send_music(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
-    """Отправляет список музыкальных категорий"""
-    file_path = f"Контент/{age_group}/Музыка/"
-    buttons_data, item_names = await get_files(file_path, age_group, "checkmusic_")
-
-    await state.update_data(music_item_names=item_names)
-
-    # Преобразуем данные в кнопки
-    buttons = [
-        InlineKeyboardButton(text=btn['text'], callback_data=btn['callback_data'])
-        for btn in buttons_data
-    ]
-
+@category_lists.register("music", "Контент/{age_group}/Музыка/")
+def music_list(age_group: str, items: List[ListItem]) -> Screen:
+    """Список музыкальных категорий для возраста"""
     back_button = InlineKeyboardButton(text="Назад в меню ⬅️", callback_data="back_to_main")
 
-    if not buttons:
+    if not items:
         text = "К сожалению, музыка для этого возраста пока не добавлена. 😔"
         keyboard = InlineKeyboardMarkup(inline_keyboard=[[back_button]])
     else:
         text = "Выберите категорию музыки которую вы желаете послушать:"
+        buttons = [
+            InlineKeyboardButton(text=name, callback_data=f"checkmusic_{content_id}_{age_group}")
+            for content_id, name in items
+        ]
         buttons.append(back_button)
         keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons[i:i + 2] for i in range(0, len(buttons), 2)])
+    return Screen(text, keyboard)
+
+
+async def send_music(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
+    """Отправляет список музыкальных категорий"""
+    listing = await category_lists.get("music", age_group)
+    text, keyboard = listing.text, listing.keyboard
 
     try:
         await bot.edit_message_text(
@@ -51,7 +56,17 @@ async def send_music(user_id: int, state: FSMContext, age_group: str, message_id
         await state.update_data(message_to_delete=new_msg.message_id)
 
 
-@router.callback_query(lambda c: c.data.startswith('checkmusic_'))
+async def delete_loading_message(user_id: int, loading_message) -> None:
+    """Удаляет сообщение "Загружаем музыку..."; возвращает None, чтобы не удалять его повторно"""
+    try:
+        if loading_message:
+            await bot.delete_message(chat_id=user_id, message_id=loading_message.message_id)
+    except Exception as e:
+        logging.error(f"Не удалось удалить сообщение о загрузке: {e}")
+    return None
+
+
+@router.callback_query(CallbackPrefix('checkmusic_'), flags={"heavy": True})
 async def check_music(query: CallbackQuery, state: FSMContext):
     """Обрабатывает выбор конкретной музыкальной категории"""
     final_keyboard = InlineKeyboardMarkup(
@@ -64,23 +79,20 @@ async def check_music(query: CallbackQuery, state: FSMContext):
         # Пытаемся ответить на callback query в начале
         await query.answer()
         
-        _, index_str, type_age = query.data.split("_")
-        item_index = int(index_str)
+        _, content_id, type_age = query.data.split("_")
     except ValueError:
         logging.error(f"Ошибка разбора callback_data в check_music: {query.data}")
         await query.answer("Ошибка данных. Попробуйте еще раз.")
         return
 
-    data = await state.get_data()
-    item_names = data.get('music_item_names')
+    name = await category_lists.resolve("music", type_age, content_id)
 
-    if not item_names or item_index >= len(item_names):
-        logging.error(f"Не найден список имен или индекс вне диапазона: index={item_index}, names={item_names}")
+    if name is None:
+        logging.error(f"Элемент {content_id} не найден в разделе music для возраста {type_age}")
         await query.answer("Ошибка получения данных. Пожалуйста, вернитесь в меню и попробуйте снова.")
         await send_music(query.from_user.id, state, type_age, query.message.message_id)
         return
 
-    name = item_names[item_index]
     folder_path = f"Контент/{type_age}/Музыка/{name}/"
 
     loading_message = None
@@ -92,86 +104,39 @@ async def check_music(query: CallbackQuery, state: FSMContext):
         loading_message = query.message
 
     try:
-        files = await get_folder_contents(folder_path)
+        errors = []
+
+        async def remove_loading_message():
+            nonlocal loading_message
+            loading_message = await delete_loading_message(query.from_user.id, loading_message)
+
+        # Треки готовятся параллельно, первые 10 уходят пользователю, пока готовятся следующие
+        found_files, sent_files = await deliver_audio(
+            query.from_user.id,
+            iter_files(folder_path),
+            errors,
+            caption=f"{name} 🎶",
+            before_first_send=remove_loading_message
+        )
 
-        if not files:
+        if found_files == 0 and not errors:
             await query.answer(f"Музыка '{name}' не найдена.", show_alert=True)
             await send_music(query.from_user.id, state, type_age, loading_message.message_id)
             return
 
-        sent_files = 0
-        errors = []
-        media_group = []
-
-        for file_info in files:
-            if file_info['Key'].endswith('/'):
-                continue
-
-            try:
-                file_url = await generate_download_url(file_info['Key'])
-                logging.info(f"Подготовка файла для отправки: {file_url}")
-
-                # Создаем объект аудио для медиагруппы
-                audio = InputMediaAudio(
-                    media=file_url,
-                    caption=f"{name} 🎶" if len(media_group) == 0 else None,
-                    title=file_info['Key'].split('/')[-1]
-                )
-                media_group.append(audio)
+        # Удаляем сообщение "Загружаем музыку...", если оно еще не удалено
+        await delete_loading_message(query.from_user.id, loading_message)
 
-            except Exception as e:
-                errors.append(f"Ошибка при подготовке {file_info['Key']}: {str(e)}")
-                continue
-
-        # Удаляем сообщение "Загружаем музыку..."
-        try:
-            if loading_message:
-                await bot.delete_message(chat_id=query.from_user.id, message_id=loading_message.message_id)
-        except Exception as e:
-            logging.error(f"Не удалось удалить сообщение о загрузке: {e}")
-
-        if media_group:
-            try:
-                # Отправляем все аудио одной группой (максимум 10 файлов за раз)
-                for i in range(0, len(media_group), 10):
-                    await bot.send_media_group(
-                        chat_id=query.from_user.id,
-                        media=media_group[i:i + 10]
-                    )
-                    sent_files += len(media_group[i:i + 10])
-
-                # Отправляем финальное сообщение с клавиатурой
-                await bot.send_message(
-                    chat_id=query.from_user.id,
-                    text=f"Вот ваша музыка из категории '{name}' 🎶",
-                    reply_markup=final_keyboard
-                )
-
-            except Exception as e:
-                logging.error(f"Ошибка при отправке медиагруппы: {e}")
-                errors.append(f"Ошибка при отправке группы аудио: {str(e)}")
-
-                # Если не удалось отправить группой, пробуем отправить по одному
-                for audio in media_group:
-                    try:
-                        await bot.send_audio(
-                            chat_id=query.from_user.id,
-                            audio=audio.media,
-                            caption=audio.caption,
-                            title=audio.title
-                        )
-                        sent_files += 1
-                    except Exception as e:
-                        errors.append(f"Ошибка при отправке {audio.title}: {str(e)}")
-
-                if sent_files > 0:
-                    await bot.send_message(
-                        chat_id=query.from_user.id,
-                        text=f"Часть музыки из категории '{name}' 🎶",
-                        reply_markup=final_keyboard
-                    )
-
-        if sent_files == 0:
+        if sent_files > 0:
+            # Отправляем финальное сообщение с клавиатурой
+            text = (f"Вот ваша музыка из категории '{name}' 🎶" if sent_files == found_files
+                    else f"Часть музыки из категории '{name}' 🎶")
+            await bot.send_message(
+                chat_id=query.from_user.id,
+                text=text,
+                reply_markup=final_keyboard
+            )
+        else:
             error_msg = "\n".join(errors[:3])
             await bot.send_message(
                 chat_id=query.from_user.id,
@@ -1,18 +1,18 @@
 import os
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
 from aiogram.fsm.context import FSMContext
 from utils.library import bot
+from utils.callback_routing import CallbackExact
+from utils.screens import Screen, screens
+from middlewares.user_context import UserContext
 import logging
 
 router = Router()
 
-@router.callback_query(F.data == 'support')
-async def send_category(query: CallbackQuery, state: FSMContext):
-    await bot.delete_message(chat_id=query.message.chat.id, message_id=query.message.message_id)
-    # Редактируем текущее сообщение, показывая информацию о поддержке
-    data = await state.get_data()
-
+@screens.register("support")
+def support_screen() -> Screen:
+    """Справка: контакты и ссылка «О нас» берутся из окружения"""
     support_email = os.getenv("SUPPORT_EMAIL")
     support_telegram = os.getenv("SUPPORT_TELEGRAM")
     support_contact = ""
@@ -57,7 +57,17 @@ async def send_category(query: CallbackQuery, state: FSMContext):
     if about_url:
         rows.append([InlineKeyboardButton(text="О нас ℹ️", web_app=WebAppInfo(url=about_url))])
     rows.append([InlineKeyboardButton(text="Вернуться в меню 🏠", callback_data="back_to_main")])
-    back_button = InlineKeyboardMarkup(inline_keyboard=rows)
+    return Screen(help_text, InlineKeyboardMarkup(inline_keyboard=rows))
+
+
+@router.callback_query(CallbackExact('support'))
+async def send_category(query: CallbackQuery, state: FSMContext):
+    await bot.delete_message(chat_id=query.message.chat.id, message_id=query.message.message_id)
+    # Редактируем текущее сообщение, показывая информацию о поддержке
+    data = await state.get_data()
+
+    screen = screens.get("support")
+    help_text, back_button = screen.text, screen.keyboard
 
     # Отправляем сообщение с инструкцией
     try:
@@ -71,12 +81,11 @@ async def send_category(query: CallbackQuery, state: FSMContext):
     data = await state.get_data()
 
 
-@router.callback_query(F.data == 'back_to_main')
-async def back_to_main(query: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackExact('back_to_main'))
+async def back_to_main(query: CallbackQuery, state: FSMContext, user_context: UserContext):
     """Обработка нажатия на кнопку "Назад" - возврат в главное меню"""
-    # Получаем сохраненный возраст пользователя из БД
-    from main import db
-    age_group = db.get_user_age(query.from_user.id)
+    # Сохраненный возраст пользователя из профиля, загруженного middleware
+    age_group = user_context.age_group
     
     if not age_group:
         # Если возраст не задан, просим выбрать его (редактируем текущее сообщение)
@@ -84,9 +93,10 @@ async def back_to_main(query: CallbackQuery, state: FSMContext):
         # передаем основные данные вручную или вызываем функцию запроса возраста
         # Проще всего вызвать change_age, которая покажет кнопки выбора возраста
         from handlers.common import change_age
-        await change_age(query, state)
+        await change_age(query, state, user_context)
         return
     
     # Показываем главное меню с учетом сохраненного возраста (редактируем текущее сообщение)
     from handlers.common import show_main_menu
-    await show_main_menu(query.from_user.id, age_group, state, message_to_edit_id=query.message.message_id) 
+    await show_main_menu(query.from_user.id, age_group, state, message_to_edit_id=query.message.message_id,
+                         is_premium=user_context.is_premium) 
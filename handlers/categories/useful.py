@@ -5,22 +5,22 @@ from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardBut
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from utils.library import bot
-from utils.s3_service import get_url, get_files_useful, generate_download_url as get_s3_download_url
+from utils.callback_routing import CallbackExact, CallbackPrefix
+from utils.s3_service import list_tree, generate_presigned_url, \
+    generate_download_url as get_s3_download_url
 from handlers.admin_panel.error_notify import notify_admins
 from handlers.subscription.require_subscription import require_subscription_handler
 import logging
 from database.database import db
-from typing import Dict
-import time
-from aiogram.exceptions import TelegramBadRequest
+from typing import List
+from utils.media_cache import media_source, remember_message, remember_messages
+from utils.renderer import renderer
+from utils.access_tree import access_tree, AccessNode
+from utils.content_ids import content_index
+from middlewares.user_context import UserContext
 
 router = Router()
 
-VIDEO_MESSAGE_CACHE: Dict[str, Dict[str, int]] = {}  # {file_url: {'message_id': int, 'timestamp': float}}
-
-# Время жизни кэша (1 час)
-CACHE_EXPIRATION = 3600
-
 async def show_useful_content(user_id, message_id_to_edit, state: FSMContext, path):
     """Показывает контент с пагинацией"""
     data = await state.get_data()
@@ -28,7 +28,7 @@ async def show_useful_content(user_id, message_id_to_edit, state: FSMContext, pa
     content_files = data.get('content_files', [])
     idx = data.get('content_index', 0)
     name = data.get('content_name')
-    poster_url = data.get('content_poster_url')
+    poster_source = data.get('content_poster_source')
 
     if not all([content_files, name]):
         logging.error(f"Отсутствуют данные для пагинации: {data}")
@@ -40,9 +40,13 @@ async def show_useful_content(user_id, message_id_to_edit, state: FSMContext, pa
         idx = 0
         await state.update_data(content_index=idx)
 
-    file_info = content_files[idx]
-    file_name = getattr(file_info, 'name', 'Неизвестный файл')
-    file_url = getattr(file_info, 'file', None)
+    file_name = content_files[idx]
+    file_url = None
+    # URL подписывается только для показываемого файла
+    try:
+        file_url = await generate_presigned_url(f"{path}/{file_name}")
+    except Exception as e:
+        logging.error(f"Не удалось получить URL для {path}/{file_name}: {e}")
 
     caption = f"{name} ({idx + 1} из {len(content_files)})"
 
@@ -73,37 +77,13 @@ async def show_useful_content(user_id, message_id_to_edit, state: FSMContext, pa
     # Кнопка "Назад"
     kb.row(InlineKeyboardButton(text="Назад к списку ⬅️", callback_data="menu_useful"))
 
+    # Подписанный URL живет час, а состояние — дни: file_id или URL постера берем при каждом показе
+    poster_url = await media_source(*poster_source) if poster_source else None
+    media = InputMediaPhoto(media=poster_url, caption=caption) if poster_url else None
     try:
-        if poster_url:
-            media = InputMediaPhoto(media=poster_url, caption=caption)
-            try:
-                await bot.edit_message_media(
-                    chat_id=user_id,
-                    message_id=message_id_to_edit,
-                    media=media,
-                    reply_markup=kb.as_markup()
-                )
-                return
-            except TelegramBadRequest:
-                msg = await bot.send_photo(
-                    chat_id=user_id,
-                    photo=poster_url,
-                    caption=caption,
-                    reply_markup=kb.as_markup()
-                )
-                await state.update_data(message_to_delete=msg.message_id)
-                try:
-                    await bot.delete_message(chat_id=user_id, message_id=message_id_to_edit)
-                except Exception:
-                    pass
-                return
-
-        await bot.edit_message_text(
-            chat_id=user_id,
-            message_id=message_id_to_edit,
-            text=caption,
-            reply_markup=kb.as_markup()
-        )
+        # Листание при том же постере меняет только подпись и клавиатуру
+        msg = await renderer.render(user_id, message_id_to_edit, text=None if media else caption, media=media,
+                                    reply_markup=kb.as_markup(), screen="useful_content")
     except Exception as e:
         logging.error(f"Ошибка при отправке сообщения: {e}")
         msg = await bot.send_message(
@@ -111,9 +91,12 @@ async def show_useful_content(user_id, message_id_to_edit, state: FSMContext, pa
             text=caption,
             reply_markup=kb.as_markup()
         )
+    if msg:
+        if media and poster_source:
+            remember_message(*poster_source, msg)
         await state.update_data(message_to_delete=msg.message_id)
 
-@router.callback_query(lambda c: c.data in ['content_prev', 'content_next'])
+@router.callback_query(CallbackExact('content_prev', 'content_next'), flags={"heavy": True})
 async def handle_content_pagination(query: CallbackQuery, state: FSMContext):
     """Обработка пагинации контента"""
     data = await state.get_data()
@@ -136,124 +119,95 @@ async def handle_content_pagination(query: CallbackQuery, state: FSMContext):
     await state.update_data(content_index=new_idx)
     await show_useful_content(query.from_user.id, query.message.message_id, state, path)
 
-async def send_video_with_cache(user_id: int, video_file, caption: str) -> bool:
-    """
-    Отправляет видео с использованием кэшированного message_id, если он доступен
-    """
-    global VIDEO_MESSAGE_CACHE
-
-    current_time = time.time()
-    cache_key = video_file.name
-    cached_data = VIDEO_MESSAGE_CACHE.get(cache_key)
+async def send_pdf_files(user_id: int, pdf_files: List) -> int:
+    """Отправляет PDF файлы группами по 10, возвращает количество отправленных сообщений"""
+    media_group = []
+    media_sources = []
+    for file in pdf_files:
+        try:
+            media = InputMediaDocument(
+                media=await media_source(file.key, file.etag, file.file),
+                caption=f"{file.name}" if len(media_group) == 0 else None
+            )
+            media_group.append(media)
+            media_sources.append((file.key, file.etag))
+        except Exception as e:
+            logging.error(f"Ошибка при подготовке PDF файла {file.name}: {e}")
 
-    # Проверяем, есть ли актуальные данные в кэше
-    if cached_data and current_time - cached_data['timestamp'] < CACHE_EXPIRATION:
+    sent_messages_count = 0
+    for i in range(0, len(media_group), 10):
         try:
-            # Пытаемся переслать сообщение
-            await bot.copy_message(
+            messages = await bot.send_media_group(
                 chat_id=user_id,
-                from_chat_id=cached_data['from_chat_id'],
-                message_id=cached_data['message_id']
+                media=media_group[i:i + 10]
             )
-            logging.info(f"Видео отправлено из кэша: {cache_key}")
-            return True
+            remember_messages(media_sources[i:i + 10], messages)
+            sent_messages_count += 1
         except Exception as e:
-            logging.warning(f"Ошибка пересылки видео из кэша (удаляем из кэша): {e}")
-            del VIDEO_MESSAGE_CACHE[cache_key]
-
-    # Отправляем видео заново
-    try:
-        from aiogram.types import URLInputFile
-        document_file = URLInputFile(video_file.file, filename=video_file.name)
-
-        # Отправка видео в "тихий" сервис-чат (или самому себе), чтобы сохранить message_id
-        temp_message = await bot.send_video(
-            chat_id=user_id,
-            video=document_file,
-            caption=caption,
-        )
-
-        # Сохраняем данные в кэш
-        VIDEO_MESSAGE_CACHE[cache_key] = {
-            'message_id': temp_message.message_id,
-            'from_chat_id': user_id,
-            'timestamp': current_time
-        }
-        logging.info(f"Сохранено в кэш: {cache_key} -> {temp_message.message_id}")
+            logging.error(f"Ошибка при отправке группы PDF: {e}")
+            # Если не удалось отправить группой, пробуем по одному
+            for media_item, (key, etag) in zip(media_group[i:i + 10], media_sources[i:i + 10]):
+                try:
+                    message = await bot.send_document(
+                        chat_id=user_id,
+                        document=media_item.media,
+                        caption=media_item.caption
+                    )
+                    remember_message(key, etag, message)
+                    sent_messages_count += 1
+                except Exception as e:
+                    logging.error(f"Ошибка при отправке PDF файла: {e}")
+    return sent_messages_count
 
-        return True
-    except Exception as e:
-        logging.error(f"Ошибка при отправке видео: {e}")
-        return False
 
+async def send_other_files(user_id: int, files: List) -> int:
+    """Отправляет остальные файлы по одному, возвращает количество отправленных"""
+    sent_messages_count = 0
+    for file in files:
+        try:
+            message = await bot.send_document(
+                chat_id=user_id,
+                document=await media_source(file.key, file.etag, file.file),
+                caption=f"{file.name}"
+            )
+            remember_message(file.key, file.etag, message)
+            sent_messages_count += 1
+        except Exception as e:
+            logging.error(f"Ошибка при отправке файла {file.name}: {e}")
+    return sent_messages_count
 
-def is_video_in_cache(video_url: str) -> bool:
-    """Проверяет, есть ли видео в кэше"""
-    cached_data = VIDEO_MESSAGE_CACHE.get(video_url)
-    if not cached_data:
-        return False
 
-    current_time = time.time()
-    return current_time - cached_data['timestamp'] < CACHE_EXPIRATION
+def useful_path(entry) -> str:
+    """Путь папки или файла раздела для content_index (AccessNode, S3Entry)"""
+    return entry.path if isinstance(entry, AccessNode) else entry.key
 
 
 # Хендлер вызывается из common.py при нажатии кнопки "Полезное 🔓"
-async def other_category(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int):
-    is_premium = db.check_premium_status(user_id)
+async def other_category(user_id: int, state: FSMContext, age_group: str, message_id_to_edit: int,
+                         is_premium: bool = None):
+    if is_premium is None:
+        is_premium = db.check_premium_status(user_id)
     file_path = f"Контент/{age_group}/Полезное"
 
-    # Получаем все кнопки и названия элементов
-    raw_buttons, raw_item_names = await get_files_useful(file_path, age_group, "checkuseful_")
+    # Темы и замки берутся из дерева доступа: без обращений к S3 и locked_categories
+    await access_tree.ensure_built()
+    section = access_tree.get(file_path)
+    entries = section.subfolders + section.files if section else []
 
     processed_buttons = []
-    processed_item_names = []
-    locked_categories = db.get_all_locked_categories() if not is_premium else []
-
-    for i, item_name in enumerate(raw_item_names):
-        button = raw_buttons[i]
-
-        if is_premium:
-            # Для премиум пользователей все кнопки остаются как есть
-            processed_buttons.append(button)
-            processed_item_names.append(item_name)
-            continue
-
-        # Для не-премиум пользователей проверяем статус категории и подкатегорий
-        item_path = f"{file_path}/{item_name}"
-        items = await get_url(item_path)
-        subfolders = [item for item in items if item.type == 'dir'] if items else []
-
-        if not subfolders:
-            # Если это конечная категория без подпапок
-            if item_name in locked_categories:
-                processed_buttons.append(InlineKeyboardButton(
-                    text=f"{item_name} 🔒",
-                    callback_data="require_subscription"
-                ))
-            else:
-                processed_buttons.append(button)
-            processed_item_names.append(item_name)
-        else:
-            # Если есть подпапки, проверяем их статус
-            all_subfolders_locked = True
-            for folder in subfolders:
-                if folder.name not in locked_categories:
-                    all_subfolders_locked = False
-                    break
-
-            if all_subfolders_locked:
-                # Все подкатегории заблокированы - родительская с замком
-                processed_buttons.append(InlineKeyboardButton(
-                    text=f"{item_name} 🔒",
-                    callback_data="require_subscription"
-                ))
-            else:
-                # Хотя бы одна подкатегория разблокирована - родительская без замка
-                processed_buttons.append(button)
-            processed_item_names.append(item_name)
-
-    await state.update_data(useful_item_names=processed_item_names)
 
+    for entry in entries:
+        # Для не-премиум пользователей замок папки уже учитывает правило «закрыты все подпапки»
+        if not is_premium and isinstance(entry, AccessNode) and entry.locked:
+            processed_buttons.append(InlineKeyboardButton(
+                text=f"{entry.name} 🔒",
+                callback_data="require_subscription"
+            ))
+        else:
+            processed_buttons.append(InlineKeyboardButton(
+                text=entry.name,
+                callback_data=f"checkuseful_{content_index.id_for(useful_path(entry))}_{age_group}"
+            ))
 
     back_button = InlineKeyboardButton(text="Назад в меню ⬅️", callback_data="back_to_main")
 
@@ -265,13 +219,9 @@ async def other_category(user_id: int, state: FSMContext, age_group: str, messag
 
     text = "Выберите тему в разделе 'Полезное':"
     try:
-        await bot.edit_message_text(
-            chat_id=user_id,
-            message_id=message_id_to_edit,
-            text=text,
-            reply_markup=send_buttons
-        )
-        await state.update_data(message_to_delete=message_id_to_edit)
+        msg = await renderer.render(user_id, message_id_to_edit, text=text, reply_markup=send_buttons,
+                                    screen="useful_topics")
+        await state.update_data(message_to_delete=msg.message_id if msg else message_id_to_edit)
     except Exception as e:
         logging.error(f"Ошибка при редактировании в other_category (premium): {e}")
         new_msg = await bot.send_message(user_id, text, reply_markup=send_buttons)
@@ -285,77 +235,67 @@ async def other_category(user_id: int, state: FSMContext, age_group: str, messag
 
 
 # Обработка выбора конкретной подкатегории в "Полезном"
-@router.callback_query(lambda c: c.data.startswith('checkuseful_'))
-async def check_useful_category(query: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackPrefix('checkuseful_'), flags={"heavy": True})
+async def check_useful_category(query: CallbackQuery, state: FSMContext, user_context: UserContext):
     try:
         # Пытаемся ответить на callback query в начале
         await query.answer()
         
-        parts = query.data.split('_')
-        type_age = parts[-1]  # Возрастная группа
+        _, content_id, type_age = query.data.split('_')
+
+        # Дерево доступа при построении заполняет content_index всеми папками раздела
+        await access_tree.ensure_built()
+        current_path = content_index.resolve(content_id)
+        if not current_path or not current_path.startswith(f"Контент/{type_age}/Полезное/"):
+            await query.answer("Ошибка получения данных. Попробуйте снова.")
+            await other_category(query.from_user.id, state, type_age, query.message.message_id,
+                                 is_premium=user_context.is_premium)
+            return
 
-        if len(parts) == 3 and parts[1].isdigit():  # Формат checkuseful_index_age
-            item_index = int(parts[1])
-            data = await state.get_data()
-            item_names = data.get('useful_item_names', [])
+        name = current_path.split("/")[-1]
+
+        # Проверяем подписку и блокировку категории (с учетом родительских папок)
+        is_premium = user_context.is_premium
+        if not is_premium and access_tree.is_denied(current_path):
+            await require_subscription_handler(query, state)
+            return
 
-            if not item_names or item_index >= len(item_names):
-                await query.answer("Ошибка получения данных. Попробуйте снова.")
-                await other_category(query.from_user.id, state, type_age, query.message.message_id)
+        node = access_tree.get(current_path)
+        if node:
+            subfolders = node.subfolders
+            files = node.files
+        else:
+            # Папки нет в дереве (каталог изменился после построения) — читаем ее из S3
+            try:
+                items = await list_tree(current_path)
+            except Exception as e:
+                logging.error(f"Ошибка при получении элементов из {current_path}: {e}")
+                await query.answer("Ошибка при загрузке данных. Попробуйте позже.")
                 return
 
-            name = item_names[item_index]
-            current_path = f"Контент/{type_age}/Полезное/{name}"
-        else:  # Формат checkuseful_folder_name_age
-            folder_name = '_'.join(parts[1:-1]).replace('_', ' ')
-            data = await state.get_data()
-            current_path = data.get('current_useful_path', f"Контент/{type_age}/Полезное")
-            current_path = f"{current_path}/{folder_name}"
-            name = folder_name
-
-        await state.update_data(current_useful_path=current_path)
-
-        # Проверяем подписку и блокировку категории
-        is_premium = db.check_premium_status(query.from_user.id)
-        if not is_premium:
-            # Проверяем все родительские папки на блокировку
-            path_parts = current_path.split('/')
-            for i in range(3, len(path_parts)):  # Начинаем с "Полезное"
-                parent_name = path_parts[i]
-                if db.is_category_locked(parent_name):
-                    await require_subscription_handler(query, state)
-                    return
+            # Разделяем папки и файлы
+            subfolders = [item for item in items if item.type == 'dir']
+            files = [item for item in items if item.type == 'file']
 
-        try:
-            items = await get_url(current_path)
-        except Exception as e:
-            logging.error(f"Ошибка при получении элементов из {current_path}: {e}")
-            await query.answer("Ошибка при загрузке данных. Попробуйте позже.")
-            return
-
-        if not items:
+        if not subfolders and not files:
             await query.answer(f"Категория '{name}' пуста.", show_alert=True)
             await notify_admins(f"Ошибка\nКатегория {name} в возрасте {type_age} пустая")
-            await other_category(query.from_user.id, state, type_age, query.message.message_id)
+            await other_category(query.from_user.id, state, type_age, query.message.message_id,
+                                 is_premium=user_context.is_premium)
             return
 
-        # Разделяем папки и файлы
-        subfolders = [item for item in items if item.type == 'dir']
-        files = [item for item in items if item.type == 'file']
-
         # Если есть подпапки - показываем их как кнопки
         if subfolders:
             buttons = []
             for folder in subfolders:
-                folder_name_encoded = folder.name.replace(' ', '_')
                 button_text = folder.name
 
-                if not is_premium and folder.name in db.get_all_locked_categories():
+                if not is_premium and getattr(folder, 'locked', False):
                     button_text += " 🔒"
 
                 buttons.append(InlineKeyboardButton(
                     text=button_text,
-                    callback_data=f"checkuseful_{folder_name_encoded}_{type_age}"
+                    callback_data=f"checkuseful_{content_index.id_for(useful_path(folder))}_{type_age}"
                 ))
 
             buttons.append(InlineKeyboardButton(text="Назад к списку тем ⬅️", callback_data="menu_useful"))
@@ -363,12 +303,13 @@ async def check_useful_category(query: CallbackQuery, state: FSMContext):
 
             text = f"Выберите подкатегорию в '{name}':"
             try:
-                await query.message.edit_text(text=text, reply_markup=keyboard)
+                # Повторное нажатие на ту же папку не доходит до Telegram
+                await renderer.render(query.from_user.id, query.message.message_id, text=text,
+                                      reply_markup=keyboard, screen="useful_folder")
             except Exception as e:
-                if "message is not modified" not in str(e):
-                    logging.error(f"Ошибка при показе подпапок: {e}")
-                    await notify_admins(f"Критическая ошибка\nПри показе папок {e} возраст {type_age}")
-                    await bot.send_message(query.from_user.id, text, reply_markup=keyboard)
+                logging.error(f"Ошибка при показе подпапок: {e}")
+                await notify_admins(f"Критическая ошибка\nПри показе папок {e} возраст {type_age}")
+                await bot.send_message(query.from_user.id, text, reply_markup=keyboard)
 
         # Если есть файлы - обрабатываем их
         elif files:
@@ -383,62 +324,22 @@ async def check_useful_category(query: CallbackQuery, state: FSMContext):
             # Если есть видео, показываем с пагинацией
             if video_files:
                 # Находим постер (первое изображение или None)
-                poster_url = image_files[0].file if image_files else None
-                content_files = video_files
-
+                poster = image_files[0] if image_files else None
                 await state.update_data(
-                    content_files=content_files,
+                    content_files=[f.name for f in video_files],  # В состоянии только имена, URL — при показе
                     content_index=0,
                     content_name=name,
                     content_path=current_path,
-                    content_poster_url=poster_url
+                    content_poster_source=(poster.key, poster.etag) if poster else None  # file_id или URL — при показе
                 )
                 await show_useful_content(query.from_user.id, query.message.message_id, state, current_path)
 
                 # Отправляем PDF файлы группой после показа контента
                 if pdf_files:
-                    media_group = []
-                    for file in pdf_files:
-                        try:
-                            media = InputMediaDocument(
-                                media=file.file,
-                                caption=f"{file.name}" if len(media_group) == 0 else None
-                            )
-                            media_group.append(media)
-                        except Exception as e:
-                            logging.error(f"Ошибка при подготовке PDF файла {file.name}: {e}")
-
-                    # Отправляем PDF файлы группами по 10
-                    if media_group:
-                        for i in range(0, len(media_group), 10):
-                            try:
-                                await bot.send_media_group(
-                                    chat_id=query.from_user.id,
-                                    media=media_group[i:i + 10]
-                                )
-                            except Exception as e:
-                                logging.error(f"Ошибка при отправке группы PDF: {e}")
-                                # Если не удалось отправить группой, пробуем по одному
-                                for media_item in media_group[i:i + 10]:
-                                    try:
-                                        await bot.send_document(
-                                            chat_id=query.from_user.id,
-                                            document=media_item.media,
-                                            caption=media_item.caption
-                                        )
-                                    except Exception as e:
-                                        logging.error(f"Ошибка при отправке PDF файла: {e}")
+                    await send_pdf_files(query.from_user.id, pdf_files)
 
                 # Отправляем остальные файлы по одному
-                for file in other_files:
-                    try:
-                        await bot.send_document(
-                            chat_id=query.from_user.id,
-                            document=file.file,
-                            caption=f"{file.name}"
-                        )
-                    except Exception as e:
-                        logging.error(f"Ошибка при отправке файла {file.name}: {e}")
+                await send_other_files(query.from_user.id, other_files)
 
                 return
 
@@ -456,68 +357,33 @@ async def check_useful_category(query: CallbackQuery, state: FSMContext):
 
             # Отправляем изображения группой
             if image_files:
-                media = [InputMediaPhoto(media=file.file) for file in image_files]
+                media = [
+                    InputMediaPhoto(media=await media_source(file.key, file.etag, file.file))
+                    for file in image_files
+                ]
+                media_sources = [(file.key, file.etag) for file in image_files]
                 for i in range(0, len(media), 10):
                     try:
-                        await bot.send_media_group(chat_id=query.from_user.id, media=media[i:i + 10])
+                        messages = await bot.send_media_group(chat_id=query.from_user.id, media=media[i:i + 10])
+                        remember_messages(media_sources[i:i + 10], messages)
                         sent_messages_count += 1
                     except Exception as e:
                         logging.error(f"Ошибка при отправке медиагруппы: {e}")
                         # Если не удалось отправить группой, пробуем по одному
-                        for media_item in media[i:i + 10]:
+                        for media_item, (key, etag) in zip(media[i:i + 10], media_sources[i:i + 10]):
                             try:
-                                await bot.send_photo(chat_id=query.from_user.id, photo=media_item.media)
+                                message = await bot.send_photo(chat_id=query.from_user.id, photo=media_item.media)
+                                remember_message(key, etag, message)
                                 sent_messages_count += 1
                             except Exception as e:
                                 logging.error(f"Ошибка при отправке фото: {e}")
 
             # Отправляем PDF файлы группой
             if pdf_files:
-                media_group = []
-                for file in pdf_files:
-                    try:
-                        media = InputMediaDocument(
-                            media=file.file,
-                            caption=f"{file.name}" if len(media_group) == 0 else None
-                        )
-                        media_group.append(media)
-                    except Exception as e:
-                        logging.error(f"Ошибка при подготовке PDF файла {file.name}: {e}")
-
-                # Отправляем PDF файлы группами по 10
-                if media_group:
-                    for i in range(0, len(media_group), 10):
-                        try:
-                            await bot.send_media_group(
-                                chat_id=query.from_user.id,
-                                media=media_group[i:i + 10]
-                            )
-                            sent_messages_count += 1
-                        except Exception as e:
-                            logging.error(f"Ошибка при отправке группы PDF: {e}")
-                            # Если не удалось отправить группой, пробуем по одному
-                            for media_item in media_group[i:i + 10]:
-                                try:
-                                    await bot.send_document(
-                                        chat_id=query.from_user.id,
-                                        document=media_item.media,
-                                        caption=media_item.caption
-                                    )
-                                    sent_messages_count += 1
-                                except Exception as e:
-                                    logging.error(f"Ошибка при отправке PDF файла: {e}")
+                sent_messages_count += await send_pdf_files(query.from_user.id, pdf_files)
 
             # Отправляем остальные файлы по одному
-            for file in other_files:
-                try:
-                    await bot.send_document(
-                        chat_id=query.from_user.id,
-                        document=file.file,
-                        caption=f"{file.name}"
-                    )
-                    sent_messages_count += 1
-                except Exception as e:
-                    logging.error(f"Ошибка при отправке файла {file.name}: {e}")
+            sent_messages_count += await send_other_files(query.from_user.id, other_files)
 
             if sent_messages_count == 0:
                 raise Exception("Не удалось отправить ни один файл")
@@ -1,176 +1,100 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
-from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, ChatMemberUpdated, InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
+from aiogram.filters import Command, ChatMemberUpdatedFilter, KICKED, MEMBER
 from aiogram.fsm.context import FSMContext
 
 from utils.library import bot
-from aiogram.exceptions import TelegramBadRequest
+from utils.callback_routing import CallbackExact, CallbackPrefix
+from utils.screens import Screen, screens
+from utils.renderer import renderer
+from middlewares.user_context import UserContext
 import logging
 
 router = Router()
 
-
-@router.message(Command("start"))
-async def command_start(msg: Message, state: FSMContext):
-    # Обработка deep-link для подарка
-    if msg.text and msg.text.startswith("/start gift_"):
-        from database.database import db
-        parts = msg.text.split()
-        payload = parts[1] if len(parts) > 1 else msg.text[len("/start "):]
-        gift_code = payload[len("gift_"):] if payload.startswith("gift_") else None
-        if not gift_code:
-            await msg.answer("❗️Некорректная ссылка подарка.")
-            logging.warning(f"Некорректная ссылка подарка: {msg.text}")
-            return
-        success = db.redeem_gift_subscription(gift_code, msg.from_user.id)
-        logging.info(f"redeem_gift_subscription({gift_code}, {msg.from_user.id}) => {success}")
-        if not success:
-            await msg.answer("❗️Ссылка недействительна или уже использована.")
-            logging.warning(f"Подарок не активирован: {gift_code} для {msg.from_user.id}")
-            return
-        db.set_premium_status(msg.from_user.id, True, 30)
-        logging.info(f"set_premium_status({msg.from_user.id}, True, 30)")
-        await msg.answer("🎉 Вам подарили подписку на 30 дней! Пользуйтесь на здоровье! 🥰")
-        # Показываем главное меню
-        age_group = db.get_user_age(msg.from_user.id) or "0-3"
-        try:
-            await show_main_menu(msg.from_user.id, age_group, state)
-        except Exception as e:
-            logging.warning(f"Ошибка при открытии главного меню после подарка: {e}")
-        return
-
-    data = await state.get_data()
-    message_to_delete = data.get('message_to_delete')
-
-    # Добавляем пользователя в базу данных, если он новый
-    from main import db  # Импортируем db из main
-    db.add_user(
-        user_id=msg.from_user.id,
-        username=msg.from_user.username,
-        first_name=msg.from_user.first_name,
-    )
-
-    # Обновляем время последней активности
-    db.update_user_activity(msg.from_user.id)
-
-    # Проверяем, является ли пользователь администратором
-    is_admin = db.is_admin(msg.from_user.id)
-
-    # Проверяем, выбирал ли пользователь возраст ранее
-    age_group = db.get_user_age(msg.from_user.id)
-
-    if age_group:
-        # Если возраст уже выбран, сразу переходим к главному меню
-        await show_main_menu(msg.from_user.id, age_group, state, message_to_edit_id=message_to_delete)
-        return
-
-    # Приветственное сообщение с анимацией
-    welcome_message = (
-        f"Привет, {msg.from_user.first_name}! 👋\n\n"
-        f"Меня зовут Янтарик, и я твой волшебный помощник! 🧙‍♂️\n\n"
-        f"Здесь ты найдешь множество интересного контента:\n"
-        f"• Сказки 🧙‍♀\n"
-        f"• Мультики 🧜\n"
-        f"• Музыка 🎤\n"
-        f"• Игры 🎮\n"
-        f"• Полезные материалы 🔓\n\n"
-        f"AI-Помощник 🧠– Умный помощник, который подскажет:"
-        f"   • чем заняться с ребёнком.\n"
-        f"   • как развивать малыша.\n"
-        f"   • какие игрушки или книги подходят сейчас.\n"
-        f"Афиша детских событий 🎟– Будьте в курсе лучших мероприятий: спектакли, мастер-классы, семейные праздники, выставки. Всё — рядом с вами и по возрасту ребёнка."
-        f"Чтобы начать, выбери возрастную группу твоего ребенка:"
-    )
-    # welcome_message = (
-    #     f"Привет, {query.from_user.first_name}! 👋\n\n"
-    #     f"Меня зовут Янтарик, и я твой волшебный помощник! 🧙‍♂️\n\n"
-    #     f"Здесь ты найдешь множество интересного контента:\n"
-    #     f"🎮 Развивающие игры – Играем, развиваем логику, учим цвета, формы, счёт и не только!\n"
-    #     f"📖 Сказки и мультики – Авторские и классические сказки, добрые мультфильмы.\n"
-    #     f"🎵 Музыка и аудиокниги – Успокаивающие мелодии, обучающие песенки, музыка для игр и сна.\n"
-    #     f"🔓 Полезные материалы – Рекомендации по уходу за ребенком, питание, развитие и многое другое!\n"
-    #     f"🧠 AI-Помощник – Умный помощник, который подскажет:"
-    #     f"   • чем заняться с ребёнком.\n"
-    #     f"   • как развивать малыша.\n"
-    #     f"   • какие игрушки или книги подходят сейчас.\n"
-    #     f"Родители всегда знают, что делать — без бесконечных поисков в интернете.\n\n"
-    #     f"🎟️ Афиша детских событий – Будьте в курсе лучших мероприятий: спектакли, мастер-классы, семейные праздники, выставки. Всё — рядом с вами и по возрасту ребёнка."
-    #     f"Чтобы начать, выбери возрастную группу твоего ребенка:"
-    # )
-    # Создаем инлайн-кнопки для выбора возраста
-    age_buttons = [
+AGE_GROUPS = ("0-3", "4-6", "7-10")
+
+# ==================== Экраны ====================
+# Тексты с {first_name} — шаблоны, имя подставляется при показе
+START_TEXT = (
+    "Привет, {first_name}! 👋\n\n"
+    "Меня зовут Янтарик, и я твой волшебный помощник! 🧙‍♂️\n\n"
+    "Здесь ты найдешь множество интересного контента:\n"
+    "• Сказки 🧙‍♀\n"
+    "• Мультики 🧜\n"
+    "• Музыка 🎤\n"
+    "• Игры 🎮\n"
+    "• Полезные материалы 🔓\n\n"
+    "AI-Помощник 🧠– Умный помощник, который подскажет:"
+    "   • чем заняться с ребёнком.\n"
+    "   • как развивать малыша.\n"
+    "   • какие игрушки или книги подходят сейчас.\n"
+    "Афиша детских событий 🎟– Будьте в курсе лучших мероприятий: спектакли, мастер-классы, семейные праздники, выставки. Всё — рядом с вами и по возрасту ребёнка."
+    "Чтобы начать, выбери возрастную группу твоего ребенка:"
+)
+# welcome_message = (
+#     f"Привет, {first_name}! 👋\n\n"
+#     f"Меня зовут Янтарик, и я твой волшебный помощник! 🧙‍♂️\n\n"
+#     f"Здесь ты найдешь множество интересного контента:\n"
+#     f"🎮 Развивающие игры – Играем, развиваем логику, учим цвета, формы, счёт и не только!\n"
+#     f"📖 Сказки и мультики – Авторские и классические сказки, добрые мультфильмы.\n"
+#     f"🎵 Музыка и аудиокниги – Успокаивающие мелодии, обучающие песенки, музыка для игр и сна.\n"
+#     f"🔓 Полезные материалы – Рекомендации по уходу за ребенком, питание, развитие и многое другое!\n"
+#     f"🧠 AI-Помощник – Умный помощник, который подскажет:"
+#     f"   • чем заняться с ребёнком.\n"
+#     f"   • как развивать малыша.\n"
+#     f"   • какие игрушки или книги подходят сейчас.\n"
+#     f"Родители всегда знают, что делать — без бесконечных поисков в интернете.\n\n"
+#     f"🎟️ Афиша детских событий – Будьте в курсе лучших мероприятий: спектакли, мастер-классы, семейные праздники, выставки. Всё — рядом с вами и по возрасту ребёнка."
+#     f"Чтобы начать, выбери возрастную группу твоего ребенка:"
+# )
+
+CHANGE_AGE_TEXT = (
+    "Привет, {first_name}! 👋\n\n"
+    "Меня зовут Янтарик, и я твой волшебный помощник! 🧙‍♂️\n\n"
+    "Здесь ты найдешь множество интересного контента:\n"
+    "• Сказки 🧙‍♀\n"
+    "• Мультики 🧜\n"
+    "• Музыка 🎤\n"
+    "• Игры 🎮\n"
+    "• Полезные материалы 🔓\n"
+    "• AI-Помощник 🤖\n\n"
+    "Афиша 🎪– Будьте в курсе лучших мероприятий: спектакли, мастер-классы, семейные праздники, выставки.\n\n"
+    "Чтобы начать, выбери возрастную группу твоего ребенка:"
+)
+
+
+def age_buttons(is_admin: bool) -> list:
+    """Кнопки выбора возраста (админ видит вход в админ-панель)"""
+    buttons = [
         [
             InlineKeyboardButton(text="0-3 года 👶", callback_data="select_age_0-3"),
             InlineKeyboardButton(text="4-6 лет 🧒", callback_data="select_age_4-6")
         ],
         [InlineKeyboardButton(text="7-10 лет 👦", callback_data="select_age_7-10")],
         [
-            InlineKeyboardButton(text="Афиша 🎪",
-                                 web_app=WebAppInfo(url="")),
+            InlineKeyboardButton(text="Афиша 🎪", web_app=WebAppInfo(url="")),
             InlineKeyboardButton(text="Поддержка 🛟", callback_data="support")
         ]
     ]
-
-    # Добавляем кнопку администратора, если пользователь - админ
     if is_admin:
-        admin_button = [InlineKeyboardButton(text="Администратор 👑", callback_data="admin_panel")]
-        age_buttons.append(admin_button)
+        buttons.append([InlineKeyboardButton(text="Администратор 👑", callback_data="admin_panel")])
+    return buttons
 
-    age_keyboard = InlineKeyboardMarkup(inline_keyboard=age_buttons)
-
-    if message_to_delete:
-        try:
-            await bot.delete_message(chat_id=msg.from_user.id, message_id=message_to_delete)
-        except Exception as e:
-            logging.warning(f"Не удалось удалить старое сообщение: {e}")
-
-    # Всегда отправляем анимацию с приветственным сообщением
-    try:
-        message_to_edit = await msg.answer_animation(
-            animation="",
-            caption=welcome_message,
-            reply_markup=age_keyboard
-        )
-    except Exception as e:
-        logging.error(f"Ошибка при отправке анимации: {e}")
-        # В крайнем случае отправим обычное сообщение
-        message_to_edit = await msg.answer(
-            text=welcome_message,
-            reply_markup=age_keyboard
-        )
-
-    # Сохраняем ID отправленного сообщения
-    if message_to_edit:
-        await state.update_data(message_to_delete=message_to_edit.message_id)
-    else:
-        await state.update_data(message_to_delete=None)
 
+@screens.register("start", variants=[(False,), (True,)])
+def start_screen(is_admin: bool) -> Screen:
+    return Screen(START_TEXT, InlineKeyboardMarkup(inline_keyboard=age_buttons(is_admin)))
 
-@router.callback_query(F.data.startswith('select_age_'))
-async def handle_age_selection(query: CallbackQuery, state: FSMContext):
-    """Обработка выбора возраста через инлайн-кнопки"""
-    age_group = query.data.split('_')[2]  # select_age_0-3 -> 0-3
-    
-    # Сохраняем выбранный возраст в базе данных
-    from main import db
-    db.set_user_age(query.from_user.id, age_group)
-    
-    # Обновляем время последней активности
-    db.update_user_activity(query.from_user.id)
-    db.increment_age_selection(age_group)
 
-    # Отображаем главное меню, редактируя текущее сообщение
-    await show_main_menu(query.from_user.id,
-                         age_group,
-                         state,
-                         message_to_edit_id=query.message.message_id)
+@screens.register("change_age", variants=[(False,), (True,)])
+def change_age_screen(is_admin: bool) -> Screen:
+    return Screen(CHANGE_AGE_TEXT, InlineKeyboardMarkup(inline_keyboard=age_buttons(is_admin)))
 
 
-async def show_main_menu(user_id: int, age_group: str, state: FSMContext, message_to_edit_id: int = None):
-    """Показывает главное меню бота в зависимости от выбранного возраста"""
-    from main import db
-    # Формируем основное меню в зависимости от возраста
-    is_premium = db.check_premium_status(user_id)
+@screens.register("main_menu", variants=[(age, premium) for age in AGE_GROUPS for premium in (False, True)])
+def main_menu_screen(age_group: str, is_premium: bool) -> Screen:
+    """Главное меню в зависимости от возраста и подписки"""
     if age_group in ["0-3"]:
         menu_buttons = [
             [
@@ -246,8 +170,6 @@ async def show_main_menu(user_id: int, age_group: str, state: FSMContext, messag
             ]
         ]
 
-    menu_keyboard = InlineKeyboardMarkup(inline_keyboard=menu_buttons)
-
     # Определяем текст приветствия в зависимости от возраста
     age_display = {
         "0-3": "0-3 года",
@@ -260,88 +182,139 @@ async def show_main_menu(user_id: int, age_group: str, state: FSMContext, messag
         f"Выбранный возраст: {age_display}\n\n"
         f"Выберите категорию, которая вас интересует:"
     )
+    return Screen(message_text, InlineKeyboardMarkup(inline_keyboard=menu_buttons))
+
+
+@router.message(Command("start"))
+async def command_start(msg: Message, state: FSMContext, user_context: UserContext):
+    # Обработка deep-link для подарка
+    if msg.text and msg.text.startswith("/start gift_"):
+        from database.database import db
+        parts = msg.text.split()
+        payload = parts[1] if len(parts) > 1 else msg.text[len("/start "):]
+        gift_code = payload[len("gift_"):] if payload.startswith("gift_") else None
+        if not gift_code:
+            await msg.answer("❗️Некорректная ссылка подарка.")
+            logging.warning(f"Некорректная ссылка подарка: {msg.text}")
+            return
+        success = db.redeem_gift_subscription(gift_code, msg.from_user.id)
+        logging.info(f"redeem_gift_subscription({gift_code}, {msg.from_user.id}) => {success}")
+        if not success:
+            await msg.answer("❗️Ссылка недействительна или уже использована.")
+            logging.warning(f"Подарок не активирован: {gift_code} для {msg.from_user.id}")
+            return
+        db.set_premium_status(msg.from_user.id, True, 30)
+        logging.info(f"set_premium_status({msg.from_user.id}, True, 30)")
+        await msg.answer("🎉 Вам подарили подписку на 30 дней! Пользуйтесь на здоровье! 🥰")
+        # Показываем главное меню
+        age_group = user_context.age_group or "0-3"
+        try:
+            await show_main_menu(msg.from_user.id, age_group, state, is_premium=True)
+        except Exception as e:
+            logging.warning(f"Ошибка при открытии главного меню после подарка: {e}")
+        return
+
+    data = await state.get_data()
+    message_to_delete = data.get('message_to_delete')
+
+    # Добавляем пользователя в базу данных, если он новый
+    from main import db  # Импортируем db из main
+    db.add_user(
+        user_id=msg.from_user.id,
+        username=msg.from_user.username,
+        first_name=msg.from_user.first_name,
+    )
+
+    # Возраст и права администратора загружены middleware вместе с профилем,
+    # время активности обновляет она же
+    age_group = user_context.age_group
 
-    edited_message = None
-    if message_to_edit_id:
+    if age_group:
+        # Если возраст уже выбран, сразу переходим к главному меню
+        await show_main_menu(msg.from_user.id, age_group, state, message_to_edit_id=message_to_delete,
+                             is_premium=user_context.is_premium)
+        return
+
+    # Приветствие и клавиатура выбора возраста собраны заранее
+    screen = screens.get("start", user_context.is_admin)
+    welcome_message = screen.format(first_name=msg.from_user.first_name)
+    age_keyboard = screen.keyboard
+
+    if message_to_delete:
         try:
-            # Пытаемся отредактировать переданное сообщение
-            edited_message = await bot.edit_message_text(
-                chat_id=user_id,
-                message_id=message_to_edit_id,
-                text=message_text,
-                reply_markup=menu_keyboard
-            )
-        except TelegramBadRequest as e:
-            logging.warning(f"Не удалось отредактировать сообщение {message_to_edit_id}: {e}")
-            # Если не удалось отредактировать, удаляем старое и отправляем новое
-            try:
-                await bot.delete_message(chat_id=user_id, message_id=message_to_edit_id)
-            except Exception as del_err:
-                 logging.warning(f"Не удалось удалить сообщение {message_to_edit_id}: {del_err}")
-            edited_message = await bot.send_message(
-                chat_id=user_id,
-                text=message_text,
-                reply_markup=menu_keyboard
-            )
+            await bot.delete_message(chat_id=msg.from_user.id, message_id=message_to_delete)
         except Exception as e:
-            logging.error(f"Непредвиденная ошибка при редактировании сообщения {message_to_edit_id}: {e}")
-            # Отправляем новое в случае другой ошибки
-            edited_message = await bot.send_message(
-                chat_id=user_id,
-                text=message_text,
-                reply_markup=menu_keyboard
-            )
-    else:
-        # Если ID для редактирования не передан, отправляем новое сообщение
-        edited_message = await bot.send_message(
-            chat_id=user_id,
-            text=message_text,
-            reply_markup=menu_keyboard
+            logging.warning(f"Не удалось удалить старое сообщение: {e}")
+
+    # Всегда отправляем анимацию с приветственным сообщением
+    try:
+        message_to_edit = await msg.answer_animation(
+            animation="",
+            caption=welcome_message,
+            reply_markup=age_keyboard
+        )
+    except Exception as e:
+        logging.error(f"Ошибка при отправке анимации: {e}")
+        # В крайнем случае отправим обычное сообщение
+        message_to_edit = await msg.answer(
+            text=welcome_message,
+            reply_markup=age_keyboard
         )
 
-    # Сохраняем ID актуального сообщения для возможности редактирования в будущем
-    if edited_message:
-        await state.update_data(message_to_delete=edited_message.message_id)
-    else: # На случай если отправка/редактирование не удалось
+    # Сохраняем ID отправленного сообщения
+    if message_to_edit:
+        await state.update_data(message_to_delete=message_to_edit.message_id)
+    else:
         await state.update_data(message_to_delete=None)
 
 
-@router.callback_query(F.data == 'change_age')
-async def change_age(query: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackPrefix('select_age_'))
+async def handle_age_selection(query: CallbackQuery, state: FSMContext, user_context: UserContext):
+    """Обработка выбора возраста через инлайн-кнопки"""
+    age_group = query.data.split('_')[2]  # select_age_0-3 -> 0-3
+    
+    # Сохраняем выбранный возраст в базе данных
     from main import db
-    is_admin = db.is_admin(query.from_user.id)
+    db.set_user_age(query.from_user.id, age_group)
+    db.increment_age_selection(age_group)
 
-    age_buttons = [
-        [
-            InlineKeyboardButton(text="0-3 года 👶", callback_data="select_age_0-3"),
-            InlineKeyboardButton(text="4-6 лет 🧒", callback_data="select_age_4-6")
-        ],
-        [InlineKeyboardButton(text="7-10 лет 👦", callback_data="select_age_7-10")],
-        [
-            InlineKeyboardButton(text="Афиша 🎪", web_app=WebAppInfo(url="")),
-            InlineKeyboardButton(text="Поддержка 🛟", callback_data="support")
-        ]
-    ]
+    # Отображаем главное меню, редактируя текущее сообщение
+    await show_main_menu(query.from_user.id,
+                         age_group,
+                         state,
+                         message_to_edit_id=query.message.message_id,
+                         is_premium=user_context.is_premium)
 
-    if is_admin:
-        admin_button = [InlineKeyboardButton(text="Администратор 👑", callback_data="admin_panel")]
-        age_buttons.append(admin_button)
-
-    age_keyboard = InlineKeyboardMarkup(inline_keyboard=age_buttons)
-
-    welcome_message = (
-        f"Привет, {query.from_user.first_name}! 👋\n\n"
-        f"Меня зовут Янтарик, и я твой волшебный помощник! 🧙‍♂️\n\n"
-        f"Здесь ты найдешь множество интересного контента:\n"
-        f"• Сказки 🧙‍♀\n"
-        f"• Мультики 🧜\n"
-        f"• Музыка 🎤\n"
-        f"• Игры 🎮\n"
-        f"• Полезные материалы 🔓\n"
-        f"• AI-Помощник 🤖\n\n"
-        f"Афиша 🎪– Будьте в курсе лучших мероприятий: спектакли, мастер-классы, семейные праздники, выставки.\n\n"
-        f"Чтобы начать, выбери возрастную группу твоего ребенка:"
-    )
+
+async def show_main_menu(user_id: int, age_group: str, state: FSMContext, message_to_edit_id: int = None,
+                         is_premium: bool = None):
+    """
+    Показывает главное меню бота в зависимости от выбранного возраста
+
+    is_premium передают обработчики с UserContext; без него подписка читается из базы.
+    """
+    if is_premium is None:
+        from main import db
+        is_premium = db.check_premium_status(user_id)
+    # Меню зависит только от возраста и подписки: все варианты собраны заранее
+    screen = screens.get("main_menu", age_group, is_premium)
+    message_text = screen.text
+    menu_keyboard = screen.keyboard
+
+    # Редактирует сообщение, если меню в нем еще не показано, или заменяет его новым
+    edited_message = await renderer.render(user_id, message_to_edit_id, text=message_text,
+                                           reply_markup=menu_keyboard, screen="main_menu")
+
+    # Сохраняем ID актуального сообщения для возможности редактирования в будущем
+    # (None от render — меню уже показано в message_to_edit_id)
+    await state.update_data(message_to_delete=edited_message.message_id if edited_message else message_to_edit_id)
+
+
+@router.callback_query(CallbackExact('change_age'))
+async def change_age(query: CallbackQuery, state: FSMContext, user_context: UserContext):
+    screen = screens.get("change_age", user_context.is_admin)
+    welcome_message = screen.format(first_name=query.from_user.first_name)
+    age_keyboard = screen.keyboard
 
     try:
         # Удаляем старое сообщение
@@ -362,25 +335,21 @@ async def change_age(query: CallbackQuery, state: FSMContext):
         logging.error(f"Не удалось отправить анимацию при смене возраста: {e}")
 
 
-@router.callback_query(F.data.startswith('menu_'))
-async def handle_menu_selection(query: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackPrefix('menu_'), flags={"heavy": True})
+async def handle_menu_selection(query: CallbackQuery, state: FSMContext, user_context: UserContext):
     """Обработка выбора раздела в главном меню"""
     menu_type = query.data.split('_')[1]  # menu_cartoons -> cartoons
     message_id_to_edit = query.message.message_id # Сообщение, которое будем редактировать
     user_id = query.from_user.id
     
-    # Получаем возраст пользователя из БД
-    from main import db
-    age_group = db.get_user_age(query.from_user.id)
+    # Возраст пользователя из профиля, загруженного middleware
+    age_group = user_context.age_group
     if not age_group:
          # Если возраст не найден в БД, отправляем на старт
-         await command_start(query.message, state) # Используем message вместо query, т.к. command_start ожидает Message
+         await command_start(query.message, state, user_context) # Используем message вместо query, т.к. command_start ожидает Message
          await query.answer() # Отвечаем на callback query
          return
-         
-    # Обновляем время последней активности
-    db.update_user_activity(query.from_user.id)
-    
+
     # Обновляем состояние, сохраняя возраст
     await state.update_data(type_age=age_group)
     
@@ -404,7 +373,7 @@ async def handle_menu_selection(query: CallbackQuery, state: FSMContext):
     
     elif menu_type == "useful":
         from handlers.categories.useful import other_category
-        await other_category(user_id, state, age_group, message_id_to_edit)
+        await other_category(user_id, state, age_group, message_id_to_edit, is_premium=user_context.is_premium)
     
     elif menu_type == "games":
         from handlers.categories.games import games
@@ -422,4 +391,18 @@ async def handle_menu_selection(query: CallbackQuery, state: FSMContext):
         # На случай неизвестного callback_data
         # Отвечаем на callback query перед тем, как показать сообщение
         await query.answer() 
-        await query.message.answer("Неизвестная команда") # Отправляем сообщение вместо alert
\ No newline at end of file
+        await query.message.answer("Неизвестная команда") # Отправляем сообщение вместо alert
+
+
+@router.my_chat_member(F.chat.type == "private", ChatMemberUpdatedFilter(member_status_changed=KICKED))
+async def bot_blocked(event: ChatMemberUpdated):
+    """Пользователь заблокировал бота — исключаем его из рассылок"""
+    from main import db
+    db.mark_user_blocked(event.from_user.id)
+
+
+@router.my_chat_member(F.chat.type == "private", ChatMemberUpdatedFilter(member_status_changed=MEMBER))
+async def bot_unblocked(event: ChatMemberUpdated):
+    """Пользователь снова разрешил боту писать — возвращаем его в рассылки"""
+    from main import db
+    db.update_user_activity(event.from_user.id)
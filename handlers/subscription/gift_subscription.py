@@ -1,14 +1,16 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, Message
 from aiogram.fsm.context import FSMContext
 from utils.library import bot
+from utils.callback_routing import CallbackExact
 from database.database import db
+from middlewares.user_context import UserContext
 import uuid
 import logging
 
 router = Router()
 
-@router.callback_query(F.data == "gift_subscription")
+@router.callback_query(CallbackExact("gift_subscription"))
 async def gift_subscription_intro(query: CallbackQuery, state: FSMContext):
     text = (
         "🎁 Хотите сделать подарок?\n\n"
@@ -21,7 +23,7 @@ async def gift_subscription_intro(query: CallbackQuery, state: FSMContext):
     ])
     await query.message.edit_text(text=text, reply_markup=kb, parse_mode="HTML")
 
-@router.callback_query(F.data == "create_gift_payment")
+@router.callback_query(CallbackExact("create_gift_payment"))
 async def create_gift_payment_handler(query: CallbackQuery, state: FSMContext):
     from main import payment_handler
     user_id = query.from_user.id
@@ -70,7 +72,7 @@ async def create_gift_payment_handler(query: CallbackQuery, state: FSMContext):
     )
 
 @router.message(lambda msg: msg.text and msg.text.startswith("/start gift_"))
-async def start_gift(msg: Message, state: FSMContext):
+async def start_gift(msg: Message, state: FSMContext, user_context: UserContext):
     # Извлекаем код подарка
     parts = msg.text.split()
     payload = parts[1] if len(parts) > 1 else msg.text[len("/start "):]
@@ -93,8 +95,8 @@ async def start_gift(msg: Message, state: FSMContext):
 
     # Показываем главное меню
     from handlers.common import show_main_menu
-    age_group = db.get_user_age(msg.from_user.id) or "0-3"
+    age_group = user_context.age_group or "0-3"
     try:
-        await show_main_menu(msg.from_user.id, age_group, state)
+        await show_main_menu(msg.from_user.id, age_group, state, is_premium=True)
     except Exception as e:
         logging.warning(f"Ошибка при открытии главного меню после подарка: {e}") 
\ No newline at end of file
@@ -1,13 +1,14 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from utils.library import bot
+from utils.callback_routing import CallbackExact
 from aiogram.exceptions import TelegramBadRequest
 
 router = Router()
 
 
-@router.callback_query(F.data == "require_subscription")
+@router.callback_query(CallbackExact("require_subscription"))
 async def require_subscription_handler(query: CallbackQuery, state: FSMContext):
     await query.answer() # Отвечаем на callback query
     # Текст и кнопка для предложения подписки
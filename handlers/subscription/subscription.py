@@ -3,14 +3,16 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKe
 from aiogram.fsm.context import FSMContext
 from datetime import datetime
 from utils.library import bot
+from utils.callback_routing import CallbackExact
 from aiogram.exceptions import TelegramBadRequest
 from utils.logger import get_logger
+from middlewares.user_context import UserContext
 
 logger = get_logger(__name__)
 
 router = Router()
 
-@router.callback_query(F.data == 'subscription')
+@router.callback_query(CallbackExact('subscription'))
 async def subscription_handler(query: CallbackQuery, state: FSMContext):
     """Обработчик кнопки 'Моя подписка'"""
     try:
@@ -135,7 +137,7 @@ async def subscription_handler(query: CallbackQuery, state: FSMContext):
         await query.answer("Произошла ошибка. Попробуйте позже.", show_alert=True)
 
 
-@router.callback_query(F.data == "create_payment")
+@router.callback_query(CallbackExact("create_payment"))
 async def create_payment_handler(query: CallbackQuery, state: FSMContext):
     user_id = query.from_user.id
     username = query.from_user.username
@@ -270,8 +272,8 @@ async def create_payment_handler(query: CallbackQuery, state: FSMContext):
     await state.update_data(payment_id=payment_info["id"])
 
 
-@router.callback_query(F.data == "cancel_payment")
-async def cancel_payment_handler(query: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackExact("cancel_payment"))
+async def cancel_payment_handler(query: CallbackQuery, state: FSMContext, user_context: UserContext):
     # Редактируем сообщение с кнопкой оплаты
     try:
         await query.message.edit_text(
@@ -292,14 +294,13 @@ async def cancel_payment_handler(query: CallbackQuery, state: FSMContext):
         # Все равно пытаемся вернуть в главное меню
         
     # Возвращаемся в главное меню
-    from main import db
-    age_group = db.get_user_age(query.from_user.id)
     from handlers.common import show_main_menu
     # Отправляем новое сообщение с главным меню, так как текущее изменено
-    await show_main_menu(query.from_user.id, age_group, state, message_to_edit_id=None)
+    await show_main_menu(query.from_user.id, user_context.age_group, state, message_to_edit_id=None,
+                         is_premium=user_context.is_premium)
 
 
-@router.callback_query(F.data == "cancel_auto_renewal")
+@router.callback_query(CallbackExact("cancel_auto_renewal"))
 async def cancel_auto_renewal_handler(query: CallbackQuery, state: FSMContext):
     user_id = query.from_user.id
     
@@ -362,7 +363,7 @@ async def my_subscription_handler_text(msg: Message, state: FSMContext):
 
 
 # Остальные хендлеры (ask_cancel_subscription, confirm_cancel_subscription) уже используют edit_text
-@router.callback_query(F.data == "cancel_subscription")
+@router.callback_query(CallbackExact("cancel_subscription"))
 async def ask_cancel_subscription(query: CallbackQuery, state: FSMContext):
     buttons = [
         [InlineKeyboardButton(text="Да, отменить 🚫", callback_data="confirm_cancel_subscription")],
@@ -378,7 +379,7 @@ async def ask_cancel_subscription(query: CallbackQuery, state: FSMContext):
         logging.error(f"Ошибка в ask_cancel_subscription: {e}")
 
 
-@router.callback_query(F.data == "confirm_cancel_subscription")
+@router.callback_query(CallbackExact("confirm_cancel_subscription"))
 async def confirm_cancel_subscription(query: CallbackQuery, state: FSMContext):
     user_id = query.from_user.id
     
@@ -1,3 +1,16 @@
+import os
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Число процессов обработки обновлений; при значении больше 1 этот процесс — супервизор
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", 1))
+# Метрики процессов складываются через каталог prometheus_client: переменная задается
+# до импорта модулей с метриками и наследуется воркерами
+if BOT_WORKERS > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="yantarik-metrics-")
+
 from utils.library import *
 import logging
 import asyncio
@@ -6,14 +19,23 @@ from database.database import db
 from payments.payment_handler import YooKassaPayment
 from payments.webhook_server import WebhookServer
 from payments.recurring_payments import RecurringPaymentScheduler
-from dotenv import load_dotenv
 from handlers.routers import setup_routers
 from handlers.admin_panel.inactive_notifications import InactiveUserNotifier
+from utils.media_warmer import MediaWarmer, get_storage_chat_id
+from utils.access_tree import access_tree
+from middlewares.user_limiter import UserLimiterMiddleware
+from middlewares.user_context import UserContextMiddleware
+from middlewares.callback_ack import callback_ack
+from utils.callback_routing import callback_index
+from utils.send_gateway import send_gateway
+from utils.renderer import renderer
+from utils.broadcast import broadcast_manager
+from utils.screens import screens
+from utils.catalog import catalog_watcher
+from utils.workers import UpdateSupervisor, apply_change, start_metrics_server
 import sys
 from aiogram.types import BotCommand
 
-load_dotenv()
-
 # Устанавливаем SelectorEventLoop для Windows
 if os.name == 'nt':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
@@ -44,6 +66,12 @@ API_KEY = os.getenv("YOOKASSA_API_KEY")
 WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
 WEBHOOK_RETURN_URL = os.getenv("WEBHOOK_RETURN_URL")
 
+# Получение обновлений Telegram: polling (по умолчанию) или webhook на том же веб-сервере
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL")
+TELEGRAM_WEBHOOK_PATH = os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram-webhook")
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+
 payment_handler = YooKassaPayment(
     shop_id=SHOP_ID,
     api_key=API_KEY,
@@ -57,18 +85,84 @@ recurring_scheduler = None
 # Планировщик уведомлений для неактивных пользователей
 inactive_notifier = None
 
+# Фоновая предзагрузка медиа в чат-хранилище
+media_warmer = None
+
+
+def configure_dispatcher() -> None:
+    """Шлюз отправки, middleware и роутеры (в единственном процессе или в каждом воркере)"""
+    # Пользователи, заблокировавшие бота, исключаются из рассылок до следующего обращения
+    send_gateway.on_blocked = db.mark_user_blocked
+    # Повторные ответы на уже подтвержденные нажатия отсекаются до шлюза и не тратят лимит
+    bot.session.middleware(callback_ack.intercept)
+    # Правки, которые ничего не меняют в сообщении, не уходят в Telegram
+    bot.session.middleware(renderer.intercept)
+    # Все исходящие запросы идут через общий шлюз: лимиты скорости, приоритеты, retry_after
+    bot.session.middleware(send_gateway)
+
+    # Нажатие подтверждается сразу, до загрузки профиля и работы обработчика
+    dp.callback_query.outer_middleware(callback_ack)
+
+    # Профиль пользователя читается один раз на обновление и передается обработчикам;
+    # регистрируется до индекса кнопок, чтобы он был и у обработчиков, найденных индексом
+    user_context = UserContextMiddleware()
+    dp.callback_query.outer_middleware(user_context)
+    dp.message.outer_middleware(user_context)
+
+    # Ограничение тяжелых операций на пользователя (обработчики с флагом heavy)
+    user_limiter = UserLimiterMiddleware()
+    dp.callback_query.middleware(user_limiter)
+    dp.message.middleware(user_limiter)
+
+    # Настройка роутеров
+    setup_routers(dp)
+
+    # Нажатия кнопок сразу уходят подходящим обработчикам по callback_data, без обхода всех роутеров
+    callback_index.compile(dp)
+    dp.callback_query.outer_middleware(callback_index)
+
+    # Статические экраны (тексты и клавиатуры) строятся один раз до приема обновлений
+    screens.build_all()
+
+
+async def setup_worker(index: int, count: int):
+    """Настройка процесса-воркера: обрабатывает обновления пользователей с user_id % count == index"""
+    # Лимит бота делится между воркерами и супервизором
+    send_gateway.set_rate(send_gateway.rate / (count + 1))
+    configure_dispatcher()
+    # Сессия ЮКассы воркера закрывается при его остановке
+    dp.shutdown.register(payment_handler.close)
+    return bot, dp
+
 
 async def main():
-    global recurring_scheduler, inactive_notifier
+    global recurring_scheduler, inactive_notifier, media_warmer
+
+    use_webhook = BOT_MODE == "webhook"
+    if use_webhook and not TELEGRAM_WEBHOOK_URL:
+        raise RuntimeError("BOT_MODE=webhook требует TELEGRAM_WEBHOOK_URL")
+
+    supervisor = None
+    if BOT_WORKERS > 1:
+        # Обновления обрабатывают воркеры, здесь остаются вебхуки, фоновые задачи и метрики
+        send_gateway.set_rate(send_gateway.rate / (BOT_WORKERS + 1))
+        supervisor = UpdateSupervisor(BOT_WORKERS, setup_worker)
+        await supervisor.start()
+        catalog_watcher.subscribe(lambda prefix: supervisor.broadcast("catalog", prefix))
+        # Профиль, измененный здесь (платежи, подарки), сбрасывается и в кэше воркеров
+        db.subscribe_user_changes(lambda user_id: supervisor.broadcast("user", user_id))
+        access_tree.subscribe(lambda path, locked: supervisor.broadcast("access", (path, locked)))
+        # Изменения из воркеров супервизор пересылает остальным и применяет к своим кэшам
+        supervisor.subscribe(apply_change)
+        start_metrics_server(8000)
+
+    configure_dispatcher()
 
     # Установка команды /start
     await bot.set_my_commands([
         BotCommand(command="start", description="Запуск бота"),
     ])
 
-    # Настройка роутеров
-    setup_routers(dp)
-
     # Инициализация вебхук-сервера
     webhook_server = WebhookServer(
         bot=bot,
@@ -76,7 +170,10 @@ async def main():
         payment_handler=payment_handler,
         dp=dp,
         host="0.0.0.0",
-        port=WEBHOOK_PORT
+        port=WEBHOOK_PORT,
+        telegram_path=TELEGRAM_WEBHOOK_PATH if use_webhook else None,
+        telegram_secret=TELEGRAM_WEBHOOK_SECRET,
+        update_sink=supervisor.dispatch if supervisor else None
     )
 
     # Инициализация планировщика рекуррентных платежей
@@ -89,7 +186,9 @@ async def main():
     # Инициализация планировщика уведомлений для неактивных пользователе
     inactive_notifier = InactiveUserNotifier(
         bot=bot,
-        db=db
+        db=db,
+        inactive_days=int(os.getenv("INACTIVE_NOTIFY_DAYS", 2)),
+        window_minutes=int(os.getenv("INACTIVE_NOTIFY_WINDOW", 180))
     )
 
     # Запуск вебхук-сервера
@@ -101,10 +200,50 @@ async def main():
     # Запуск планировщика уведомлений
     await inactive_notifier.start()
 
+    # Запуск предзагрузки медиа (только если задан чат-хранилище)
+    storage_chat_id = get_storage_chat_id()
+    if storage_chat_id:
+        media_warmer = MediaWarmer(
+            bot=bot,
+            db=db,
+            storage_chat_id=storage_chat_id,
+            upload_delay=float(os.getenv("MEDIA_WARMER_DELAY", 3.0))
+        )
+        await media_warmer.start()
+
+    # Дерево доступа к «Полезному» (при ошибке S3 построится при первом обращении)
+    try:
+        await access_tree.rebuild()
+    except Exception as e:
+        logging.error(f"Не удалось построить дерево доступа: {e}")
+
+    # Проверка каталога S3: списки разделов кэшируются до изменения их папок
+    await catalog_watcher.start()
+
+    # Продолжение рассылок, прерванных перезапуском
+    await broadcast_manager.start()
+
     logging.info("Бот Янтарик запущен. Используется новая логика с сохранением возраста в БД.")
 
     # Запуск бота
-    await dp.start_polling(bot)
+    try:
+        if use_webhook:
+            await webhook_server.set_telegram_webhook(
+                TELEGRAM_WEBHOOK_URL,
+                max_connections=int(os.getenv("TELEGRAM_WEBHOOK_MAX_CONNECTIONS", 40))
+            )
+            # Обновления приходят на веб-сервер, основной корутине остается только ждать
+            await asyncio.Event().wait()
+        else:
+            # Вебхук, оставшийся от режима webhook, не дает получать обновления через getUpdates
+            await bot.delete_webhook()
+            if supervisor:
+                await supervisor.poll(bot, dp.resolve_used_update_types())
+            else:
+                await dp.start_polling(bot)
+    finally:
+        # Keep-alive соединения с ЮКассой закрываются вместе с ботом
+        await payment_handler.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.methods import AnswerCallbackQuery, TelegramMethod
+from aiogram.types import CallbackQuery
+from prometheus_client import Counter, Histogram
+
+# ==================== Конфигурация ====================
+CALLBACK_ACK_DELAY = float(os.getenv('CALLBACK_ACK_DELAY', 0.1))  # сколько ждать ответа обработчика до пустого ack, сек
+
+# ==================== Мониторинг ====================
+CALLBACK_ACK_SECONDS = Histogram('callback_ack_seconds', 'Time from callback query to answerCallbackQuery', ['by'],
+                                 buckets=(0.01, 0.025, 0.05, 0.1, 0.15, 0.25, 0.5, 1, 2.5, 5, 10))
+CALLBACK_LATE_ANSWERS = Counter('callback_late_answers_total',
+                                'Handler answers that came after the callback query was acknowledged', ['kind'])
+
+
+class _PendingAck:
+    __slots__ = ("query", "started", "sent", "by")
+
+    def __init__(self, query: CallbackQuery):
+        self.query = query
+        self.started = time.monotonic()
+        self.sent = False
+        self.by = "handler"
+
+
+class CallbackAckMiddleware(BaseMiddleware):
+    """
+    Подтверждает каждое нажатие кнопки, не дожидаясь S3 и базы
+
+    Обработчик по-прежнему может ответить query.answer(text, show_alert):
+    если ответ пришел раньше delay, текст уходит вместе с подтверждением.
+    Иначе через delay отправляется пустое подтверждение, и часики на кнопке
+    пропадают сразу, сколько бы ни работал обработчик. Ответ обработчика после
+    подтверждения Telegram уже не примет: пустой и всплывающее уведомление
+    отбрасываются без запроса (уведомление — с записью в лог), и только alert
+    (show_alert=True, обычно ошибка) приходит обычным сообщением.
+
+    Middleware регистрируется двумя частями: outer middleware callback_query
+    и intercept в сессии бота, через которую проходят все answerCallbackQuery.
+    """
+
+    def __init__(self, delay: float = CALLBACK_ACK_DELAY):
+        self.delay = delay
+        self.pending: Dict[str, _PendingAck] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        ack = _PendingAck(event)
+        self.pending[event.id] = ack
+        timer = asyncio.get_running_loop().call_later(self.delay, self._ack_later, ack)
+        try:
+            return await handler(event, data)
+        finally:
+            timer.cancel()
+            if not ack.sent:
+                # Обработчик закончил быстрее delay и не ответил сам
+                await self._ack(ack, "finish")
+            self.pending.pop(event.id, None)
+
+    def _ack_later(self, ack: _PendingAck) -> None:
+        if not ack.sent:
+            task = asyncio.create_task(self._ack(ack, "timeout"))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _ack(self, ack: _PendingAck, by: str) -> None:
+        ack.by = by
+        try:
+            await ack.query.answer()
+        except TelegramAPIError as e:
+            logging.debug(f"Не удалось подтвердить нажатие {ack.query.id}: {e}")
+
+    async def intercept(self, make_request: Callable[..., Awaitable[Any]], bot: Bot, method: TelegramMethod) -> Any:
+        """Request middleware сессии: первый answerCallbackQuery отправляется, поздние отбрасываются"""
+        if not isinstance(method, AnswerCallbackQuery):
+            return await make_request(bot, method)
+        ack = self.pending.get(method.callback_query_id)
+        if ack is None:
+            return await make_request(bot, method)
+
+        if not ack.sent:
+            ack.sent = True
+            CALLBACK_ACK_SECONDS.labels(by=ack.by).observe(time.monotonic() - ack.started)
+            return await make_request(bot, method)
+
+        if not method.text:
+            CALLBACK_LATE_ANSWERS.labels(kind='empty').inc()
+            return True
+        if not method.show_alert:
+            # Уведомление уместно только на кнопке: отдельным сообщением оно превратилось бы в спам
+            CALLBACK_LATE_ANSWERS.labels(kind='toast').inc()
+            logging.info(f"Поздний ответ на нажатие {method.callback_query_id} отброшен: {method.text!r}")
+            return True
+        CALLBACK_LATE_ANSWERS.labels(kind='alert').inc()
+        logging.info(f"Поздний alert на нажатие {method.callback_query_id} отправлен сообщением")
+        try:
+            await bot.send_message(chat_id=ack.query.from_user.id, text=method.text, parse_mode=None)
+        except TelegramAPIError as e:
+            logging.warning(f"Не удалось доставить ответ на нажатие сообщением: {e}")
+        return True
+
+
+callback_ack = CallbackAckMiddleware()
@@ -0,0 +1,186 @@
+import datetime
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from prometheus_client import Counter, Gauge, Histogram
+
+from database.database import QueryCounter, current_queries, db
+
+# ==================== Конфигурация ====================
+USER_CONTEXT_TTL = float(os.getenv('USER_CONTEXT_TTL', 30))              # сколько секунд профиль берется из кэша
+USER_CONTEXT_MAX = int(os.getenv('USER_CONTEXT_MAX', 10000))             # максимум профилей в памяти
+USER_ACTIVITY_INTERVAL = float(os.getenv('USER_ACTIVITY_INTERVAL', 300)) # как часто записывать last_activity, сек
+DB_QUERIES_WARN = int(os.getenv('DB_QUERIES_WARN', 8))                   # запросов к базе на обновление до предупреждения
+
+# ==================== Мониторинг ====================
+DB_QUERIES = Histogram('db_queries_per_update', 'Database queries made while handling one update', ['event'],
+                       buckets=(0, 1, 2, 3, 4, 6, 8, 12, 20, 50))
+USER_CONTEXT_LOADS = Counter('user_context_loads_total', 'User context lookups', ['result'])
+USER_CONTEXTS = Gauge('user_contexts', 'User contexts kept in memory', multiprocess_mode='livesum')
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime.datetime]:
+    try:
+        return datetime.datetime.strptime(value, TIME_FORMAT) if value else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class UserContext:
+    """Профиль пользователя на время обработки обновления (параметр обработчика user_context)"""
+
+    user_id: int
+    registered: bool
+    age_group: Optional[str]
+    premium: bool
+    premium_until: Optional[datetime.datetime]
+    trial_used: bool
+    is_admin: bool
+    ai_usage: int
+    ai_usage_date: date
+    last_activity: Optional[datetime.datetime]
+    blocked: bool
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def load(cls, user_id: int) -> "UserContext":
+        """Читает профиль из базы одним запросом"""
+        today = date.today()
+        row = db.get_user_context(user_id, today)
+        return cls(
+            user_id=user_id,
+            registered=row["registered"],
+            age_group=row["age_group"],
+            premium=row["is_premium"],
+            premium_until=_parse_time(row["premium_until"]),
+            trial_used=row["trial_used"],
+            is_admin=row["is_admin"],
+            ai_usage=row["ai_usage"],
+            ai_usage_date=today,
+            last_activity=_parse_time(row["last_activity"]),
+            blocked=row["blocked"],
+        )
+
+    @property
+    def is_premium(self) -> bool:
+        """Подписка активна (как check_premium_status, но без записи в базу)"""
+        if not self.premium:
+            return False
+        return self.premium_until is None or self.premium_until >= datetime.datetime.now()
+
+    @property
+    def ai_usage_today(self) -> int:
+        """Запросов к AI за сегодня; профиль из кэша мог быть загружен вчера"""
+        return self.ai_usage if self.ai_usage_date == date.today() else 0
+
+    def activity_stale(self, interval: float) -> bool:
+        """Нужно ли записать last_activity: давно не обновлялась или пользователь отмечен заблокировавшим"""
+        if not self.registered:
+            return False
+        if self.blocked or self.last_activity is None:
+            return True
+        return (datetime.datetime.now() - self.last_activity).total_seconds() >= interval
+
+
+class UserContextCache:
+    """Ограниченный LRU-кэш профилей с коротким TTL и сбросом при изменении профиля"""
+
+    def __init__(self, maxsize: int = USER_CONTEXT_MAX, ttl: float = USER_CONTEXT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._contexts: "OrderedDict[int, UserContext]" = OrderedDict()
+
+    def get(self, user_id: int) -> UserContext:
+        """Профиль из кэша, а если его нет или он устарел — из базы"""
+        context = self._contexts.get(user_id)
+        if context is not None and time.monotonic() - context.loaded_at < self.ttl:
+            self._contexts.move_to_end(user_id)
+            USER_CONTEXT_LOADS.labels(result='hit').inc()
+            return context
+
+        context = UserContext.load(user_id)
+        self._contexts[user_id] = context
+        self._contexts.move_to_end(user_id)
+        while len(self._contexts) > self.maxsize:
+            self._contexts.popitem(last=False)
+        USER_CONTEXT_LOADS.labels(result='miss').inc()
+        USER_CONTEXTS.set(len(self._contexts))
+        return context
+
+    def invalidate(self, user_id: int) -> None:
+        """Сбрасывает профиль: следующее обновление пользователя прочитает его из базы"""
+        self._contexts.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._contexts.clear()
+        USER_CONTEXTS.set(0)
+
+    def __len__(self) -> int:
+        return len(self._contexts)
+
+
+user_contexts = UserContextCache()
+# Запись профиля через db в этом процессе сразу сбрасывает его из кэша
+db.subscribe_user_changes(user_contexts.invalidate)
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """
+    Загружает профиль пользователя один раз на обновление
+
+    Обработчики получают UserContext параметром user_context вместо отдельных
+    запросов get_user_age, check_premium_status, is_admin и get_ai_usage.
+    Время активности записывается здесь же, не чаще раза в activity_interval.
+    Число запросов к базе за обновление (вместе с запросами обработчика)
+    попадает в гистограмму db_queries_per_update, а при превышении warn_queries —
+    в лог, чтобы лишние обращения к базе было видно сразу.
+    """
+
+    def __init__(self, cache: Optional[UserContextCache] = None,
+                 activity_interval: float = USER_ACTIVITY_INTERVAL, warn_queries: int = DB_QUERIES_WARN):
+        self.cache = cache or user_contexts
+        self.activity_interval = activity_interval
+        self.warn_queries = warn_queries
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        counter = QueryCounter()
+        token = current_queries.set(counter)
+        try:
+            user = data.get("event_from_user")
+            if user is not None and not user.is_bot:
+                context = self.cache.get(user.id)
+                if context.activity_stale(self.activity_interval):
+                    db.update_user_activity(user.id)
+                    context.last_activity = datetime.datetime.now().replace(microsecond=0)
+                    context.blocked = False
+                data["user_context"] = context
+            return await handler(event, data)
+        finally:
+            current_queries.reset(token)
+            event_type = type(event).__name__
+            DB_QUERIES.labels(event=event_type).observe(counter.count)
+            if counter.count > self.warn_queries:
+                logging.warning(f"{counter.count} DB queries for one {event_type} ({self._describe(event)})")
+
+    @staticmethod
+    def _describe(event: TelegramObject) -> str:
+        if isinstance(event, CallbackQuery):
+            return f"data={event.data}"
+        if isinstance(event, Message):
+            return f"text={(event.text or '')[:32]!r}"
+        return "-"
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from prometheus_client import Counter, Gauge
+
+# ==================== Конфигурация ====================
+USER_LIMIT = int(os.getenv('USER_LIMIT', 3))                    # одновременных тяжелых операций на пользователя
+USER_RATE = float(os.getenv('USER_RATE', 2))                    # тяжелых операций в секунду
+USER_BURST = int(os.getenv('USER_BURST', 6))                    # допустимая серия нажатий
+USER_QUEUE_TIMEOUT = float(os.getenv('USER_QUEUE_TIMEOUT', 10)) # сколько ждать свободного слота
+USER_LIMITERS_MAX = int(os.getenv('USER_LIMITERS_MAX', 10000))  # максимум пользователей в памяти
+USER_LIMITER_TTL = float(os.getenv('USER_LIMITER_TTL', 600))    # удалять лимитеры после простоя, сек
+
+# ==================== Мониторинг ====================
+USER_LIMIT_REJECTS = Counter('user_limit_rejects_total', 'Heavy updates rejected by per-user limiter', ['reason'])
+USER_LIMITERS = Gauge('user_limiters', 'Per-user limiters kept in memory', multiprocess_mode='livesum')
+
+
+class UserLimiter:
+    """Ограничитель одного пользователя: число одновременных операций + token bucket"""
+
+    __slots__ = ("concurrency", "rate", "burst", "active", "tokens", "updated_at", "last_seen", "_waiters")
+
+    def __init__(self, concurrency: int, rate: float, burst: int):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.active = 0
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.last_seen = self.updated_at
+        self._waiters: "OrderedDict[asyncio.Future, None]" = OrderedDict()
+
+    @property
+    def idle(self) -> bool:
+        """Лимитер можно удалить: нет активных и ожидающих операций"""
+        return self.active == 0 and not self._waiters
+
+    def take_token(self) -> bool:
+        """Списывает токен скорости, если он есть"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.last_seen = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def acquire(self, timeout: float) -> bool:
+        """Занимает слот; при отсутствии свободного ждет в очереди не дольше timeout"""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            return True
+
+        future = asyncio.get_event_loop().create_future()
+        self._waiters[future] = None
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._waiters.pop(future, None)
+            if future.done() and not future.cancelled():
+                # release() уже передал слот, но ожидающий ушел: передаем слот дальше
+                self.release()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return False
+        finally:
+            self._waiters.pop(future, None)
+
+    def release(self) -> None:
+        """Освобождает слот и передает его первому ожидающему"""
+        self.last_seen = time.monotonic()
+        for future in self._waiters:
+            if not future.done():
+                # Слот переходит ожидающему без уменьшения счетчика
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class UserLimiterRegistry:
+    """Ограниченный LRU-словарь лимитеров с вытеснением простаивающих пользователей"""
+
+    def __init__(self, maxsize: int = USER_LIMITERS_MAX, ttl: float = USER_LIMITER_TTL,
+                 concurrency: int = USER_LIMIT, rate: float = USER_RATE, burst: int = USER_BURST):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self._limiters: "OrderedDict[int, UserLimiter]" = OrderedDict()
+
+    def get(self, user_id: int) -> UserLimiter:
+        """Возвращает лимитер пользователя, создавая его при необходимости"""
+        limiter = self._limiters.get(user_id)
+        if limiter is None:
+            limiter = UserLimiter(self.concurrency, self.rate, self.burst)
+            self._limiters[user_id] = limiter
+            self._evict()
+        else:
+            self._limiters.move_to_end(user_id)
+        return limiter
+
+    def _evict(self) -> None:
+        """Удаляет простаивающие лимитеры: устаревшие по TTL и самые старые при переполнении"""
+        now = time.monotonic()
+        for user_id in list(self._limiters):
+            limiter = self._limiters[user_id]
+            overflow = len(self._limiters) > self.maxsize
+            expired = now - limiter.last_seen > self.ttl
+            if not overflow and not expired:
+                # Дальше по LRU-порядку только более свежие записи
+                break
+            if limiter.idle:
+                del self._limiters[user_id]
+        USER_LIMITERS.set(len(self._limiters))
+
+    def __len__(self) -> int:
+        return len(self._limiters)
+
+
+class UserLimiterMiddleware(BaseMiddleware):
+    """
+    Ограничивает тяжелые обработчики (флаг heavy) на одного пользователя
+
+    Лишние параллельные операции ждут в очереди, слишком частые нажатия отклоняются,
+    поэтому один пользователь не может занять общие семафоры S3 и Telegram.
+    """
+
+    def __init__(self, registry: Optional[UserLimiterRegistry] = None, queue_timeout: float = USER_QUEUE_TIMEOUT):
+        self.registry = registry or UserLimiterRegistry()
+        self.queue_timeout = queue_timeout
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if not user or not get_flag(data, "heavy"):
+            return await handler(event, data)
+
+        limiter = self.registry.get(user.id)
+
+        if not limiter.take_token():
+            USER_LIMIT_REJECTS.labels(reason='rate').inc()
+            await self._reject(event, "⏳ Слишком много запросов. Подождите пару секунд.")
+            return None
+
+        if not await limiter.acquire(self.queue_timeout):
+            USER_LIMIT_REJECTS.labels(reason='busy').inc()
+            await self._reject(event, "⏳ Предыдущие запросы ещё выполняются. Попробуйте чуть позже.")
+            return None
+
+        try:
+            return await handler(event, data)
+        finally:
+            limiter.release()
+
+    @staticmethod
+    async def _reject(event: TelegramObject, text: str) -> None:
+        """Сообщает пользователю об отклоненном запросе"""
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer(text)
+            elif isinstance(event, Message):
+                await event.answer(text)
+        except Exception as e:
+            logging.warning(f"Не удалось сообщить об ограничении запросов: {e}")
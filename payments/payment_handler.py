@@ -1,17 +1,33 @@
+import asyncio
 import uuid
 import os
 import datetime
 import secrets
 import logging
+import time
 from typing import Dict, Any, Optional, Tuple
 
 import aiohttp
 import json
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from prometheus_client import Counter, Histogram
 
 from database.database import Database
 
+# ==================== Конфигурация ====================
+YOOKASSA_POOL_SIZE = int(os.getenv('YOOKASSA_POOL_SIZE', 10))            # одновременных соединений с ЮКассой
+YOOKASSA_KEEPALIVE = float(os.getenv('YOOKASSA_KEEPALIVE', 30))          # сколько держать простаивающее соединение, сек
+YOOKASSA_DNS_TTL = int(os.getenv('YOOKASSA_DNS_TTL', 300))               # кэш DNS, сек
+YOOKASSA_TIMEOUT = float(os.getenv('YOOKASSA_TIMEOUT', 30))              # общий тайм-аут запроса, сек
+YOOKASSA_CONNECT_TIMEOUT = float(os.getenv('YOOKASSA_CONNECT_TIMEOUT', 10))  # тайм-аут установки соединения, сек
+
+# ==================== Мониторинг ====================
+YOOKASSA_REQUESTS = Counter('yookassa_requests_total', 'YooKassa API requests', ['operation', 'status'])
+YOOKASSA_SECONDS = Histogram('yookassa_request_seconds', 'YooKassa API request duration', ['operation'],
+                             buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+YOOKASSA_CONNECTIONS = Counter('yookassa_connections_total', 'Connections used for YooKassa requests', ['kind'])
+
 
 class YooKassaPayment:
     def __init__(self, shop_id: str, api_key: str, db: Database, return_url: str):
@@ -29,6 +45,89 @@ class YooKassaPayment:
         self.return_url = return_url
         self.base_url = os.getenv("YOOKASSA_BASE_URL")
         self.logger = logging.getLogger("YooKassaPayment")
+        # Одна keep-alive сессия на процесс: TCP и TLS устанавливаются один раз, а не на каждый платеж
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ==================== HTTP ====================
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия; создается при первом запросе в текущем цикле событий (в воркере — своя)"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection_created)
+            trace.on_connection_reuseconn.append(self._on_connection_reused)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=YOOKASSA_POOL_SIZE,
+                    ttl_dns_cache=YOOKASSA_DNS_TTL,
+                    keepalive_timeout=YOOKASSA_KEEPALIVE
+                ),
+                timeout=aiohttp.ClientTimeout(total=YOOKASSA_TIMEOUT, connect=YOOKASSA_CONNECT_TIMEOUT),
+                auth=aiohttp.BasicAuth(self.shop_id, self.api_key),
+                trace_configs=[trace]
+            )
+            self._session_loop = loop
+        return self._session
+
+    @staticmethod
+    async def _on_connection_created(session, context, params) -> None:
+        YOOKASSA_CONNECTIONS.labels(kind='new').inc()
+
+    @staticmethod
+    async def _on_connection_reused(session, context, params) -> None:
+        YOOKASSA_CONNECTIONS.labels(kind='reused').inc()
+
+    async def _request(self, method: str, path: str, operation: str,
+                       payload: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Запрос к API ЮКассы через общую сессию
+
+        Создание платежа идет с ключом идемпотентности, поэтому запрос, оборвавшийся
+        на закрытом ЮКассой keep-alive соединении, один раз повторяется с тем же ключом:
+        второй платеж при этом не создается.
+
+        :param method: HTTP-метод
+        :param path: Путь относительно YOOKASSA_BASE_URL, например /payments
+        :param operation: Название операции для логов и метрик
+        :param payload: Тело запроса (JSON)
+        :return: Ответ ЮКассы при статусе 200, иначе None (ошибка пишется в лог)
+        """
+        headers = {"Idempotence-Key": secrets.token_hex(16)} if payload is not None else None
+        started = time.monotonic()
+        for attempt in (1, 2):
+            try:
+                async with self._get_session().request(method, f"{self.base_url}{path}",
+                                                       json=payload, headers=headers) as response:
+                    status = response.status
+                    body = await response.text()
+                break
+            except (aiohttp.ServerDisconnectedError, aiohttp.ClientOSError) as e:
+                # Повторяется только обрыв уже установленного соединения, не ошибка подключения
+                if attempt == 2 or isinstance(e, aiohttp.ClientConnectorError):
+                    YOOKASSA_REQUESTS.labels(operation=operation, status='error').inc()
+                    raise
+                self.logger.warning(f"YooKassa connection dropped during {operation}, retrying: {e!r}")
+            except Exception:
+                YOOKASSA_REQUESTS.labels(operation=operation, status='error').inc()
+                raise
+        YOOKASSA_SECONDS.labels(operation=operation).observe(time.monotonic() - started)
+        YOOKASSA_REQUESTS.labels(operation=operation, status=str(status)).inc()
+
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = body
+        if status == 200:
+            return data
+        self.logger.error(f"Error in {operation}: {status} {data}")
+        return None
+
+    async def close(self) -> None:
+        """Закрывает общую сессию (при остановке бота или воркера)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     async def create_trial_payment(self, user_id: int, username: str, first_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -91,42 +190,25 @@ class YooKassaPayment:
             }
         }
         
-        # Выполняем запрос к API ЮКассы
-        headers = {
-            "Content-Type": "application/json",
-            "Idempotence-Key": secrets.token_hex(16)
-        }
-        auth = aiohttp.BasicAuth(self.shop_id, self.api_key)
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/payments",
-                    json=payment_data,
-                    headers=headers,
-                    auth=auth
-                ) as response:
-                    self.logger.info(f"[TRIAL] YooKassa response status: {response.status}")
-                    if response.status == 200:
-                        payment_info = await response.json()
-                        self.logger.info(f"[TRIAL] YooKassa response: {payment_info}")
-                        
-                        # Сохраняем информацию о платеже в БД
-                        self.db.add_payment(
-                            payment_info["id"],
-                            user_id,
-                            1.0,
-                            "RUB",
-                            payment_info["status"],
-                            False,
-                            "Пробная подписка на 3 дня"
-                        )
-                        
-                        return payment_info
-                    else:
-                        error_data = await response.json()
-                        self.logger.error(f"Error creating trial payment: {error_data}")
-                        return None
+            # Выполняем запрос к API ЮКассы
+            payment_info = await self._request("POST", "/payments", "create_trial_payment", payment_data)
+            if payment_info is None:
+                return None
+            self.logger.info(f"[TRIAL] YooKassa response: {payment_info}")
+
+            # Сохраняем информацию о платеже в БД
+            self.db.add_payment(
+                payment_info["id"],
+                user_id,
+                1.0,
+                "RUB",
+                payment_info["status"],
+                False,
+                "Пробная подписка на 3 дня"
+            )
+
+            return payment_info
         except Exception as e:
             self.logger.error(f"Exception in create_trial_payment: {e}")
             return None
@@ -185,40 +267,24 @@ class YooKassaPayment:
             }
         }
         
-        # Выполняем запрос к API ЮКассы
-        headers = {
-            "Content-Type": "application/json",
-            "Idempotence-Key": secrets.token_hex(16)
-        }
-        auth = aiohttp.BasicAuth(self.shop_id, self.api_key)
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/payments",
-                    json=payment_data,
-                    headers=headers,
-                    auth=auth
-                ) as response:
-                    if response.status == 200:
-                        payment_info = await response.json()
-                        
-                        # Сохраняем информацию о платеже в БД
-                        self.db.add_payment(
-                            payment_info["id"],
-                            user_id,
-                            250.0,
-                            "RUB",
-                            payment_info["status"],
-                            False,
-                            "Премиум подписка на 30 дней"
-                        )
-                        
-                        return payment_info
-                    else:
-                        error_data = await response.json()
-                        self.logger.error(f"Error creating regular payment: {error_data}")
-                        return None
+            # Выполняем запрос к API ЮКассы
+            payment_info = await self._request("POST", "/payments", "create_regular_payment", payment_data)
+            if payment_info is None:
+                return None
+
+            # Сохраняем информацию о платеже в БД
+            self.db.add_payment(
+                payment_info["id"],
+                user_id,
+                250.0,
+                "RUB",
+                payment_info["status"],
+                False,
+                "Премиум подписка на 30 дней"
+            )
+
+            return payment_info
         except Exception as e:
             self.logger.error(f"Exception in create_regular_payment: {e}")
             return None
@@ -273,45 +339,29 @@ class YooKassaPayment:
             }
         }
         
-        # Выполняем запрос к API ЮКассы
-        headers = {
-            "Content-Type": "application/json",
-            "Idempotence-Key": secrets.token_hex(16)
-        }
-        auth = aiohttp.BasicAuth(self.shop_id, self.api_key)
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/payments",
-                    json=payment_data,
-                    headers=headers,
-                    auth=auth
-                ) as response:
-                    if response.status == 200:
-                        payment_info = await response.json()
-                        
-                        # Сохраняем информацию о платеже в БД
-                        self.db.add_payment(
-                            payment_info["id"],
-                            user_id,
-                            250.0,
-                            "RUB",
-                            payment_info["status"],
-                            True,
-                            "Автоматическое продление премиум подписки на 30 дней",
-                            payment_method_id
-                        )
-                        
-                        # Если платеж успешен, обновляем статус премиум подписки
-                        if payment_info["status"] == "succeeded":
-                            self.db.set_premium_status(user_id, True, 30)
-                        
-                        return payment_info
-                    else:
-                        error_data = await response.json()
-                        self.logger.error(f"Error creating recurring payment: {error_data}")
-                        return None
+            # Выполняем запрос к API ЮКассы
+            payment_info = await self._request("POST", "/payments", "create_recurring_payment", payment_data)
+            if payment_info is None:
+                return None
+
+            # Сохраняем информацию о платеже в БД
+            self.db.add_payment(
+                payment_info["id"],
+                user_id,
+                250.0,
+                "RUB",
+                payment_info["status"],
+                True,
+                "Автоматическое продление премиум подписки на 30 дней",
+                payment_method_id
+            )
+
+            # Если платеж успешен, обновляем статус премиум подписки
+            if payment_info["status"] == "succeeded":
+                self.db.set_premium_status(user_id, True, 30)
+
+            return payment_info
         except Exception as e:
             self.logger.error(f"Exception in create_recurring_payment: {e}")
             return None
@@ -323,21 +373,8 @@ class YooKassaPayment:
         :param payment_id: ID платежа
         :return: Данные о платеже или None в случае ошибки
         """
-        auth = aiohttp.BasicAuth(self.shop_id, self.api_key)
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/payments/{payment_id}",
-                    auth=auth
-                ) as response:
-                    if response.status == 200:
-                        payment_info = await response.json()
-                        return payment_info
-                    else:
-                        error_data = await response.json()
-                        self.logger.error(f"Error checking payment status: {error_data}")
-                        return None
+            return await self._request("GET", f"/payments/{payment_id}", "check_payment_status")
         except Exception as e:
             self.logger.error(f"Exception in check_payment_status: {e}")
             return None
@@ -504,7 +541,7 @@ class YooKassaPayment:
         """
         Создание платежа на подарочную подписку (30 дней) с генерацией кода подарка
         """
-        import uuid, secrets, aiohttp
+        import uuid
         from datetime import datetime
         # Идентификатор платежа
         payment_id = f"gift_{user_id}_{uuid.uuid4()}"
@@ -531,25 +568,13 @@ class YooKassaPayment:
                 ]
             }
         }
-        headers = {"Content-Type": "application/json", "Idempotence-Key": secrets.token_hex(16)}
-        auth = aiohttp.BasicAuth(self.shop_id, self.api_key)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/payments",
-                    json=payment_data,
-                    headers=headers,
-                    auth=auth
-                ) as response:
-                    if response.status == 200:
-                        payment_info = await response.json()
-                        # Сохраняем код подарка в БД
-                        self.db.add_gift_subscription(gift_code, user_id)
-                        return payment_info
-                    else:
-                        error_data = await response.json()
-                        self.logger.error(f"Error creating gift payment: {error_data}")
-                        return None
+            payment_info = await self._request("POST", "/payments", "create_gift_payment", payment_data)
+            if payment_info is None:
+                return None
+            # Сохраняем код подарка в БД
+            self.db.add_gift_subscription(gift_code, user_id)
+            return payment_info
         except Exception as e:
             self.logger.error(f"Exception in create_gift_payment: {e}")
             return None 
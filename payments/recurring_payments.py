@@ -132,15 +132,15 @@ class RecurringPaymentScheduler:
             
             # Открываем главное меню
             from handlers.common import show_main_menu
-            from aiogram.fsm.storage.memory import MemoryStorage
             from aiogram.fsm.context import FSMContext
+            from aiogram.fsm.storage.base import StorageKey
+            from utils.fsm_storage import fsm_storage
             
             # Получаем возрастную группу пользователя
             age_group = self.db.get_user_age(user_id)
             
-            # Создаем объект состояния
-            storage = MemoryStorage()
-            state = FSMContext(storage=storage, key=storage.build_key(bot=self.bot, user_id=user_id, chat_id=user_id))
+            # Состояние пользователя в общем хранилище бота
+            state = FSMContext(storage=fsm_storage, key=StorageKey(bot_id=self.bot.id, chat_id=user_id, user_id=user_id))
             
             # Открываем главное меню (не редактируя текущее сообщение)
             await show_main_menu(user_id, age_group, state)
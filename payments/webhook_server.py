@@ -1,10 +1,13 @@
 import os
+import asyncio
+import hmac
 import logging
 import json
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, Set
 
 from aiohttp import web
 from aiogram import Bot, Dispatcher
+from aiogram.types import Update
 
 from database.database import Database
 from payments.payment_handler import YooKassaPayment
@@ -14,9 +17,11 @@ class WebhookServer:
     def __init__(self, bot: Bot, db: Database, payment_handler: YooKassaPayment, dp: Dispatcher,
                  host: str = "0.0.0.0", port: int = 8080, 
                  payment_notification_path: str = "/payment-notification",
-                 payment_return_path: str = "/payment-return"):
+                 payment_return_path: str = "/payment-return",
+                 telegram_path: Optional[str] = None, telegram_secret: Optional[str] = None,
+                 update_sink: Optional[Callable[[Dict[str, Any]], None]] = None):
         """
-        Инициализация веб-сервера для обработки вебхуков от ЮКассы
+        Инициализация веб-сервера для обработки вебхуков от ЮКассы и Telegram
         
         :param bot: Экземпляр бота
         :param db: Экземпляр базы данных
@@ -26,6 +31,9 @@ class WebhookServer:
         :param port: Порт для запуска сервера
         :param payment_notification_path: Путь для уведомлений от ЮКассы
         :param payment_return_path: Путь для возврата пользователя после оплаты
+        :param telegram_path: Путь для обновлений Telegram (None — бот работает через polling)
+        :param telegram_secret: Секрет, который Telegram передает в X-Telegram-Bot-Api-Secret-Token
+        :param update_sink: Получатель JSON обновлений вместо dp (супервизор процессов-воркеров)
         """
         self.bot = bot
         self.db = db
@@ -35,7 +43,12 @@ class WebhookServer:
         self.port = port
         self.payment_notification_path = payment_notification_path
         self.payment_return_path = payment_return_path
+        self.telegram_path = telegram_path
+        self.telegram_secret = telegram_secret
+        self.update_sink = update_sink
         self.app = None
+        # Ссылки на фоновые обработки обновлений, чтобы задачи не собрал сборщик мусора
+        self._update_tasks: Set[asyncio.Task] = set()
         self.logger = logging.getLogger("WebhookServer")
         
         # Устанавливаем полный URL для возврата пользователя из окружения
@@ -91,9 +104,10 @@ class WebhookServer:
                     if payment_status == "succeeded":
                         from handlers.common import show_main_menu
                         from aiogram.fsm.context import FSMContext
+                        from aiogram.fsm.storage.base import StorageKey
                         
                         age_group = self.db.get_user_age(user_id)
-                        key = f"chat:{user_id}:user:{user_id}:state"
+                        key = StorageKey(bot_id=self.bot.id, chat_id=user_id, user_id=user_id)
                         state = FSMContext(self.dp.storage, key)
                         await state.set_state(None)
                         await show_main_menu(user_id, age_group, state)
@@ -127,6 +141,60 @@ class WebhookServer:
                 return web.HTTPFound(redirect_url)
             return web.Response(status=200, text="OK")
     
+    async def handle_telegram_update(self, request: web.Request) -> web.Response:
+        """
+        Прием обновления Telegram в режиме вебхука
+
+        Ответ 200 отдается сразу после разбора, обработчики выполняются в фоне
+        через dp.feed_update: Telegram не ждет их и не повторяет доставку по таймауту.
+
+        :param request: HTTP запрос от Telegram
+        :return: HTTP ответ
+        """
+        if self.telegram_secret:
+            token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not hmac.compare_digest(token.encode(), self.telegram_secret.encode()):
+                self.logger.warning(f"Rejected Telegram update with invalid secret from {request.remote}")
+                return web.Response(status=401)
+
+        try:
+            data = await request.json()
+            if self.update_sink:
+                # Обновление разбирает воркер, которому оно достанется
+                self.update_sink(data)
+                return web.Response(status=200)
+            update = Update.model_validate(data, context={"bot": self.bot})
+        except Exception as e:
+            self.logger.error(f"Invalid Telegram update: {e}")
+            return web.Response(status=400)
+
+        task = asyncio.create_task(self._feed_update(update))
+        self._update_tasks.add(task)
+        task.add_done_callback(self._update_tasks.discard)
+        return web.Response(status=200)
+
+    async def _feed_update(self, update: Update) -> None:
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            self.logger.error(f"Error processing update {update.update_id}: {e}")
+
+    async def set_telegram_webhook(self, base_url: str, max_connections: int = 40) -> None:
+        """
+        Регистрирует вебхук в Telegram
+
+        :param base_url: Публичный адрес сервера (https://...), к нему добавляется telegram_path
+        :param max_connections: Сколько одновременных запросов Telegram может открыть к серверу
+        """
+        url = base_url.rstrip("/") + self.telegram_path
+        await self.bot.set_webhook(
+            url=url,
+            secret_token=self.telegram_secret,
+            allowed_updates=self.dp.resolve_used_update_types(),
+            max_connections=max_connections
+        )
+        self.logger.info(f"Telegram webhook set to {url}")
+
     async def start(self) -> None:
         """
         Запуск веб-сервера
@@ -134,6 +202,8 @@ class WebhookServer:
         self.app = web.Application()
         self.app.router.add_post(r"/payment-notification{slash:/?}", self.handle_payment_notification)
         self.app.router.add_get(r"/payment-return{slash:/?}", self.handle_payment_return)
+        if self.telegram_path:
+            self.app.router.add_post(self.telegram_path, self.handle_telegram_update)
         
         runner = web.AppRunner(self.app)
         await runner.setup()
@@ -143,6 +213,8 @@ class WebhookServer:
         self.logger.info(f"Webhook server started on {self.host}:{self.port}")
         self.logger.info(f"Payment notification URL: {self.payment_notification_path}")
         self.logger.info(f"Payment return URL: {self.return_url}")
+        if self.telegram_path:
+            self.logger.info(f"Telegram updates URL: {self.telegram_path}")
     
     def get_return_url(self) -> str:
         """
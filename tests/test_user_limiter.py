@@ -0,0 +1,73 @@
+import asyncio
+
+from middlewares.user_limiter import UserLimiter
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def cancel_after_handoff(limiter: UserLimiter, waiter: asyncio.Task) -> None:
+    """release() передает слот ожидающему, которого отменяют раньше, чем он проснется"""
+    limiter.release()
+    waiter.cancel()
+    try:
+        acquired = await waiter
+    except asyncio.CancelledError:
+        return
+    # До Python 3.12 wait_for возвращает уже полученный результат вместо отмены:
+    # слот остается у ожидающего, и middleware освободит его после обработчика
+    assert acquired
+    limiter.release()
+
+
+def test_release_hands_slot_to_waiter():
+    async def scenario():
+        limiter = UserLimiter(concurrency=1, rate=1, burst=1)
+        assert await limiter.acquire(timeout=1)
+        waiter = asyncio.create_task(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+
+        limiter.release()
+        assert await waiter
+        assert limiter.active == 1
+
+        limiter.release()
+        assert limiter.idle
+
+    run(scenario())
+
+
+def test_cancel_after_handoff_passes_slot_on():
+    async def scenario():
+        limiter = UserLimiter(concurrency=1, rate=1, burst=1)
+        assert await limiter.acquire(timeout=1)
+        cancelled = asyncio.create_task(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+        next_waiter = asyncio.create_task(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+
+        await cancel_after_handoff(limiter, cancelled)
+
+        # Слот достается следующему ожидающему, а не теряется
+        assert await asyncio.wait_for(next_waiter, 0.5)
+        limiter.release()
+        assert limiter.active == 0
+        assert limiter.idle
+
+    run(scenario())
+
+
+def test_cancel_after_handoff_without_waiters_frees_slot():
+    async def scenario():
+        limiter = UserLimiter(concurrency=1, rate=1, burst=1)
+        assert await limiter.acquire(timeout=1)
+        waiter = asyncio.create_task(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+
+        await cancel_after_handoff(limiter, waiter)
+
+        assert limiter.active == 0
+        assert await limiter.acquire(timeout=0.1)
+
+    run(scenario())
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from database.database import Database, db
+from utils.content_ids import content_index
+from utils.s3_service import S3Entry, list_all_objects
+
+AGE_GROUPS = ("0-3", "4-6", "7-10")
+SECTION = "Полезное"
+
+
+def normalize_path(path: str) -> str:
+    """Приводит путь к виду 'Контент/4-6/Полезное/Тема' (без крайних слэшей)"""
+    return path.strip("/")
+
+
+class AccessNode:
+    """Папка раздела «Полезное» с заранее вычисленным состоянием замка"""
+
+    __slots__ = ("path", "name", "parent", "children", "files", "own", "denied", "locked")
+
+    def __init__(self, path: str, name: str, parent: Optional["AccessNode"] = None):
+        self.path = path
+        self.name = name
+        self.parent = parent
+        self.children: Dict[str, "AccessNode"] = {}
+        self.files: List[S3Entry] = []
+        self.own = False        # папка закрыта администратором
+        self.denied = False     # закрыта сама папка или один из ее родителей
+        self.locked = False     # замок на кнопке: для папки с подпапками — закрыты все подпапки
+
+    @property
+    def subfolders(self) -> List["AccessNode"]:
+        return list(self.children.values())
+
+    def recompute(self) -> None:
+        """Пересчитывает denied для поддерева и locked для самой папки и ее потомков"""
+        self.denied = self.own or bool(self.parent and self.parent.denied)
+        for child in self.children.values():
+            child.recompute()
+        self.update_locked()
+
+    def update_locked(self) -> None:
+        if self.children:
+            self.locked = all(child.locked for child in self.children.values())
+        else:
+            self.locked = self.denied
+
+
+class AccessTree:
+    def __init__(self, db: Database, ttl: float = 600):
+        """
+        Дерево доступа к разделу «Полезное», ключ — полный путь папки
+
+        Строится одним проходом по каталогу S3 и таблице locked_categories.
+        Экраны раздела читают готовое состояние замков без обращений к S3 и базе,
+        переключение замка администратором пересчитывает только затронутую ветку.
+
+        :param db: Экземпляр базы данных
+        :param ttl: Через сколько секунд перечитывать каталог S3
+        """
+        self.db = db
+        self.ttl = ttl
+        self.nodes: Dict[str, AccessNode] = {}
+        self.built_at = 0.0
+        self.listeners: List[Callable[[str, bool], Any]] = []
+        self.logger = logging.getLogger("AccessTree")
+        self._lock = asyncio.Lock()
+
+    def subscribe(self, listener: Callable[[str, bool], Any]) -> None:
+        """Подписка на переключение замков: listener получает путь папки и новое состояние"""
+        self.listeners.append(listener)
+
+    # ==================== Построение ====================
+    async def ensure_built(self) -> None:
+        """Строит дерево при первом обращении и после истечения ttl"""
+        if self.nodes and time.monotonic() - self.built_at < self.ttl:
+            return
+        async with self._lock:
+            if self.nodes and time.monotonic() - self.built_at < self.ttl:
+                return
+            await self.rebuild()
+
+    async def rebuild(self) -> None:
+        """Полностью перестраивает дерево по каталогу S3"""
+        objects = []
+        for age_group in AGE_GROUPS:
+            objects.extend(await list_all_objects(f"Контент/{age_group}/{SECTION}/"))
+
+        nodes: Dict[str, AccessNode] = {}
+        for age_group in AGE_GROUPS:
+            root_path = f"Контент/{age_group}/{SECTION}"
+            nodes[root_path] = AccessNode(root_path, SECTION)
+
+        for obj in objects:
+            parts = obj["Key"].split("/")
+            parent = nodes.get("/".join(parts[:3]))
+            if parent is None:
+                continue
+            for i in range(3, len(parts) - 1):
+                path = "/".join(parts[:i + 1])
+                node = nodes.get(path)
+                if node is None:
+                    node = AccessNode(path, parts[i], parent)
+                    nodes[path] = node
+                    parent.children[parts[i]] = node
+                parent = node
+            if parts[-1]:
+                parent.files.append(S3Entry("file", parts[-1], obj["Key"], obj.get("ETag")))
+
+        locked = self._migrate_legacy(nodes, set(self.db.get_all_locked_categories()))
+        for path, node in nodes.items():
+            node.own = path in locked
+        for age_group in AGE_GROUPS:
+            nodes[f"Контент/{age_group}/{SECTION}"].recompute()
+
+        # Кнопки раздела ссылаются на папки и файлы по ID, их пути должны находиться в любом процессе
+        for path, node in nodes.items():
+            content_index.id_for(path)
+            for entry in node.files:
+                content_index.id_for(entry.key)
+
+        self.nodes = nodes
+        self.built_at = time.monotonic()
+        self.logger.info(f"Access tree built: {len(nodes)} folders, {len(locked)} locked")
+
+    def _migrate_legacy(self, nodes: Dict[str, AccessNode], locked: Set[str]) -> Set[str]:
+        """
+        Переводит старые записи locked_categories (только имя папки) на полные пути
+
+        Имя без пути раньше закрывало все папки с таким названием во всех возрастах,
+        поэтому оно заменяется путями всех совпадающих папок. Имя, для которого
+        папки в каталоге пока нет, остается в базе до следующей пересборки.
+        """
+        legacy = {name for name in locked if "/" not in name}
+        if not legacy:
+            return locked
+
+        result = locked - legacy
+        matched = set()
+        for path, node in nodes.items():
+            if node.name in legacy and node.parent is not None:
+                self.db.add_locked_category(path)
+                result.add(path)
+                matched.add(node.name)
+        for name in matched:
+            self.db.remove_locked_category(name)
+        if matched:
+            self.logger.info(f"Migrated {len(matched)} name-only locks to path locks")
+        if len(matched) < len(legacy):
+            self.logger.debug(f"Name-only locks without matching folders kept: {sorted(legacy - matched)}")
+        return result
+
+    # ==================== Чтение ====================
+    def get(self, path: str) -> Optional[AccessNode]:
+        return self.nodes.get(normalize_path(path))
+
+    def is_denied(self, path: str) -> bool:
+        """Закрыта ли папка для пользователя без подписки (с учетом родителей)"""
+        node = self.get(path)
+        return bool(node and node.denied)
+
+    # ==================== Изменение ====================
+    def set_locked(self, path: str, locked: bool) -> bool:
+        """
+        Закрывает или открывает папку и пересчитывает только затронутую ветку
+
+        :return: True, если состояние изменилось
+        """
+        path = normalize_path(path)
+        node = self.nodes.get(path)
+        if node is not None and node.own == locked:
+            return False
+
+        if locked:
+            self.db.add_locked_category(path)
+        else:
+            self.db.remove_locked_category(path)
+
+        self.apply_locked(path, locked)
+        for listener in self.listeners:
+            try:
+                listener(path, locked)
+            except Exception as e:
+                self.logger.error(f"Lock listener failed for {path}: {e}")
+        return True
+
+    def apply_locked(self, path: str, locked: bool) -> None:
+        """Применяет к дереву замок, уже записанный в базу (в том числе другим процессом)"""
+        node = self.nodes.get(normalize_path(path))
+        if node is None or node.own == locked:
+            return
+
+        node.own = locked
+        node.recompute()
+        # Замки родителей зависят от замков детей
+        parent = node.parent
+        while parent is not None:
+            parent.update_locked()
+            parent = parent.parent
+
+    def set_many(self, paths: Iterable[str], locked: bool) -> int:
+        """Переключает несколько папок, возвращает число изменений"""
+        return sum(self.set_locked(path, locked) for path in paths)
+
+
+access_tree = AccessTree(db)
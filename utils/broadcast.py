@@ -0,0 +1,268 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from database.database import Database, db
+from database.segments import Segment
+from utils.library import bot
+from utils.send_gateway import TG_BULK_CONCURRENCY, bulk_lane, run_bulk
+
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+DONE = "done"
+
+STATUS_TITLES = {
+    RUNNING: "▶️ идет",
+    PAUSED: "⏸ на паузе",
+    CANCELLED: "⛔️ отменена",
+    DONE: "✅ завершена",
+}
+
+
+class BroadcastManager:
+    def __init__(self, bot: Bot, db: Database, batch_size: int = 200,
+                 concurrency: int = TG_BULK_CONCURRENCY, progress_interval: float = 5.0):
+        """
+        Фоновые рассылки с сохранением прогресса в базе
+
+        Получатели сегмента читаются из users порциями по возрастанию user_id, результат
+        отправки каждому сохраняется в broadcast_recipients. После рестарта
+        незавершенные рассылки продолжаются с места остановки без повторов.
+
+        :param bot: Экземпляр бота
+        :param db: Экземпляр базы данных
+        :param batch_size: Получателей в одной порции
+        :param concurrency: Параллельных отправок (темп ограничивает шлюз отправки)
+        :param progress_interval: Как часто обновлять сообщение с прогрессом, сек
+        """
+        self.bot = bot
+        self.db = db
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self.logger = logging.getLogger("BroadcastManager")
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self._statuses: Dict[int, str] = {}
+        self._copy_disabled: Dict[int, bool] = {}
+        self._progress_texts: Dict[int, str] = {}
+
+    # ==================== Жизненный цикл ====================
+    async def start(self) -> None:
+        """Продолжает рассылки, прерванные остановкой бота"""
+        for job_id in self.db.get_broadcasts_by_status(RUNNING):
+            self.logger.info(f"Resuming broadcast #{job_id}")
+            self._spawn(job_id)
+
+    async def stop(self) -> None:
+        """Останавливает задачи; статус running сохраняется для продолжения после запуска"""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    # ==================== Управление ====================
+    async def create(self, admin_id: int, text: Optional[str], media_type: Optional[str] = None,
+                     media_id: Optional[str] = None, source_chat_id: Optional[int] = None,
+                     source_message_id: Optional[int] = None, segment: Optional[Segment] = None) -> int:
+        """
+        Создает рассылку, отправляет администратору сообщение с прогрессом и запускает отправку
+
+        :param source_chat_id: Чат с образцом сообщения (предпросмотр) для copy_message
+        :param source_message_id: ID образца; если его удалят, отправка пойдет по file_id
+        :param segment: Аудитория рассылки (по умолчанию — все, кто не заблокировал бота)
+        :return: ID рассылки
+        """
+        segment = segment or Segment()
+        total = self.db.count_segment(segment)
+        # Заблокировавшие бота не попадают в выборку получателей, в отчете они показаны отдельно
+        everyone = self.db.count_segment(segment.without_delivery_filter())
+        job_id = self.db.create_broadcast(
+            admin_id, text, media_type, media_id, source_chat_id, source_message_id,
+            total=total, skipped=max(0, everyone - total), segment=segment
+        )
+        job = self.db.get_broadcast(job_id)
+        progress_text = self._render(job)
+        message = await self.bot.send_message(admin_id, progress_text, reply_markup=self._keyboard(job))
+        self.db.set_broadcast_progress_message(job_id, admin_id, message.message_id)
+        self._progress_texts[job_id] = progress_text
+        self._spawn(job_id)
+        return job_id
+
+    async def pause(self, job_id: int) -> bool:
+        return await self._change_status(job_id, PAUSED, (RUNNING,))
+
+    async def resume(self, job_id: int) -> bool:
+        if not await self._change_status(job_id, RUNNING, (PAUSED,)):
+            return False
+        self._spawn(job_id)
+        return True
+
+    async def cancel(self, job_id: int) -> bool:
+        return await self._change_status(job_id, CANCELLED, (RUNNING, PAUSED))
+
+    async def _change_status(self, job_id: int, status: str, allowed: tuple) -> bool:
+        job = self.db.get_broadcast(job_id)
+        if not job or job["status"] not in allowed:
+            return False
+        self.db.set_broadcast_status(job_id, status)
+        self._statuses[job_id] = status
+        await self._update_progress(job_id)
+        return True
+
+    def _spawn(self, job_id: int) -> None:
+        task = self.tasks.get(job_id)
+        if task and not task.done():
+            return
+        self._statuses[job_id] = RUNNING
+        self.tasks[job_id] = asyncio.create_task(self._run(job_id))
+
+    # ==================== Отправка ====================
+    async def _run(self, job_id: int) -> None:
+        """Проходит по получателям порциями, пока рассылка не завершена, не на паузе и не отменена"""
+        progress_task = asyncio.create_task(self._progress_loop(job_id))
+        try:
+            with bulk_lane():
+                while self._statuses.get(job_id) == RUNNING:
+                    job = self.db.get_broadcast(job_id)
+                    if not job or job["status"] != RUNNING:
+                        break
+
+                    user_ids = self.db.get_segment_ids_after(job["segment"], job["last_user_id"], self.batch_size)
+                    if not user_ids:
+                        self.db.set_broadcast_status(job_id, DONE)
+                        self._statuses[job_id] = DONE
+                        self.logger.info(f"Broadcast #{job_id} finished: {job['sent']} sent, "
+                                         f"{job['failed']} failed, {job['skipped']} skipped as blocked")
+                        break
+
+                    # После рестарта часть порции уже могла быть отправлена
+                    processed = self.db.get_broadcast_processed(job_id, user_ids)
+                    pending = [user_id for user_id in user_ids if user_id not in processed]
+                    await run_bulk(pending, lambda user_id: self._send_one(job, user_id), self.concurrency)
+
+                    # Курсор двигается только если порция обработана целиком (не было паузы/отмены)
+                    if self._statuses.get(job_id) == RUNNING:
+                        self.db.set_broadcast_cursor(job_id, user_ids[-1])
+        except Exception as e:
+            self.logger.error(f"Broadcast #{job_id} stopped with error: {e}")
+        finally:
+            progress_task.cancel()
+            self.tasks.pop(job_id, None)
+            await self._update_progress(job_id)
+
+    async def _send_one(self, job: Dict, user_id: int) -> None:
+        """Отправляет рассылку одному получателю и сохраняет результат"""
+        job_id = job["job_id"]
+        if self._statuses.get(job_id) != RUNNING:
+            return
+        try:
+            await self._deliver(job, user_id)
+            self.db.record_broadcast_result(job_id, user_id, True)
+        except Exception as e:
+            self.db.record_broadcast_result(job_id, user_id, False, str(e)[:200])
+
+    async def _deliver(self, job: Dict, user_id: int) -> None:
+        """
+        Копирует образец сообщения (без повторной загрузки медиа),
+        а если образец удален — отправляет по file_id
+        """
+        job_id = job["job_id"]
+        if job["source_message_id"] and not self._copy_disabled.get(job_id):
+            try:
+                await self.bot.copy_message(
+                    chat_id=user_id,
+                    from_chat_id=job["source_chat_id"],
+                    message_id=job["source_message_id"]
+                )
+                return
+            except TelegramBadRequest as e:
+                if "message to copy not found" not in str(e).lower():
+                    raise
+                self.logger.warning(f"Broadcast #{job_id}: source message is gone, sending by file_id")
+                self._copy_disabled[job_id] = True
+
+        media_type = job["media_type"]
+        media_id = job["media_id"]
+        text = job["text"]
+        if media_type == "photo":
+            await self.bot.send_photo(user_id, media_id, caption=text)
+        elif media_type == "video":
+            await self.bot.send_video(user_id, media_id, caption=text)
+        elif media_type == "document":
+            await self.bot.send_document(user_id, media_id, caption=text)
+        elif media_type == "audio":
+            await self.bot.send_audio(user_id, media_id, caption=text)
+        else:
+            await self.bot.send_message(user_id, text)
+
+    # ==================== Прогресс ====================
+    async def _progress_loop(self, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._update_progress(job_id)
+
+    async def _update_progress(self, job_id: int) -> None:
+        """Редактирует сообщение администратора, если прогресс изменился"""
+        job = self.db.get_broadcast(job_id)
+        if not job or not job["progress_message_id"]:
+            return
+        text = self._render(job)
+        if self._progress_texts.get(job_id) == text:
+            return
+        try:
+            await self.bot.edit_message_text(
+                text=text,
+                chat_id=job["progress_chat_id"],
+                message_id=job["progress_message_id"],
+                reply_markup=self._keyboard(job)
+            )
+            self._progress_texts[job_id] = text
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                self.logger.warning(f"Failed to update broadcast #{job_id} progress: {e}")
+        except Exception as e:
+            self.logger.warning(f"Failed to update broadcast #{job_id} progress: {e}")
+
+    @staticmethod
+    def _render(job: Dict) -> str:
+        processed = job["sent"] + job["failed"]
+        percent = processed / job["total"] * 100 if job["total"] else 100.0
+        return (
+            f"📤 Рассылка #{job['job_id']}: {STATUS_TITLES.get(job['status'], job['status'])}\n"
+            f"👥 Аудитория: {job['segment'].describe()}\n\n"
+            f"✅ Успешно: {job['sent']}\n"
+            f"❌ Не удалось: {job['failed']}\n"
+            f"🚫 Пропущено (бот заблокирован): {job['skipped']}\n"
+            f"👥 Всего получателей: {job['total']}\n"
+            f"📊 Выполнено: {min(percent, 100.0):.1f}%"
+        )
+
+    @staticmethod
+    def _keyboard(job: Dict) -> InlineKeyboardMarkup:
+        job_id = job["job_id"]
+        if job["status"] == RUNNING:
+            rows = [[
+                InlineKeyboardButton(text="⏸ Пауза", callback_data=f"broadcast_pause_{job_id}"),
+                InlineKeyboardButton(text="⛔️ Отменить", callback_data=f"broadcast_cancel_{job_id}")
+            ]]
+        elif job["status"] == PAUSED:
+            rows = [[
+                InlineKeyboardButton(text="▶️ Продолжить", callback_data=f"broadcast_resume_{job_id}"),
+                InlineKeyboardButton(text="⛔️ Отменить", callback_data=f"broadcast_cancel_{job_id}")
+            ]]
+        else:
+            rows = []
+        rows.append([InlineKeyboardButton(text="Вернуться в админ-панель ⏪", callback_data="admin_panel")])
+        return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+broadcast_manager = BroadcastManager(bot, db)
@@ -0,0 +1,160 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from aiogram import BaseMiddleware, Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.middlewares.manager import MiddlewareManager
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery
+
+
+class CallbackPrefix(Filter):
+    """callback_data начинается с одного из префиксов"""
+
+    __slots__ = ("prefixes",)
+
+    def __init__(self, *prefixes: str):
+        self.prefixes = prefixes
+
+    async def __call__(self, query: CallbackQuery) -> bool:
+        return query.data is not None and query.data.startswith(self.prefixes)
+
+
+class CallbackExact(Filter):
+    """callback_data совпадает с одним из значений"""
+
+    __slots__ = ("values",)
+
+    def __init__(self, *values: str):
+        self.values = frozenset(values)
+
+    async def __call__(self, query: CallbackQuery) -> bool:
+        return query.data in self.values
+
+
+class _Route:
+    """Обработчик в порядке обхода aiogram и готовая цепочка его middleware"""
+
+    __slots__ = ("order", "router", "handler", "call")
+
+    def __init__(self, order: int, router: Router, handler: HandlerObject, call: Callable[..., Awaitable[Any]]):
+        self.order = order
+        self.router = router
+        self.handler = handler
+        self.call = call
+
+
+class CallbackIndex(BaseMiddleware):
+    def __init__(self):
+        """
+        Маршрутизация callback_query по словарю и префиксному дереву
+
+        Обычный обход aiogram проверяет фильтры всех обработчиков всех роутеров
+        по порядку, пока один не подойдет. compile() собирает обработчики с
+        фильтрами CallbackExact и CallbackPrefix в словарь точных значений и
+        дерево префиксов; outer middleware находит по callback_data только
+        подходящих кандидатов и проверяет их в исходном порядке. Остальные
+        фильтры обработчика (состояние FSM и т.п.) проверяются как обычно,
+        обработчики без этих фильтров остаются кандидатами для любого нажатия.
+        """
+        self.exact: Dict[str, List[_Route]] = {}
+        self.prefixes: Dict[str, Any] = {}
+        self.fallback: List[_Route] = []
+        self.enabled = False
+        self.logger = logging.getLogger("CallbackIndex")
+
+    @staticmethod
+    def _walk(router: Router) -> Iterator[Router]:
+        # Порядок как в Router._propagate_event: сам роутер, затем вложенные
+        yield router
+        for sub_router in router.sub_routers:
+            yield from CallbackIndex._walk(sub_router)
+
+    def compile(self, root: Router) -> None:
+        """
+        Строит индекс по всем обработчикам callback_query под root
+
+        Вызывается после подключения роутеров и middleware.
+        """
+        self.exact, self.prefixes, self.fallback = {}, {}, []
+        order = 0
+        for router in self._walk(root):
+            observer = router.observers["callback_query"]
+            if router is not root and len(observer.outer_middleware):
+                # Outer middleware вложенных роутеров при прямом вызове не выполнились бы
+                self.logger.warning(f"Router {router.name} has outer middleware, callback index disabled")
+                self.enabled = False
+                return
+
+            middlewares = [
+                middleware
+                for parent in reversed(tuple(router.chain_head))
+                for middleware in parent.observers["callback_query"].middleware
+            ]
+            for handler in observer.handlers:
+                route = _Route(order, router, handler, MiddlewareManager.wrap_middlewares(middlewares, handler.call))
+                order += 1
+                self._add(route)
+
+        self.enabled = True
+        self.logger.info(f"Callback index compiled: {order} handlers, {len(self.exact)} exact values, "
+                         f"{len(self.fallback)} without index")
+
+    def _add(self, route: _Route) -> None:
+        for event_filter in route.handler.filters or ():
+            if isinstance(event_filter.callback, CallbackExact):
+                for value in event_filter.callback.values:
+                    self.exact.setdefault(value, []).append(route)
+                return
+            if isinstance(event_filter.callback, CallbackPrefix):
+                for prefix in event_filter.callback.prefixes:
+                    node = self.prefixes
+                    for char in prefix:
+                        node = node.setdefault(char, {})
+                    node.setdefault(None, []).append(route)
+                return
+        self.fallback.append(route)
+
+    def candidates(self, data: Optional[str]) -> List[_Route]:
+        """Обработчики, которые могут подойти для callback_data, в порядке обхода aiogram"""
+        routes = list(self.fallback)
+        if data is not None:
+            routes.extend(self.exact.get(data, ()))
+            node = self.prefixes
+            routes.extend(node.get(None, ()))
+            for char in data:
+                node = node.get(char)
+                if node is None:
+                    break
+                routes.extend(node.get(None, ()))
+        # Обработчик с несколькими подходящими префиксами проверяется один раз
+        return sorted({route.order: route for route in routes}.values(), key=lambda route: route.order)
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not self.enabled:
+            return await handler(event, data)
+
+        for route in self.candidates(event.data):
+            kwargs = {**data, "event_router": route.router}
+            observer = route.router.observers["callback_query"]
+            passed, kwargs = await observer.check_root_filters(event, **kwargs)
+            if not passed:
+                continue
+            kwargs["handler"] = route.handler
+            passed, kwargs = await route.handler.check(event, **kwargs)
+            if not passed:
+                continue
+            try:
+                return await route.call(event, kwargs)
+            except SkipHandler:
+                continue
+        return UNHANDLED
+
+
+callback_index = CallbackIndex()
@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.s3_service import list_all_objects
+from utils.send_gateway import bulk_lane
+
+CatalogListener = Callable[[str], None]
+
+
+class CatalogWatcher:
+    def __init__(self, prefix: str = "Контент/", depth: int = 2, check_interval: int = 300):
+        """
+        Отслеживание изменений каталога S3 по разделам
+
+        Раз в check_interval секунд получает полный список объектов и считает
+        отпечаток (ключи и ETag) каждого раздела на depth уровней ниже prefix,
+        например «Контент/4-6/Музыка/». Для разделов, отпечаток которых
+        изменился, появился или исчез, вызываются подписчики — кэши экранов
+        сбрасывают только затронутые записи.
+
+        :param prefix: Корневой префикс каталога
+        :param depth: Глубина раздела относительно prefix (возраст/категория)
+        :param check_interval: Интервал между проверками в секундах
+        """
+        self.prefix = prefix
+        self.depth = depth
+        self.check_interval = check_interval
+        self.digests: Optional[Dict[str, str]] = None
+        self.listeners: List[CatalogListener] = []
+        self.logger = logging.getLogger("CatalogWatcher")
+        self.is_running = False
+        self.task = None
+
+    def subscribe(self, listener: CatalogListener) -> None:
+        """Подписка на изменения: listener получает префикс измененного раздела"""
+        self.listeners.append(listener)
+
+    async def start(self) -> None:
+        """
+        Запуск фоновой проверки каталога
+        """
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self.task = asyncio.create_task(self._run())
+        self.logger.info(f"Catalog watcher started (every {self.check_interval}s)")
+
+    async def stop(self) -> None:
+        """
+        Остановка фоновой проверки каталога
+        """
+        if not self.is_running or not self.task:
+            return
+
+        self.is_running = False
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.logger.info("Catalog watcher stopped")
+
+    async def _run(self) -> None:
+        while self.is_running:
+            try:
+                with bulk_lane():
+                    await self.check()
+            except Exception as e:
+                self.logger.error(f"Error checking catalog: {e}")
+
+            await asyncio.sleep(self.check_interval)
+
+    def section(self, key: str) -> Optional[str]:
+        """Префикс раздела, к которому относится объект, или None для объектов выше раздела"""
+        parts = key[len(self.prefix):].split("/")
+        if len(parts) <= self.depth:
+            return None
+        return self.prefix + "/".join(parts[:self.depth]) + "/"
+
+    async def check(self) -> List[str]:
+        """
+        Одна проверка каталога
+
+        :return: Префиксы измененных разделов
+        """
+        hashes: Dict[str, Any] = {}
+        for obj in await list_all_objects(self.prefix):
+            section = self.section(obj["Key"])
+            if section is None:
+                continue
+            digest = hashes.get(section)
+            if digest is None:
+                digest = hashes[section] = hashlib.sha1()
+            digest.update(f"{obj['Key']}\0{obj.get('ETag')}\n".encode())
+        digests = {section: digest.hexdigest() for section, digest in hashes.items()}
+
+        previous, self.digests = self.digests, digests
+        if previous is None:
+            # Первая проверка: то, что закэшировано до нее, могло устареть
+            self.notify(self.prefix)
+            return []
+
+        changed = sorted(
+            section for section in previous.keys() | digests.keys()
+            if previous.get(section) != digests.get(section)
+        )
+        for section in changed:
+            self.notify(section)
+        if changed:
+            self.logger.info(f"Catalog changed: {', '.join(changed)}")
+        return changed
+
+    def notify(self, prefix: str) -> None:
+        """Сообщает подписчикам об изменении под префиксом (также для ручного сброса)"""
+        for listener in self.listeners:
+            try:
+                listener(prefix)
+            except Exception as e:
+                self.logger.error(f"Catalog listener failed for {prefix}: {e}")
+
+
+catalog_watcher = CatalogWatcher(check_interval=int(os.getenv("CATALOG_CHECK_INTERVAL", 300)))
@@ -0,0 +1,109 @@
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.async_cache import AsyncTTLCache
+from utils.catalog import catalog_watcher
+from utils.content_ids import content_index
+from utils.s3_service import list_folder_names
+from utils.screens import Screen
+
+# Элемент списка: (ID содержимого для callback_data, имя папки или файла)
+ListItem = Tuple[str, str]
+ListRenderer = Callable[[str, List[ListItem]], Screen]
+EmptyHandler = Callable[[str], Awaitable[None]]
+
+
+class CategoryListCache:
+    def __init__(self, ttl: float = 24 * 3600):
+        """
+        Кэш отрисованных списков разделов по (раздел, возраст)
+
+        Список папки S3 и собранная из него клавиатура хранятся до тех пор,
+        пока CatalogWatcher не сообщит об изменении под префиксом раздела;
+        ttl — страховка на случай, если проверка каталога не работает.
+        Нажатие на раздел обходится без S3 и пересборки клавиатуры.
+        Кнопки элементов несут стабильный ID из content_index, поэтому
+        выбор элемента не зависит от FSM и переживает перезапуск.
+
+        :param ttl: Максимальное время жизни записи в секундах
+        """
+        self._folders: Dict[str, str] = {}
+        self._renderers: Dict[str, ListRenderer] = {}
+        self._on_empty: Dict[str, Optional[EmptyHandler]] = {}
+        self._cache = AsyncTTLCache(ttl=ttl, maxsize=256)
+        # Счетчик сбросов по ключу: загрузка, во время которой был сброс, не сохраняется
+        self._generations: Dict[Tuple[str, str], int] = {}
+        self.logger = logging.getLogger("CategoryListCache")
+
+    def register(self, category: str, folder: str,
+                 on_empty: Optional[EmptyHandler] = None) -> Callable[[ListRenderer], ListRenderer]:
+        """
+        Декоратор функции отрисовки списка раздела
+
+        :param category: Имя раздела ('music', 'fairy', ...)
+        :param folder: Шаблон папки S3 с {age_group}, например "Контент/{age_group}/Музыка/"
+        :param on_empty: Вызывается один раз на загрузку, если папка пуста
+        """
+        def decorator(render: ListRenderer) -> ListRenderer:
+            self._folders[category] = folder
+            self._renderers[category] = render
+            self._on_empty[category] = on_empty
+            return render
+        return decorator
+
+    def folder(self, category: str, age_group: str) -> str:
+        return self._folders[category].format(age_group=age_group)
+
+    async def get(self, category: str, age_group: str) -> Screen:
+        """Готовый список раздела; при ошибке S3 — пустой список без сохранения в кэш"""
+        key = (category, age_group)
+        generation = self._generations.setdefault(key, 0)
+        try:
+            listing = await self._cache.get_or_load(key, lambda: self._load(category, age_group))
+        except Exception as e:
+            self.logger.error(f"Failed to list {self.folder(category, age_group)}: {e}")
+            return self._renderers[category](age_group, [])
+
+        # Каталог изменился во время загрузки: результат отдается, но не остается в кэше
+        if self._generations.get(key, 0) != generation:
+            self._cache.invalidate(key)
+        return listing
+
+    async def _load(self, category: str, age_group: str) -> Screen:
+        folder = self.folder(category, age_group)
+        item_names = await list_folder_names(folder)
+        on_empty = self._on_empty[category]
+        if not item_names and on_empty:
+            await on_empty(age_group)
+        items = [(content_index.id_for(folder + name), name) for name in item_names]
+        return self._renderers[category](age_group, items)
+
+    async def resolve(self, category: str, age_group: str, content_id: str) -> Optional[str]:
+        """
+        Имя элемента раздела по ID из callback_data
+
+        Если ID еще не встречался в этом процессе (перезапуск, другой воркер),
+        загружается список раздела — он заполняет content_index.
+
+        :return: Имя папки или файла либо None, если элемента больше нет
+        """
+        folder = self.folder(category, age_group)
+        path = content_index.resolve(content_id)
+        if path is None:
+            await self.get(category, age_group)
+            path = content_index.resolve(content_id)
+        if path is None or not path.startswith(folder):
+            return None
+        return path[len(folder):]
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        """Сбрасывает списки разделов, папка которых лежит под prefix или содержит его"""
+        for key in list(self._generations):
+            folder = self.folder(*key)
+            if folder.startswith(prefix) or prefix.startswith(folder):
+                self._generations[key] += 1
+                self._cache.invalidate(key)
+
+
+category_lists = CategoryListCache()
+catalog_watcher.subscribe(category_lists.invalidate_prefix)
@@ -0,0 +1,39 @@
+import base64
+import hashlib
+import logging
+from typing import Dict, Optional
+
+
+class ContentIndex:
+    def __init__(self, length: int = 10):
+        """
+        Короткие стабильные ID путей каталога для callback_data
+
+        ID — первые length символов base32 от blake2b пути, поэтому он одинаков
+        в любом процессе и после перезапуска, а в callback_data не попадают
+        имена папок (лимит Telegram — 64 байта). Обратное отображение хранится
+        в памяти и заполняется при построении списков и дерева каталога;
+        поиск по ID — одно обращение к словарю, без FSM.
+
+        :param length: Длина ID (10 символов base32 — 50 бит)
+        """
+        self.length = length
+        self.paths: Dict[str, str] = {}
+        self.logger = logging.getLogger("ContentIndex")
+
+    def id_for(self, path: str) -> str:
+        """ID пути; путь запоминается для resolve"""
+        path = path.strip("/")
+        digest = hashlib.blake2b(path.encode(), digest_size=8).digest()
+        content_id = base64.b32encode(digest).decode()[:self.length].lower()
+        known = self.paths.setdefault(content_id, path)
+        if known != path:
+            self.logger.error(f"Content ID collision: {content_id} for {known} and {path}")
+        return content_id
+
+    def resolve(self, content_id: str) -> Optional[str]:
+        """Путь по ID или None, если он еще не встречался в этом процессе"""
+        return self.paths.get(content_id)
+
+
+content_index = ContentIndex()
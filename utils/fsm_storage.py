@@ -0,0 +1,118 @@
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Mapping, Optional
+
+import msgpack
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, db_file: str = "bot_database.db", ttl: int = 3 * 24 * 3600,
+                 cleanup_interval: int = 3600, key_builder: Optional[KeyBuilder] = None):
+        """
+        FSM-хранилище в SQLite вместо MemoryStorage
+
+        Состояние и данные пользователя лежат одной строкой таблицы fsm_states,
+        данные сериализуются в msgpack. В данных хранятся только простые значения
+        (id сообщений, имена файлов, ключи S3) — объекты с подписанными URL
+        туда не попадают, URL получается при показе. Память процесса не растет
+        с числом пользователей, состояние переживает перезапуск и общее для
+        процессов-воркеров.
+
+        Записи, которые не обновлялись дольше ttl, при чтении считаются пустыми,
+        а удаляются очисткой при записи не чаще раза в cleanup_interval.
+
+        :param db_file: Файл базы (по умолчанию общий с Database)
+        :param ttl: Через сколько секунд без изменений состояние сбрасывается
+        :param cleanup_interval: Как часто удалять просроченные записи, в секундах
+        :param key_builder: Построитель ключей aiogram
+        """
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.logger = logging.getLogger("SQLiteStorage")
+        self.connection = sqlite3.connect(db_file)
+        # WAL и synchronous=NORMAL: запись — без fsync на каждое нажатие кнопки
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS fsm_states (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data BLOB,
+                updated_at INTEGER NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states(updated_at)")
+        self.connection.commit()
+        self._last_cleanup = 0.0
+
+    def _row(self, key: StorageKey):
+        row = self.connection.execute(
+            "SELECT state, data, updated_at FROM fsm_states WHERE key = ?",
+            (self.key_builder.build(key),)
+        ).fetchone()
+        if row and row[2] < time.time() - self.ttl:
+            return None
+        return row
+
+    def _write(self, key: StorageKey, column: str, value: Any) -> None:
+        now = int(time.time())
+        other = "data" if column == "state" else "state"
+        storage_key = self.key_builder.build(key)
+        # Вторая колонка просроченной записи не должна ожить вместе с новым значением
+        self.connection.execute(
+            f"INSERT INTO fsm_states (key, {column}, updated_at) VALUES (?, ?, ?) "
+            f"ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}, "
+            f"{other} = CASE WHEN updated_at < ? THEN NULL ELSE {other} END, "
+            f"updated_at = excluded.updated_at",
+            (storage_key, value, now, now - self.ttl)
+        )
+        if value is None:
+            # Пустая запись не нужна: пользователь без состояния и данных не занимает места
+            self.connection.execute(
+                "DELETE FROM fsm_states WHERE key = ? AND state IS NULL AND data IS NULL", (storage_key,)
+            )
+        if now - self._last_cleanup >= self.cleanup_interval:
+            self._last_cleanup = now
+            self.evict_expired()
+        self.connection.commit()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._write(key, "state", state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        row = self._row(key)
+        return row[0] if row else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        self._write(key, "data", msgpack.packb(dict(data), use_bin_type=True) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        row = self._row(key)
+        if not row or row[1] is None:
+            return {}
+        return msgpack.unpackb(row[1], raw=False)
+
+    def evict_expired(self) -> int:
+        """
+        Удаляет состояния, которые не менялись дольше ttl
+
+        :return: Сколько записей удалено
+        """
+        deleted = self.connection.execute(
+            "DELETE FROM fsm_states WHERE updated_at < ?", (int(time.time()) - self.ttl,)
+        ).rowcount
+        self.connection.commit()
+        if deleted:
+            self.logger.info(f"Evicted {deleted} idle FSM states")
+        return deleted
+
+    async def close(self) -> None:
+        self.connection.close()
+
+
+fsm_storage = SQLiteStorage(ttl=int(os.getenv("FSM_STATE_TTL", 3 * 24 * 3600)))
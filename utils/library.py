@@ -16,11 +16,11 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, C
 from aiogram.filters import CommandStart, Command
 from aiogram.client.default import DefaultBotProperties
 from aiogram.fsm.state import StatesGroup, State
-from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
+from utils.fsm_storage import fsm_storage
 
 load_dotenv()
 
 Token = os.getenv('TOKEN')
-dp = Dispatcher()
+dp = Dispatcher(storage=fsm_storage)
 bot = Bot(token=Token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
\ No newline at end of file
@@ -0,0 +1,101 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiogram.types import Message
+
+from database.database import db
+from utils.s3_service import generate_download_url
+
+# ==================== Кэш file_id ====================
+# Telegram хранит загруженный файл и отдает file_id, по которому его можно
+# отправлять повторно без скачивания из S3. Ключ кэша — (S3 key, ETag),
+# поэтому измененный в бакете файл автоматически загружается заново.
+FILE_ID_CACHE: Dict[Tuple[str, str], str] = {}
+
+
+def normalize_etag(etag: Optional[str]) -> str:
+    """Приводит ETag из ответа S3 к виду без кавычек"""
+    return (etag or "").strip('"')
+
+
+def get_file_id(key: str, etag: Optional[str]) -> Optional[str]:
+    """Возвращает file_id для версии объекта S3, если файл уже загружался в Telegram"""
+    etag = normalize_etag(etag)
+    if not key or not etag:
+        return None
+
+    cache_key = (key, etag)
+    file_id = FILE_ID_CACHE.get(cache_key)
+    if file_id:
+        return file_id
+
+    record = db.get_telegram_file(key, etag)
+    if record:
+        FILE_ID_CACHE[cache_key] = record["file_id"]
+        return record["file_id"]
+    return None
+
+
+async def media_source(key: str, etag: Optional[str], url: Optional[str] = None) -> str:
+    """Возвращает file_id из кэша, иначе готовый или новый presigned URL"""
+    file_id = get_file_id(key, etag)
+    if file_id:
+        return file_id
+    if url:
+        return url
+    return await generate_download_url(key)
+
+
+def extract_file(message: Message) -> Optional[Tuple[str, str, str]]:
+    """Достает (тип, file_id, file_unique_id) из отправленного сообщения"""
+    if not isinstance(message, Message):
+        return None
+    if message.audio:
+        return "audio", message.audio.file_id, message.audio.file_unique_id
+    if message.video:
+        return "video", message.video.file_id, message.video.file_unique_id
+    if message.document:
+        return "document", message.document.file_id, message.document.file_unique_id
+    if message.animation:
+        return "animation", message.animation.file_id, message.animation.file_unique_id
+    if message.photo:
+        photo = message.photo[-1]
+        return "photo", photo.file_id, photo.file_unique_id
+    return None
+
+
+def remember_message(key: str, etag: Optional[str], message: Message) -> None:
+    """Сохраняет file_id из результата отправки файла"""
+    etag = normalize_etag(etag)
+    if not key or not etag:
+        return
+
+    extracted = extract_file(message)
+    if not extracted:
+        return
+
+    media_type, file_id, file_unique_id = extracted
+    if FILE_ID_CACHE.get((key, etag)) == file_id:
+        return
+
+    FILE_ID_CACHE[(key, etag)] = file_id
+    try:
+        db.save_telegram_file(key, etag, media_type, file_id, file_unique_id)
+    except Exception as e:
+        logging.error(f"Не удалось сохранить file_id для {key}: {e}")
+
+
+def remember_messages(sources: Iterable[Tuple[str, Optional[str]]], messages: List[Message]) -> None:
+    """Сохраняет file_id для медиагруппы (порядок сообщений совпадает с порядком файлов)"""
+    for (key, etag), message in zip(sources, messages or []):
+        remember_message(key, etag, message)
+
+
+def forget(key: str, etag: Optional[str]) -> None:
+    """Удаляет file_id, который Telegram перестал принимать"""
+    etag = normalize_etag(etag)
+    FILE_ID_CACHE.pop((key, etag), None)
+    try:
+        db.delete_telegram_file(key, etag)
+    except Exception as e:
+        logging.error(f"Не удалось удалить file_id для {key}: {e}")
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import random
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram.types import InputMediaAudio
+
+from utils.library import bot
+from utils.media_cache import media_source, remember_message, remember_messages
+from utils.s3_service import iter_objects
+
+GROUP_SIZE = 10          # максимум файлов в медиагруппе Telegram
+PREPARE_CONCURRENCY = 10  # одновременных подготовок (presign) на одну отправку
+LOOKAHEAD_GROUPS = 2     # сколько групп готовится впрок, пока отправляется текущая
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.3
+BACKOFF_CAP = 3.0
+
+
+async def with_backoff(operation: Callable[[], Awaitable[Any]], attempts: int = MAX_ATTEMPTS,
+                       base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> Any:
+    """
+    Выполняет операцию с повторами: экспоненциальная пауза со случайным разбросом (full jitter)
+
+    Разброс не дает параллельным отправкам повторять запросы одновременно.
+    """
+    for attempt in range(attempts):
+        try:
+            return await operation()
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(random.uniform(0, min(cap, base * 2 ** attempt)))
+
+
+async def iter_files(prefix: str, predicate: Optional[Callable[[str], bool]] = None) -> AsyncIterator[Dict]:
+    """Файлы под префиксом (рекурсивно) в порядке листинга, по мере получения страниц"""
+    async for page in iter_objects(prefix, delimiter=None):
+        for file_info in page.get('Contents', []):
+            key = file_info['Key']
+            if key.endswith('/'):
+                continue
+            if predicate and not predicate(key.split('/')[-1]):
+                continue
+            yield file_info
+
+
+async def deliver_audio(chat_id: int, files: AsyncIterator[Dict], errors: List[str],
+                        caption: Optional[str] = None,
+                        before_first_send: Optional[Callable[[], Awaitable[Any]]] = None) -> Tuple[int, int]:
+    """
+    Отправляет аудио группами по 10 конвейером
+
+    Источники файлов (file_id из кэша или presigned URL) готовятся параллельно
+    и с опережением: первая группа уходит, как только готова, а следующие
+    готовятся во время ее отправки.
+
+    :param chat_id: Получатель
+    :param files: Объекты S3 в порядке отправки
+    :param errors: Список для накопления ошибок
+    :param caption: Подпись первого файла
+    :param before_first_send: Вызывается один раз перед первой отправкой (например, убрать «Загружаем...»)
+    :return: (найдено файлов, отправлено файлов)
+    """
+    semaphore = asyncio.Semaphore(PREPARE_CONCURRENCY)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=LOOKAHEAD_GROUPS)
+    found = 0
+
+    async def prepare(file_info: Dict, index: int) -> Optional[Tuple[InputMediaAudio, Tuple[str, Optional[str]]]]:
+        key, etag = file_info['Key'], file_info.get('ETag')
+        try:
+            async with semaphore:
+                media = await with_backoff(lambda: media_source(key, etag))
+        except Exception as e:
+            errors.append(f"Ошибка при подготовке {key}: {str(e)}")
+            return None
+        audio = InputMediaAudio(
+            media=media,
+            caption=caption if index == 0 else None,
+            title=key.split('/')[-1]
+        )
+        return audio, (key, etag)
+
+    async def produce() -> None:
+        nonlocal found
+        group = []
+        try:
+            async for file_info in files:
+                group.append(asyncio.create_task(prepare(file_info, found)))
+                found += 1
+                if len(group) == GROUP_SIZE:
+                    await queue.put(group)
+                    group = []
+            if group:
+                await queue.put(group)
+                group = []
+        except asyncio.CancelledError:
+            # Отправка прервана: конец очереди и несобранную группу уже никто не прочитает
+            cancel_group(group)
+            raise
+        except Exception:
+            await queue.put(None)
+            raise
+        else:
+            await queue.put(None)
+        finally:
+            aclose = getattr(files, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    producer = asyncio.create_task(produce())
+    sent = 0
+    first = True
+    try:
+        while True:
+            group = await queue.get()
+            if group is None:
+                break
+            prepared = [item for item in await asyncio.gather(*group) if item]
+            if not prepared:
+                continue
+            if first and before_first_send:
+                await before_first_send()
+            first = False
+            sent += await send_audio_group(chat_id, prepared, errors)
+        # Ошибка листинга поднимается здесь, после отправки уже готовых файлов
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+        # Группы, подготовленные впрок, уже не отправятся
+        while not queue.empty():
+            cancel_group(queue.get_nowait())
+    return found, sent
+
+
+def cancel_group(group: Optional[List[asyncio.Task]]) -> None:
+    """Отменяет подготовку файлов группы, которая не будет отправлена"""
+    for task in group or ():
+        task.cancel()
+
+
+async def send_audio_group(chat_id: int, prepared: List[Tuple[InputMediaAudio, Tuple[str, Optional[str]]]],
+                           errors: List[str]) -> int:
+    """Отправляет до 10 аудио одной группой, при неудаче — по одному. Возвращает число отправленных"""
+    media_group = [audio for audio, _ in prepared]
+    media_sources = [source for _, source in prepared]
+    try:
+        messages = await with_backoff(lambda: bot.send_media_group(chat_id=chat_id, media=media_group))
+        remember_messages(media_sources, messages)
+        return len(media_group)
+    except Exception as e:
+        logging.error(f"Ошибка при отправке медиагруппы: {e}")
+        errors.append(f"Ошибка при отправке группы аудио: {str(e)}")
+
+    # Если не удалось отправить группой, пробуем отправить по одному
+    sent = 0
+    for audio, (key, etag) in prepared:
+        try:
+            message = await bot.send_audio(
+                chat_id=chat_id,
+                audio=audio.media,
+                caption=audio.caption,
+                title=audio.title
+            )
+            remember_message(key, etag, message)
+            sent += 1
+        except Exception as e:
+            errors.append(f"Ошибка при отправке {audio.title}: {str(e)}")
+    return sent
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramEntityTooLarge, TelegramRetryAfter
+from aiogram.types import URLInputFile
+
+from database.database import Database
+from utils.media_cache import normalize_etag, remember_message
+from utils.s3_service import list_all_objects, generate_download_url
+from utils.send_gateway import bulk_lane
+
+# Предзагружаются только типы, которые бот отправляет по file_id (видео открывается по ссылке)
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.ogg', '.wav')
+DOCUMENT_EXTENSIONS = ('.pdf',)
+# Лимит Bot API на загрузку файла ботом
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
+
+class MediaWarmer:
+    def __init__(self, bot: Bot, db: Database, storage_chat_id: int, prefix: str = "Контент/",
+                 check_interval: int = 6 * 3600, upload_delay: float = 3.0):
+        """
+        Фоновая предзагрузка медиа каталога в служебный чат Telegram
+
+        Проходит по каталогу S3, загружает новые и измененные (по ETag) аудио и PDF
+        в приватный чат-хранилище и сохраняет полученные file_id. После этого
+        пользовательские отправки сразу идут по file_id. Файлы больше 50 МБ
+        пропускаются, а версии, которые Telegram отклонил, запоминаются в базе
+        и не загружаются снова, пока не сменится ETag.
+
+        :param bot: Экземпляр бота
+        :param db: Экземпляр базы данных
+        :param storage_chat_id: ID приватного чата/канала для хранения файлов
+        :param prefix: Корневой префикс каталога в S3
+        :param check_interval: Интервал между проходами по каталогу в секундах
+        :param upload_delay: Пауза между загрузками (лимит Telegram ~20 сообщений в минуту на чат)
+        """
+        self.bot = bot
+        self.db = db
+        self.storage_chat_id = storage_chat_id
+        self.prefix = prefix
+        self.check_interval = check_interval
+        self.upload_delay = upload_delay
+        self.logger = logging.getLogger("MediaWarmer")
+        self.is_running = False
+        self.task = None
+
+    async def start(self) -> None:
+        """
+        Запуск фоновой предзагрузки
+        """
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self.task = asyncio.create_task(self._run())
+        self.logger.info(f"Media warmer started (storage chat {self.storage_chat_id})")
+
+    async def stop(self) -> None:
+        """
+        Остановка фоновой предзагрузки
+        """
+        if not self.is_running or not self.task:
+            return
+
+        self.is_running = False
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.logger.info("Media warmer stopped")
+
+    async def _run(self) -> None:
+        """
+        Основной цикл: проход по каталогу, затем ожидание следующей проверки
+        """
+        while self.is_running:
+            try:
+                # Предзагрузка — фоновая работа, она не должна задерживать ответы пользователям
+                with bulk_lane():
+                    await self.warm_catalog()
+            except Exception as e:
+                self.logger.error(f"Error warming media catalog: {e}")
+
+            await asyncio.sleep(self.check_interval)
+
+    @staticmethod
+    def _media_type(key: str) -> Optional[str]:
+        """
+        Определяет тип отправки по расширению файла
+
+        :param key: Ключ объекта S3
+        :return: 'audio', 'document' или None, если файл не предзагружается
+        """
+        name = key.lower()
+        if name.endswith(AUDIO_EXTENSIONS):
+            return "audio"
+        if name.endswith(DOCUMENT_EXTENSIONS):
+            return "document"
+        return None
+
+    async def get_pending(self) -> List[Dict]:
+        """
+        Разница каталога и кэша: объекты, для версии которых (ETag) еще нет file_id
+
+        Версии, которые уже не удалось загрузить, и файлы больше лимита Bot API
+        не скачиваются.
+
+        :return: Список объектов S3 для загрузки
+        """
+        objects = await list_all_objects(self.prefix)
+        known = self.db.get_telegram_file_versions() | self.db.get_media_warm_failures()
+        return [
+            obj for obj in objects
+            if not obj["Key"].endswith("/")
+            and self._media_type(obj["Key"])
+            and obj.get("Size", 0) <= MAX_UPLOAD_SIZE
+            and (obj["Key"], normalize_etag(obj.get("ETag"))) not in known
+        ]
+
+    async def warm_catalog(self) -> int:
+        """
+        Один проход по каталогу
+
+        :return: Количество загруженных файлов
+        """
+        pending = await self.get_pending()
+        if not pending:
+            self.logger.info("Media catalog is already warm")
+            return 0
+
+        self.logger.info(f"Uploading {len(pending)} new or changed media files")
+        uploaded = 0
+        for obj in pending:
+            if not self.is_running:
+                break
+            if await self._upload(obj):
+                uploaded += 1
+            await asyncio.sleep(self.upload_delay)
+
+        self.logger.info(f"Media warm-up finished: {uploaded}/{len(pending)} uploaded")
+        return uploaded
+
+    async def _upload(self, obj: Dict) -> bool:
+        """
+        Загрузка одного объекта в чат-хранилище с учетом retry_after от Telegram
+
+        :param obj: Объект S3 из списка
+        :return: True, если file_id сохранен
+        """
+        key = obj["Key"]
+        media_type = self._media_type(key)
+        filename = key.split("/")[-1]
+
+        for attempt in range(3):
+            try:
+                url = await generate_download_url(key)
+                # URLInputFile скачивает файл на стороне бота: так работает лимит 50 МБ вместо 20 МБ для URL
+                media = URLInputFile(url, filename=filename)
+                if media_type == "audio":
+                    message = await self.bot.send_audio(self.storage_chat_id, media, title=filename,
+                                                        disable_notification=True)
+                else:
+                    message = await self.bot.send_document(self.storage_chat_id, media, disable_notification=True)
+
+                remember_message(key, obj.get("ETag"), message)
+                return True
+            except TelegramRetryAfter as e:
+                self.logger.warning(f"Flood control while uploading {key}, sleeping {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except (TelegramBadRequest, TelegramEntityTooLarge) as e:
+                # Эту версию файла Telegram не примет и в следующий проход
+                self.logger.error(f"Telegram rejected {key}, skipping until it changes: {e}")
+                etag = normalize_etag(obj.get("ETag"))
+                if etag:
+                    self.db.save_media_warm_failure(key, etag, str(e))
+                return False
+            except Exception as e:
+                self.logger.error(f"Failed to upload {key} to storage chat: {e}")
+                return False
+        return False
+
+
+def get_storage_chat_id() -> Optional[int]:
+    """Возвращает ID чата-хранилища из окружения (MEDIA_STORAGE_CHAT_ID)"""
+    value = os.getenv("MEDIA_STORAGE_CHAT_ID")
+    return int(value) if value else None
@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import (
+    DeleteMessage, DeleteMessages, EditMessageCaption, EditMessageMedia, EditMessageReplyMarkup, EditMessageText,
+    SendAnimation, SendMessage, SendPhoto, SendVideo, TelegramMethod
+)
+from aiogram.types import InlineKeyboardMarkup, InputMedia, Message
+from prometheus_client import Counter
+
+from utils.library import bot
+
+# ==================== Конфигурация ====================
+RENDER_CACHE_MAX = int(os.getenv('RENDER_CACHE_MAX', 20000))  # сообщений, содержимое которых помнит процесс
+
+# ==================== Мониторинг ====================
+RENDER_OPS = Counter('tg_render_ops_total', 'Screen renders by chosen Telegram operation', ['screen', 'op'])
+RENDER_CALLS_SAVED = Counter('tg_render_calls_saved_total', 'Telegram API calls avoided by the render cache', ['screen'])
+
+NOT_MODIFIED = "message is not modified"
+# Экран текущего render(): пропущенные в сессии правки учитываются под его именем
+current_screen: ContextVar[str] = ContextVar("current_screen", default="other")
+
+# Содержимое сообщения: ("text", текст) или ("photo" | "video" | "animation", file_id/URL, подпись)
+Body = Tuple[Any, ...]
+
+
+class _Rendered:
+    __slots__ = ("body", "markup", "message")
+
+    def __init__(self, body: Body, markup: str, message: Optional[Message]):
+        self.body = body
+        self.markup = markup
+        self.message = message
+
+
+def markup_digest(markup: Optional[InlineKeyboardMarkup]) -> str:
+    if markup is None:
+        return ""
+    return hashlib.blake2b(markup.model_dump_json(exclude_none=True).encode(), digest_size=12).hexdigest()
+
+
+def media_source_key(source: Any) -> Any:
+    """
+    Источник медиа для сравнения: file_id или URL как есть
+
+    Загружаемый файл (InputFile) не равен ничему, кроме себя: новый маркер
+    на каждый вызов, а не id() объекта, который после сборки мусора может
+    достаться другому файлу.
+    """
+    return source if isinstance(source, str) else object()
+
+
+def media_body(media: InputMedia) -> Body:
+    return media.type, media_source_key(media.media), media.caption
+
+
+def received_body(body: Body, message: Any) -> Body:
+    """
+    Содержимое с file_id из ответа Telegram вместо URL или загруженного файла
+
+    Следующий показ того же файла идет по file_id (media_cache), и кэш
+    сравнивает именно его.
+    """
+    if body[0] == "text" or not isinstance(message, Message):
+        return body
+    if body[0] == "photo":
+        sent = message.photo[-1] if message.photo else None
+    else:
+        sent = getattr(message, body[0], None)
+    return (body[0], sent.file_id) + body[2:] if sent is not None else body
+
+
+class MessageRenderer:
+    def __init__(self, maxsize: int = RENDER_CACHE_MAX):
+        """
+        Кэш показанного содержимого сообщений и выбор самой дешевой операции
+
+        Для каждого (chat_id, message_id), которое бот отправил или изменил,
+        хранится содержимое (текст или медиа с подписью) и хэш клавиатуры.
+        intercept — middleware сессии бота: правка, которая ничего не меняет,
+        не уходит в Telegram (вместо ответа «message is not modified»
+        возвращается сохраненное сообщение). render() — общий способ показать
+        экран на месте старого: ничего, только клавиатура, только подпись,
+        правка текста или медиа, а если правка невозможна — новое сообщение
+        и удаление старого.
+
+        :param maxsize: Сколько сообщений помнить (LRU)
+        """
+        self.maxsize = maxsize
+        self._messages: "OrderedDict[Tuple[int, int], _Rendered]" = OrderedDict()
+        self.logger = logging.getLogger("MessageRenderer")
+
+    # ==================== Кэш ====================
+    def get(self, chat_id: int, message_id: int) -> Optional[_Rendered]:
+        rendered = self._messages.get((chat_id, message_id))
+        if rendered is not None:
+            self._messages.move_to_end((chat_id, message_id))
+        return rendered
+
+    def remember(self, chat_id: int, message_id: int, body: Body, markup: str, message: Optional[Message]) -> None:
+        self._messages[(chat_id, message_id)] = _Rendered(body, markup, message)
+        self._messages.move_to_end((chat_id, message_id))
+        while len(self._messages) > self.maxsize:
+            self._messages.popitem(last=False)
+
+    def forget(self, chat_id: int, message_id: int) -> None:
+        self._messages.pop((chat_id, message_id), None)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    # ==================== Middleware сессии ====================
+    def _planned(self, method: TelegramMethod) -> Optional[Tuple[int, int, Body, str]]:
+        """Содержимое сообщения после правки: (chat_id, message_id, body, markup) или None"""
+        if isinstance(method, (EditMessageText, EditMessageMedia, EditMessageCaption, EditMessageReplyMarkup)):
+            if method.inline_message_id or method.chat_id is None or method.message_id is None:
+                return None
+            chat_id, message_id = method.chat_id, method.message_id
+            markup = markup_digest(method.reply_markup)
+            if isinstance(method, EditMessageText):
+                return chat_id, message_id, ("text", method.text), markup
+            if isinstance(method, EditMessageMedia):
+                return chat_id, message_id, media_body(method.media), markup
+
+            # Подпись и клавиатура меняются поверх известного содержимого
+            known = self._messages.get((chat_id, message_id))
+            if known is None:
+                return None
+            if isinstance(method, EditMessageCaption):
+                if known.body[0] == "text":
+                    return None
+                return chat_id, message_id, known.body[:2] + (method.caption,), markup
+            return chat_id, message_id, known.body, markup
+        return None
+
+    @staticmethod
+    def _sent_body(method: TelegramMethod) -> Optional[Body]:
+        """Содержимое нового сообщения для методов отправки экранов"""
+        if isinstance(method, SendMessage):
+            return "text", method.text
+        for method_type, field in ((SendPhoto, "photo"), (SendVideo, "video"), (SendAnimation, "animation")):
+            if isinstance(method, method_type):
+                return field, media_source_key(getattr(method, field)), method.caption
+        return None
+
+    async def intercept(self, make_request: Callable[..., Awaitable[Any]], bot: Bot, method: TelegramMethod) -> Any:
+        """Request middleware: пропускает правки без изменений и запоминает показанное"""
+        if isinstance(method, DeleteMessage):
+            self.forget(method.chat_id, method.message_id)
+            return await make_request(bot, method)
+        if isinstance(method, DeleteMessages):
+            for message_id in method.message_ids:
+                self.forget(method.chat_id, message_id)
+            return await make_request(bot, method)
+
+        planned = self._planned(method)
+        if planned is not None:
+            chat_id, message_id, body, markup = planned
+            known = self._messages.get((chat_id, message_id))
+            if known is not None and known.body == body and known.markup == markup:
+                RENDER_CALLS_SAVED.labels(screen=current_screen.get()).inc()
+                if known.message is not None:
+                    return known.message
+                # Содержимое известно, но ответа Telegram нет: та же ошибка, что вернул бы Telegram
+                raise TelegramBadRequest(method=method, message=f"Bad Request: {NOT_MODIFIED}")
+            try:
+                result = await make_request(bot, method)
+            except TelegramBadRequest as e:
+                if NOT_MODIFIED in str(e):
+                    self.remember(chat_id, message_id, body, markup, known.message if known else None)
+                else:
+                    self.forget(chat_id, message_id)
+                raise
+            if isinstance(result, Message):
+                self.remember(chat_id, message_id, received_body(body, result), markup, result)
+            return result
+
+        result = await make_request(bot, method)
+        body = self._sent_body(method)
+        if body is not None and isinstance(result, Message):
+            self.remember(result.chat.id, result.message_id, received_body(body, result),
+                          markup_digest(method.reply_markup), result)
+        return result
+
+    # ==================== Показ экрана ====================
+    async def render(self, chat_id: int, message_id: Optional[int] = None, *, text: Optional[str] = None,
+                     media: Optional[InputMedia] = None, reply_markup: Optional[InlineKeyboardMarkup] = None,
+                     screen: str = "other") -> Optional[Message]:
+        """
+        Показывает экран (текст или медиа с подписью) в сообщении message_id
+
+        :param chat_id: Чат
+        :param message_id: Сообщение, которое заменяется; None — отправить новое
+        :param text: Текст экрана (если нет media)
+        :param media: Фото, видео или анимация с подписью
+        :param reply_markup: Инлайн-клавиатура
+        :param screen: Имя экрана для метрик
+        :return: Показанное сообщение; None, если Telegram ответил «не изменено»
+                 для сообщения, которого нет в кэше (экран уже на месте)
+        """
+        token = current_screen.set(screen)
+        try:
+            op, message = await self._render(chat_id, message_id, text, media, reply_markup)
+        finally:
+            current_screen.reset(token)
+        RENDER_OPS.labels(screen=screen, op=op).inc()
+        return message
+
+    async def _render(self, chat_id: int, message_id: Optional[int], text: Optional[str],
+                      media: Optional[InputMedia], reply_markup: Optional[InlineKeyboardMarkup]):
+        if message_id is None:
+            return "send", await self._send(chat_id, text, media, reply_markup)
+
+        body = media_body(media) if media is not None else ("text", text)
+        markup = markup_digest(reply_markup)
+        known = self.get(chat_id, message_id)
+        if known is not None and known.body == body and known.markup == markup and known.message is not None:
+            RENDER_CALLS_SAVED.labels(screen=current_screen.get()).inc()
+            return "skip", known.message
+
+        is_text = body[0] == "text"
+        try:
+            if known is not None and known.body[0] != "text" and is_text:
+                # Медиа нельзя превратить в текст (текст в медиа — можно, через edit_message_media)
+                op = "replace"
+            elif known is not None and known.body == body:
+                op = "markup"
+                result = await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id,
+                                                             reply_markup=reply_markup)
+            elif not is_text and known is not None and known.body[:2] == body[:2]:
+                op = "caption"
+                result = await bot.edit_message_caption(chat_id=chat_id, message_id=message_id,
+                                                        caption=media.caption, reply_markup=reply_markup)
+            elif not is_text:
+                op = "media"
+                result = await bot.edit_message_media(chat_id=chat_id, message_id=message_id,
+                                                      media=media, reply_markup=reply_markup)
+            else:
+                op = "text"
+                result = await bot.edit_message_text(chat_id=chat_id, message_id=message_id,
+                                                     text=text, reply_markup=reply_markup)
+            if op != "replace":
+                return op, result if isinstance(result, Message) else None
+        except TelegramBadRequest as e:
+            if NOT_MODIFIED in str(e):
+                known = self.get(chat_id, message_id)
+                return "unchanged", known.message if known else None
+            # Сообщение удалено, слишком старое или другого типа — показываем экран заново
+            self.logger.debug(f"Edit of {chat_id}/{message_id} failed, replacing: {e}")
+
+        message = await self._send(chat_id, text, media, reply_markup)
+        try:
+            await bot.delete_message(chat_id=chat_id, message_id=message_id)
+        except Exception as e:
+            self.logger.debug(f"Could not delete replaced message {chat_id}/{message_id}: {e}")
+        return "replace", message
+
+    @staticmethod
+    async def _send(chat_id: int, text: Optional[str], media: Optional[InputMedia],
+                    reply_markup: Optional[InlineKeyboardMarkup]) -> Message:
+        if media is None:
+            return await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+        send = {"photo": bot.send_photo, "video": bot.send_video, "animation": bot.send_animation}[media.type]
+        return await send(chat_id, media.media, caption=media.caption, reply_markup=reply_markup)
+
+
+renderer = MessageRenderer()
@@ -4,7 +4,7 @@ from botocore.exceptions import ClientError
 import logging
 from concurrent.futures import ThreadPoolExecutor
 import asyncio
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, AsyncIterator, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential
 import time
 from prometheus_client import start_http_server, Counter, Histogram
@@ -30,89 +30,82 @@ executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
 S3_LIST_SEMAPHORE = asyncio.Semaphore(int(os.getenv('S3_LIST_LIMIT', 30)))
 S3_GET_SEMAPHORE = asyncio.Semaphore(int(os.getenv('S3_GET_LIMIT', 50)))
 
-# Для Telegram API
-TG_API_SEMAPHORE = asyncio.Semaphore(int(os.getenv('TG_API_LIMIT', 10)))
+# Для Telegram API — utils/send_gateway.py
 
-# Для ограничения по пользователям
-USER_SEMAPHORES = {}
-USER_LIMIT = int(os.getenv('USER_LIMIT', 3))
+# Ограничение по пользователям — middlewares/user_limiter.py
 
 # ==================== Мониторинг ====================
 # Метрики Prometheus
 REQUESTS_TOTAL = Counter('requests_total', 'Total requests')
 S3_REQUESTS = Counter('s3_requests_total', 'S3 requests by type', ['operation'])
 S3_LATENCY = Histogram('s3_latency_seconds', 'S3 request latency', ['operation'])
-TG_REQUESTS = Counter('tg_requests_total', 'Telegram API requests')
-TG_LATENCY = Histogram('tg_latency_seconds', 'Telegram API latency')
 ERRORS = Counter('errors_total', 'Total errors', ['type'])
 
-# Запуск сервера метрик
-start_http_server(8000)
-
-# ==================== Вспомогательные функции ====================
-def get_user_semaphore(user_id: int) -> asyncio.Semaphore:
-    """Получаем семафор для конкретного пользователя"""
-    if user_id not in USER_SEMAPHORES:
-        USER_SEMAPHORES[user_id] = asyncio.Semaphore(USER_LIMIT)
-    return USER_SEMAPHORES[user_id]
-
-async def safe_telegram_request(func, *args, **kwargs):
-    """Безопасный вызов Telegram API с ограничением скорости"""
-    start_time = time.time()
-    async with TG_API_SEMAPHORE:
-        try:
-            result = await func(*args, **kwargs)
-            TG_REQUESTS.inc()
-            TG_LATENCY.observe(time.time() - start_time)
-            return result
-        except Exception as e:
-            ERRORS.labels(type='telegram').inc()
-            logging.error(f"Telegram API error: {e}")
-            raise
+# Запуск сервера метрик (при нескольких процессах метрики всех воркеров отдает супервизор)
+if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    start_http_server(8000)
 
 # ==================== Основные функции S3 ====================
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1))
-def list_objects_sync(prefix: str) -> List[Dict]:
-    """Синхронный список объектов с повторными попытками"""
+def list_page_sync(prefix: str, delimiter: Optional[str] = "/", continuation_token: Optional[str] = None) -> Dict:
+    """Синхронное получение одной страницы list_objects_v2 (до 1000 объектов)"""
     start_time = time.time()
+    params = {'Bucket': S3_BUCKET_NAME, 'Prefix': prefix}
+    if delimiter:
+        params['Delimiter'] = delimiter
+    if continuation_token:
+        params['ContinuationToken'] = continuation_token
     try:
-        paginator = s3_client.get_paginator("list_objects_v2")
-        result = list(paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=prefix, Delimiter="/"))
-        S3_REQUESTS.labels(operation='list').inc()
-        S3_LATENCY.labels(operation='list').observe(time.time() - start_time)
+        result = s3_client.list_objects_v2(**params)
+        S3_REQUESTS.labels(operation='list_page').inc()
+        S3_LATENCY.labels(operation='list_page').observe(time.time() - start_time)
         return result
     except Exception as e:
-        ERRORS.labels(type='s3_list').inc()
+        ERRORS.labels(type='s3_list_page').inc()
         raise
 
+async def iter_objects(prefix: str, delimiter: Optional[str] = "/") -> AsyncIterator[Dict]:
+    """
+    Потоковый список объектов: отдает страницы list_objects_v2 по мере получения
+
+    Семафор занимается только на время запроса одной страницы, поэтому
+    вызывающий код может обрабатывать страницу, не блокируя другие листинги.
+    """
+    loop = asyncio.get_event_loop()
+    token = None
+    while True:
+        async with S3_LIST_SEMAPHORE:
+            page = await loop.run_in_executor(executor, list_page_sync, prefix, delimiter, token)
+        yield page
+        if not page.get('IsTruncated'):
+            break
+        token = page.get('NextContinuationToken')
+        if not token:
+            break
+
 async def list_s3_objects(prefix: str) -> List[Dict]:
-    """Асинхронная обертка для list_objects"""
-    async with S3_LIST_SEMAPHORE:
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, list_objects_sync, prefix)
+    """Все страницы списка объектов с разделителем "/" """
+    return [page async for page in iter_objects(prefix)]
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1))
 def list_objects_simple_sync(prefix: str) -> Dict:
-    """Синхронная версия list_objects_v2 без пагинации"""
-    start_time = time.time()
-    try:
-        result = s3_client.list_objects_v2(
-            Bucket=S3_BUCKET_NAME,
-            Prefix=prefix,
-            Delimiter='/'
-        )
-        S3_REQUESTS.labels(operation='list_simple').inc()
-        S3_LATENCY.labels(operation='list_simple').observe(time.time() - start_time)
-        return result
-    except Exception as e:
-        ERRORS.labels(type='s3_list_simple').inc()
-        raise
+    """Синхронный список папки с разделителем: страницы объединяются в один ответ"""
+    result = {'CommonPrefixes': [], 'Contents': []}
+    token = None
+    while True:
+        page = list_page_sync(prefix, "/", token)
+        result['CommonPrefixes'].extend(page.get('CommonPrefixes', []))
+        result['Contents'].extend(page.get('Contents', []))
+        token = page.get('NextContinuationToken')
+        if not page.get('IsTruncated') or not token:
+            return result
 
 async def list_objects_simple(prefix: str) -> Dict:
     """Асинхронная версия list_objects_simple"""
-    async with S3_LIST_SEMAPHORE:
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, list_objects_simple_sync, prefix)
+    result = {'CommonPrefixes': [], 'Contents': []}
+    async for page in iter_objects(prefix):
+        result['CommonPrefixes'].extend(page.get('CommonPrefixes', []))
+        result['Contents'].extend(page.get('Contents', []))
+    return result
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1))
 def generate_presigned_url_sync(key: str) -> str:
@@ -170,30 +163,130 @@ async def generate_download_url(key: str) -> str:
         return await loop.run_in_executor(executor, generate_download_url_sync, key)
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1))
-def get_folder_contents_sync(prefix: str) -> List[Dict]:
-    """Синхронная версия получения содержимого папки"""
+def read_object_text_sync(key: str, max_bytes: int = 64 * 1024) -> str:
+    """Синхронное чтение небольшого текстового объекта напрямую из S3"""
     start_time = time.time()
     try:
-        response = s3_client.list_objects_v2(
+        response = s3_client.get_object(
             Bucket=S3_BUCKET_NAME,
-            Prefix=prefix
+            Key=key,
+            Range=f"bytes=0-{max_bytes - 1}"
         )
-        S3_REQUESTS.labels(operation='list_contents').inc()
-        S3_LATENCY.labels(operation='list_contents').observe(time.time() - start_time)
-        return response.get('Contents', [])
+        body = response['Body'].read()
+        S3_REQUESTS.labels(operation='get_text').inc()
+        S3_LATENCY.labels(operation='get_text').observe(time.time() - start_time)
+        return body.decode('utf-8', errors='replace')
     except Exception as e:
-        ERRORS.labels(type='s3_list_contents').inc()
+        ERRORS.labels(type='s3_get_text').inc()
         raise
 
+async def read_object_text(key: str) -> str:
+    """Асинхронное чтение текстового объекта (через общий клиент S3, без presigned URL)"""
+    async with S3_GET_SEMAPHORE:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, read_object_text_sync, key)
+
+def get_folder_contents_sync(prefix: str) -> List[Dict]:
+    """Синхронная версия получения содержимого папки (все страницы, без разделителя)"""
+    contents = []
+    token = None
+    while True:
+        page = list_page_sync(prefix, None, token)
+        contents.extend(page.get('Contents', []))
+        token = page.get('NextContinuationToken')
+        if not page.get('IsTruncated') or not token:
+            return contents
+
 async def get_folder_contents(folder_path: str) -> List[Dict]:
     """Асинхронная версия получения содержимого папки"""
+    contents = []
+    async for page in iter_objects(folder_path.rstrip('/') + '/', delimiter=None):
+        contents.extend(page.get('Contents', []))
+    return contents
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1))
+def list_all_objects_sync(prefix: str) -> List[Dict]:
+    """Синхронный рекурсивный список всех объектов под префиксом (все страницы)"""
+    start_time = time.time()
+    try:
+        paginator = s3_client.get_paginator("list_objects_v2")
+        result = []
+        for page in paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=prefix):
+            result.extend(page.get('Contents', []))
+        S3_REQUESTS.labels(operation='list_all').inc()
+        S3_LATENCY.labels(operation='list_all').observe(time.time() - start_time)
+        return result
+    except Exception as e:
+        ERRORS.labels(type='s3_list_all').inc()
+        raise
+
+async def list_all_objects(prefix: str) -> List[Dict]:
+    """Асинхронный рекурсивный список объектов (для фоновых задач по каталогу)"""
     async with S3_LIST_SEMAPHORE:
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            executor,
-            get_folder_contents_sync,
-            folder_path.rstrip('/') + '/'
-        )
+        return await loop.run_in_executor(executor, list_all_objects_sync, prefix)
+
+class S3Entry:
+    """Элемент дерева каталога: папка или файл без presigned URL"""
+
+    __slots__ = ("type", "name", "key", "etag", "file", "children")
+
+    def __init__(self, type: str, name: str, key: str, etag: Optional[str] = None):
+        self.type = type
+        self.name = name
+        self.key = key
+        self.etag = etag
+        self.file = None        # URL подписывается только при отправке файла
+        self.children: List["S3Entry"] = []
+
+async def list_tree(prefix: str, depth: int = 1) -> List[S3Entry]:
+    """
+    Дерево папок и файлов под префиксом на depth уровней вглубь
+
+    Возвращает только имена и типы: один постраничный листинг без разделителя
+    вместо запроса на каждую подпапку и без подписи URL для файлов.
+    """
+    REQUESTS_TOTAL.inc()
+    prefix = prefix.strip("/") + "/"
+    root: Dict[str, S3Entry] = {}
+    folders: Dict[str, S3Entry] = {}
+
+    def folder(path: List[str]) -> S3Entry:
+        """Возвращает (создавая при необходимости) папку по относительному пути"""
+        key = prefix + "/".join(path) + "/"
+        entry = folders.get(key)
+        if entry is None:
+            entry = S3Entry("dir", path[-1], key)
+            folders[key] = entry
+            if len(path) == 1:
+                root[key] = entry
+            else:
+                folder(path[:-1]).children.append(entry)
+        return entry
+
+    async for page in iter_objects(prefix, delimiter=None):
+        for obj in page.get('Contents', []):
+            parts = obj['Key'][len(prefix):].split("/")
+            dirs, name = parts[:-1], parts[-1]
+            # Папки глубже depth не нужны, но их существование отмечает родителя
+            dirs = dirs[:depth]
+            if dirs:
+                folder(dirs)
+            if name and len(parts) - 1 < depth:
+                entry = S3Entry("file", name, obj['Key'], obj.get('ETag'))
+                if dirs:
+                    folder(dirs).children.append(entry)
+                else:
+                    root[obj['Key']] = entry
+
+    def ordered(entries: List[S3Entry]) -> List[S3Entry]:
+        # Как в ответе S3 с разделителем: сначала папки, затем файлы
+        result = [e for e in entries if e.type == "dir"] + [e for e in entries if e.type == "file"]
+        for entry in result:
+            entry.children = ordered(entry.children)
+        return result
+
+    return ordered(list(root.values()))
 
 # ==================== Основные функции бота ====================
 async def get_files_useful(folder: str, type_age: str, callback_prefix: str) -> Tuple[
@@ -202,12 +295,11 @@ async def get_files_useful(folder: str, type_age: str, callback_prefix: str) ->
     REQUESTS_TOTAL.inc()
     try:
         prefix = folder.lstrip("/") + "/"
-        pages = await list_s3_objects(prefix)
 
         buttons = []
         item_names = []
 
-        for page in pages:
+        async for page in iter_objects(prefix):
             # Обработка папок
             common_prefixes = page.get('CommonPrefixes', [])
             buttons.extend(
@@ -236,88 +328,40 @@ async def get_files_useful(folder: str, type_age: str, callback_prefix: str) ->
         logging.error(f"S3 error: {e}", exc_info=True)
         return [], []
 
+async def list_folder_names(folder: str) -> List[str]:
+    """
+    Имена элементов папки для списка кнопок: сначала подпапки, затем файлы
+
+    Ошибки S3 не перехватываются, чтобы вызывающий код не принял сбой за пустую папку.
+    """
+    item_names = []
+    file_names = []
+    # Папки идут первыми: файлы со всех страниц добавляются после них
+    async for page in iter_objects(folder.rstrip('/') + '/'):
+        item_names.extend(
+            prefix['Prefix'].split('/')[-2]
+            for prefix in page.get('CommonPrefixes', [])
+        )
+        file_names.extend(
+            obj['Key'].split('/')[-1]
+            for obj in page.get('Contents', [])
+            if not obj['Key'].endswith('/')
+        )
+    item_names.extend(file_names)
+    return item_names
+
 async def get_files(folder: str, type_age: str, callback: str) -> Tuple[List[Dict[str, str]], List[str]]:
     """Альтернативная версия get_files_useful с другим форматом вывода"""
     REQUESTS_TOTAL.inc()
     try:
-        response = await list_objects_simple(folder.rstrip('/') + '/')
-
-        buttons = []
-        item_names = []
-
-        # Обработка папок
-        if 'CommonPrefixes' in response:
-            buttons.extend({
-                'text': prefix['Prefix'].split('/')[-2],
-                'callback_data': f"{callback}{i}_{type_age}"
-            } for i, prefix in enumerate(response['CommonPrefixes']))
-
-            item_names.extend(
-                prefix['Prefix'].split('/')[-2]
-                for prefix in response['CommonPrefixes']
-            )
-
-        # Обработка файлов
-        if 'Contents' in response:
-            start_idx = len(item_names)
-            buttons.extend({
-                'text': obj['Key'].split('/')[-1],
-                'callback_data': f"{callback}{start_idx + i}_{type_age}"
-            } for i, obj in enumerate(
-                obj for obj in response['Contents']
-                if not obj['Key'].endswith('/')
-            ))
-
-            item_names.extend(
-                obj['Key'].split('/')[-1]
-                for obj in response['Contents']
-                if not obj['Key'].endswith('/')
-            )
+        item_names = await list_folder_names(folder)
+        buttons = [{
+            'text': item_name,
+            'callback_data': f"{callback}{i}_{type_age}"
+        } for i, item_name in enumerate(item_names)]
 
         return buttons, item_names
     except ClientError as e:
         ERRORS.labels(type='get_files_alt').inc()
         logging.error(f"S3 list error for {folder}: {e}", exc_info=True)
         return [], []
-
-async def get_url(prefix: str) -> List[Any]:
-    """Оптимизированное получение URL с батчингом"""
-    REQUESTS_TOTAL.inc()
-    try:
-        prefix = prefix.lstrip("/") + "/"
-        pages = await list_s3_objects(prefix)
-
-        result = []
-        for page in pages:
-            # Обработка папок
-            result.extend(
-                type('Obj', (object,), {
-                    "type": "dir",
-                    "name": cp['Prefix'].rstrip('/').split('/')[-1],
-                    "file": None
-                })
-                for cp in page.get('CommonPrefixes', [])
-            )
-
-            # Параллельная обработка файлов батчами
-            file_objects = [obj for obj in page.get("Contents", []) if not obj["Key"].endswith('/')]
-
-            batch_size = 20
-            for i in range(0, len(file_objects), batch_size):
-                batch = file_objects[i:i + batch_size]
-                tasks = [generate_presigned_url(obj["Key"]) for obj in batch]
-                urls = await asyncio.gather(*tasks, return_exceptions=True)
-
-                for obj, url in zip(batch, urls):
-                    if not isinstance(url, Exception):
-                        result.append(type('Obj', (object,), {
-                            "type": "file",
-                            "name": obj["Key"].split("/")[-1],
-                            "file": url
-                        }))
-
-        return result
-    except Exception as e:
-        ERRORS.labels(type='get_url').inc()
-        logging.error(f"S3 URL error: {e}", exc_info=True)
-        return []
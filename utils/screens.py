@@ -0,0 +1,72 @@
+import logging
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+
+class FrozenKeyboard(InlineKeyboardMarkup):
+    """Клавиатура, общая для всех пользователей: поля нельзя переприсвоить"""
+    model_config = {**InlineKeyboardMarkup.model_config, "frozen": True}
+
+
+class Screen:
+    """Готовый экран: текст и клавиатура"""
+
+    __slots__ = ("text", "keyboard")
+
+    def __init__(self, text: Optional[str], keyboard: InlineKeyboardMarkup):
+        self.text = text
+        self.keyboard = keyboard if isinstance(keyboard, FrozenKeyboard) else \
+            FrozenKeyboard(inline_keyboard=keyboard.inline_keyboard)
+
+    def format(self, **kwargs) -> str:
+        """Текст экрана с подстановкой персональных данных (имя пользователя и т.п.)"""
+        return self.text.format(**kwargs)
+
+
+ScreenBuilder = Callable[..., Screen]
+
+
+class ScreenRegistry:
+    def __init__(self):
+        """
+        Реестр статических экранов
+
+        Экран регистрируется функцией-построителем и набором вариантов
+        (например, возраст и наличие подписки). Все варианты строятся один раз
+        при запуске, обработчики получают общие экземпляры без пересборки
+        клавиатур на каждое обновление.
+        """
+        self._builders: Dict[str, ScreenBuilder] = {}
+        self._variants: Dict[str, Tuple[tuple, ...]] = {}
+        self._screens: Dict[Tuple[str, tuple], Screen] = {}
+        self.logger = logging.getLogger("ScreenRegistry")
+
+    def register(self, name: str, variants: Iterable[tuple] = ((),)) -> Callable[[ScreenBuilder], ScreenBuilder]:
+        """Декоратор построителя экрана; variants — все наборы аргументов построителя"""
+        def decorator(builder: ScreenBuilder) -> ScreenBuilder:
+            self._builders[name] = builder
+            self._variants[name] = tuple(tuple(variant) for variant in variants)
+            return builder
+        return decorator
+
+    def build_all(self) -> int:
+        """Строит все варианты всех экранов (при запуске или после изменения настроек)"""
+        screens = {}
+        for name, builder in self._builders.items():
+            for variant in self._variants[name]:
+                screens[(name, variant)] = builder(*variant)
+        self._screens = screens
+        self.logger.info(f"Built {len(screens)} screens")
+        return len(screens)
+
+    def get(self, name: str, *variant) -> Screen:
+        """Готовый экран; неизвестный вариант строится при первом обращении и запоминается"""
+        screen = self._screens.get((name, variant))
+        if screen is None:
+            screen = self._builders[name](*variant)
+            self._screens[(name, variant)] = screen
+        return screen
+
+
+screens = ScreenRegistry()
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from prometheus_client import Counter, Gauge, Histogram
+
+# ==================== Конфигурация ====================
+TG_GLOBAL_RATE = float(os.getenv('TG_GLOBAL_RATE', 30))       # сообщений в секунду на бота
+TG_CHAT_RATE = float(os.getenv('TG_CHAT_RATE', 1))            # сообщений в секунду в один чат
+TG_CHAT_BURST = int(os.getenv('TG_CHAT_BURST', 5))            # допустимая серия сообщений в один чат
+TG_MAX_RETRIES = int(os.getenv('TG_MAX_RETRIES', 3))          # повторов после 429
+TG_MAX_RETRY_AFTER = float(os.getenv('TG_MAX_RETRY_AFTER', 60))  # дольше не ждем, а отдаем ошибку
+TG_CHATS_MAX = 10000                                          # чатов с лимитером в памяти
+TG_BULK_CONCURRENCY = int(os.getenv('TG_BULK_CONCURRENCY', 25))  # параллельных отправок в рассылке
+
+# Методы, на которые распространяются лимиты Telegram на отправку
+LIMITED_PREFIXES = ('send', 'copy', 'forward', 'edit')
+
+# ==================== Полосы приоритета ====================
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+_send_lane: ContextVar[str] = ContextVar("send_lane", default=INTERACTIVE)
+
+# ==================== Мониторинг ====================
+TG_REQUESTS = Counter('tg_requests_total', 'Telegram API requests')
+TG_LATENCY = Histogram('tg_latency_seconds', 'Telegram API latency')
+TG_SEND_QUEUE = Gauge('tg_send_queue_depth', 'Sends waiting for the global rate limit', ['lane'],
+                      multiprocess_mode='livesum')
+TG_SEND_WAIT = Histogram('tg_send_wait_seconds', 'Time a send waited in the gateway', ['lane'],
+                         buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+TG_RETRY_AFTER = Counter('tg_retry_after_total', 'Flood control (429) responses', ['lane'])
+TG_UNDELIVERABLE = Counter('tg_undeliverable_total', 'Sends to chats that blocked the bot or do not exist', ['lane'])
+
+
+@contextmanager
+def bulk_lane():
+    """
+    Отправки внутри блока идут в низкоприоритетной полосе
+
+    Используется рассылками: ответы пользователям обслуживаются раньше.
+    Задачи, созданные внутри блока, наследуют полосу.
+    """
+    token = _send_lane.set(BULK)
+    try:
+        yield
+    finally:
+        _send_lane.reset(token)
+
+
+async def run_bulk(items: Iterable[Any], send: Callable[[Any], Awaitable[Any]],
+                   concurrency: int = TG_BULK_CONCURRENCY) -> Tuple[int, int]:
+    """
+    Параллельная массовая отправка в полосе рассылок
+
+    Скорость ограничивает шлюз, поэтому пауз между отправками не нужно:
+    concurrency лишь позволяет держать полный темп при сетевых задержках.
+
+    :param items: Получатели
+    :param send: Корутина отправки одному получателю; исключение считается неудачей
+    :return: (успешно, неудачно)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    success = 0
+    failed = 0
+
+    async def worker(item: Any) -> None:
+        nonlocal success, failed
+        async with semaphore:
+            try:
+                await send(item)
+                success += 1
+            except Exception as e:
+                logging.error(f"Ошибка массовой отправки ({item}): {e}")
+                failed += 1
+
+    with bulk_lane():
+        await asyncio.gather(*(worker(item) for item in items))
+    return success, failed
+
+
+class RateSchedule:
+    """Ограничитель скорости (GCRA): резервирует слот и возвращает время ожидания"""
+
+    __slots__ = ("interval", "tolerance", "tat")
+
+    def __init__(self, rate: float, burst: int):
+        self.interval = 1.0 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self.tat = 0.0
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        tat = max(self.tat, now)
+        self.tat = tat + self.interval
+        return max(0.0, tat - self.tolerance - now)
+
+    def pause(self, seconds: float) -> None:
+        """Сдвигает ближайший слот на seconds вперед (ответ 429)"""
+        self.tat = max(self.tat, time.monotonic() + seconds + self.tolerance)
+
+
+class SendGateway(BaseRequestMiddleware):
+    def __init__(self, rate: float = TG_GLOBAL_RATE, chat_rate: float = TG_CHAT_RATE,
+                 chat_burst: int = TG_CHAT_BURST, max_retries: int = TG_MAX_RETRIES,
+                 max_retry_after: float = TG_MAX_RETRY_AFTER,
+                 on_blocked: Optional[Callable[[int], Any]] = None):
+        """
+        Общий шлюз исходящих запросов к Telegram (middleware сессии бота)
+
+        Все отправки проходят через общий лимит скорости бота и лимит на чат.
+        Ожидающие глобального слота обслуживаются по полосам: интерактивные ответы
+        раньше рассылок. На 429 шлюз ждет retry_after и повторяет запрос.
+
+        :param rate: Сообщений в секунду на бота
+        :param chat_rate: Сообщений в секунду в один чат
+        :param chat_burst: Допустимая серия сообщений в один чат
+        :param max_retries: Сколько раз повторять запрос после 429
+        :param max_retry_after: Максимальное ожидание по retry_after в секундах
+        :param on_blocked: Вызывается с chat_id, если пользователь заблокировал бота или чат не найден
+        """
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.on_blocked = on_blocked
+        # Число ответов 429 по полосам — по нему фоновые отправки подстраивают темп
+        self.retry_after_events: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._global = RateSchedule(rate, max(1, int(rate)))
+        self._chats: "OrderedDict[int, RateSchedule]" = OrderedDict()
+        self._queues: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def set_rate(self, rate: float) -> None:
+        """Меняет общий лимит скорости (доля лимита бота при нескольких процессах)"""
+        self.rate = rate
+        self._global = RateSchedule(rate, max(1, int(rate)))
+
+    # ==================== Очередь ====================
+    def _chat(self, chat_id: int) -> RateSchedule:
+        schedule = self._chats.get(chat_id)
+        if schedule is None:
+            schedule = RateSchedule(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = schedule
+            if len(self._chats) > TG_CHATS_MAX:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return schedule
+
+    async def _acquire(self, chat_id, lane: str) -> None:
+        """Ждет слот чата, затем глобальный слот в своей полосе"""
+        if chat_id is not None:
+            delay = self._chat(chat_id).reserve()
+            if delay:
+                await asyncio.sleep(delay)
+
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._dispatch())
+
+        future = asyncio.get_event_loop().create_future()
+        self._queues[lane].append(future)
+        TG_SEND_QUEUE.labels(lane=lane).set(len(self._queues[lane]))
+        self._wakeup.set()
+        await future
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Первый живой ожидающий с учетом приоритета полос"""
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue:
+                future = queue.popleft()
+                TG_SEND_QUEUE.labels(lane=lane).set(len(queue))
+                if not future.done():
+                    return future
+        return None
+
+    async def _dispatch(self) -> None:
+        """Выдает глобальные слоты ожидающим в порядке приоритета"""
+        while True:
+            if not any(self._queues.values()):
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._global.reserve()
+            if delay:
+                # Пока ждем слот, интерактивный запрос может обогнать рассылку
+                await asyncio.sleep(delay)
+
+            future = self._next_waiter()
+            if future is not None:
+                future.set_result(None)
+
+    # ==================== Middleware ====================
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        limited = method.__api_method__.startswith(LIMITED_PREFIXES)
+        lane = _send_lane.get()
+
+        for attempt in range(self.max_retries + 1):
+            if limited:
+                queued_at = time.monotonic()
+                await self._acquire(chat_id if isinstance(chat_id, int) else None, lane)
+                TG_SEND_WAIT.labels(lane=lane).observe(time.monotonic() - queued_at)
+
+            start_time = time.monotonic()
+            try:
+                response = await make_request(bot, method)
+                TG_REQUESTS.inc()
+                TG_LATENCY.observe(time.monotonic() - start_time)
+                return response
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                if isinstance(e, TelegramForbiddenError) or "chat not found" in str(e).lower():
+                    self._on_undeliverable(chat_id, lane)
+                raise
+            except TelegramRetryAfter as e:
+                TG_RETRY_AFTER.labels(lane=lane).inc()
+                paused = self._on_retry_after(chat_id, lane, e.retry_after)
+                if attempt == self.max_retries or e.retry_after > self.max_retry_after:
+                    raise
+                logging.warning(f"Flood control on {method.__api_method__} (chat {chat_id}), "
+                                f"retry in {e.retry_after}s")
+                # Паузу выдержит _acquire; если ставить ее некуда (чат не int, не рассылка) — ждем здесь
+                if not (limited and paused):
+                    await asyncio.sleep(e.retry_after)
+
+    def _on_undeliverable(self, chat_id, lane: str) -> None:
+        """Сообщает о недоступном чате, чтобы массовые отправки его пропускали"""
+        TG_UNDELIVERABLE.labels(lane=lane).inc()
+        if self.on_blocked is None or not isinstance(chat_id, int):
+            return
+        try:
+            self.on_blocked(chat_id)
+        except Exception as e:
+            logging.error(f"Не удалось отметить недоступный чат {chat_id}: {e}")
+
+    def _on_retry_after(self, chat_id, lane: str, retry_after: float) -> bool:
+        """
+        Учитывает 429: чат ставится на паузу, а при рассылке — и весь бот,
+        так как массовая отправка упирается в общий лимит
+
+        :return: True, если пауза поставлена хотя бы на одно расписание
+        """
+        self.retry_after_events[lane] += 1
+        paused = False
+        if isinstance(chat_id, int):
+            self._chat(chat_id).pause(retry_after)
+            paused = True
+        if lane == BULK:
+            self._global.pause(retry_after)
+            paused = True
+        return paused
+
+
+send_gateway = SendGateway()
@@ -0,0 +1,304 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from prometheus_client import CollectorRegistry, Counter, start_http_server
+
+WorkerSetup = Callable[[int, int], Awaitable[Tuple[Bot, Dispatcher]]]
+
+UPDATES_ROUTED = Counter('updates_routed_total', 'Updates routed by the supervisor to workers', ['worker'])
+WORKER_RESTARTS = Counter('worker_restarts_total', 'Worker processes restarted after an unexpected exit')
+
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """
+    ID пользователя, от которого пришло обновление (без разбора в pydantic)
+
+    Почти все типы обновлений содержат отправителя в поле from или user,
+    у остальных берется чат. Для опросов и т.п. возвращается None.
+    """
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")
+        if user:
+            return user["id"]
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return None
+
+
+def start_metrics_server(port: int = 8000) -> None:
+    """Сервер метрик супервизора: суммирует метрики всех процессов из PROMETHEUS_MULTIPROC_DIR"""
+    from prometheus_client import multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
+
+
+def apply_change(kind: str, payload: Any) -> None:
+    """
+    Изменение, сделанное в другом процессе: сброс или правка кэшей этого процесса
+
+    catalog — изменилась папка каталога S3 (payload — префикс), user — профиль
+    пользователя (user_id), access — замок папки «Полезного» (путь, закрыта ли).
+    """
+    if kind == "catalog":
+        from utils.catalog import catalog_watcher
+        catalog_watcher.notify(payload)
+    elif kind == "user":
+        from middlewares.user_context import user_contexts
+        user_contexts.invalidate(payload)
+    elif kind == "access":
+        from utils.access_tree import access_tree
+        path, locked = payload
+        access_tree.apply_locked(path, locked)
+
+
+def _worker_main(index: int, count: int, inbox, outbox, ready, setup: WorkerSetup) -> None:
+    # Остановкой воркеров управляет супервизор, Ctrl+C в терминале их не касается
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.environ["BOT_WORKER_INDEX"] = str(index)
+    asyncio.run(_worker_loop(index, count, inbox, outbox, ready, setup))
+
+
+async def _worker_loop(index: int, count: int, inbox, outbox, ready, setup: WorkerSetup) -> None:
+    """Цикл воркера: обновления своей доли пользователей и служебные сообщения супервизора"""
+    from database.database import db
+    from utils.access_tree import access_tree
+
+    logger = logging.getLogger(f"UpdateWorker-{index}")
+    bot, dp = await setup(index, count)
+    # Изменения, сделанные здесь (права, блокировка бота, замки), супервизор разошлет остальным воркерам
+    db.subscribe_user_changes(lambda user_id: outbox.put(("user", user_id)))
+    access_tree.subscribe(lambda path, locked: outbox.put(("access", (path, locked))))
+    loop = asyncio.get_running_loop()
+    messages: asyncio.Queue = asyncio.Queue()
+    tasks = set()
+
+    def read_inbox() -> None:
+        # Блокирующее чтение очереди процесса в отдельном потоке, обработка — в цикле событий
+        while True:
+            message = inbox.get()
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+            if message[0] == "stop":
+                return
+
+    async def feed(data: Dict[str, Any]) -> None:
+        try:
+            update = Update.model_validate(data, context={"bot": bot})
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"Error processing update {data.get('update_id')}: {e}")
+
+    threading.Thread(target=read_inbox, name=f"inbox-{index}", daemon=True).start()
+    ready.put(index)
+    logger.info(f"Worker {index}/{count} started (pid {os.getpid()})")
+
+    while True:
+        kind, payload = await messages.get()
+        if kind == "update":
+            task = asyncio.create_task(feed(payload))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        elif kind == "stop":
+            break
+        else:
+            apply_change(kind, payload)
+
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    # Хуки dp.shutdown, зарегистрированные в setup (закрытие HTTP-сессий и т.п.)
+    await dp.emit_shutdown(bot=bot)
+    await bot.session.close()
+    logger.info(f"Worker {index} stopped")
+
+
+class UpdateSupervisor:
+    def __init__(self, workers: int, setup: WorkerSetup, start_timeout: float = 60,
+                 monitor_interval: float = 5):
+        """
+        Обработка обновлений в нескольких процессах
+
+        Супервизор получает обновления (вебхук или getUpdates) в виде JSON и
+        отправляет каждое воркеру по user_id % workers, не разбирая его в pydantic.
+        Все обновления одного пользователя обрабатывает один процесс, поэтому
+        его FSM-состояние и ограничитель нажатий остаются в одном месте.
+        Воркеры запускаются через spawn и настраиваются функцией setup.
+        Изменения, сделанные в воркере (профиль, замок папки), приходят
+        супервизору через общую очередь и расходятся всем воркерам.
+
+        :param workers: Число процессов-воркеров
+        :param setup: async setup(index, count) -> (bot, dp), вызывается в каждом воркере;
+                      должна быть функцией уровня модуля (передается в процесс по имени);
+                      хуки dp.shutdown выполняются при остановке воркера
+        :param start_timeout: Сколько ждать готовности воркеров в секундах
+        :param monitor_interval: Как часто проверять, живы ли воркеры
+        """
+        self.workers = workers
+        self.setup = setup
+        self.start_timeout = start_timeout
+        self.monitor_interval = monitor_interval
+        self.context = multiprocessing.get_context("spawn")
+        self.inboxes: List[Any] = []
+        self.outbox = None
+        self.processes: List[Any] = []
+        self.ready = None
+        self.listeners: List[Callable[[str, Any], Any]] = []
+        self.logger = logging.getLogger("UpdateSupervisor")
+        self.is_running = False
+        self.monitor_task = None
+
+    def _spawn(self, index: int):
+        process = self.context.Process(
+            target=_worker_main,
+            args=(index, self.workers, self.inboxes[index], self.outbox, self.ready, self.setup),
+            name=f"bot-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        return process
+
+    async def start(self) -> None:
+        """
+        Запуск воркеров; возвращается, когда все готовы принимать обновления
+        """
+        if self.is_running:
+            return
+
+        self.ready = self.context.Queue()
+        self.outbox = self.context.Queue()
+        self.inboxes = [self.context.Queue() for _ in range(self.workers)]
+        self.processes = [self._spawn(index) for index in range(self.workers)]
+
+        loop = asyncio.get_running_loop()
+        for _ in range(self.workers):
+            await loop.run_in_executor(None, self.ready.get, True, self.start_timeout)
+        threading.Thread(target=self._read_outbox, args=(loop,), name="outbox", daemon=True).start()
+
+        self.is_running = True
+        self.monitor_task = asyncio.create_task(self._monitor())
+        self.logger.info(f"Update supervisor started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """
+        Остановка: воркеры дообрабатывают полученные обновления и завершаются
+        """
+        if not self.is_running:
+            return
+
+        self.is_running = False
+        self.monitor_task.cancel()
+        for inbox in self.inboxes:
+            inbox.put(("stop", None))
+
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join, 30)
+            self._mark_dead(process)
+        self.outbox.put(("stop", None))
+        self.logger.info("Update supervisor stopped")
+
+    def subscribe(self, listener: Callable[[str, Any], Any]) -> None:
+        """Подписка супервизора на изменения из воркеров: listener получает (kind, payload)"""
+        self.listeners.append(listener)
+
+    def _read_outbox(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Блокирующее чтение очереди воркеров в отдельном потоке, пересылка — в цикле событий
+        while True:
+            kind, payload = self.outbox.get()
+            if kind == "stop":
+                return
+            loop.call_soon_threadsafe(self._relay, kind, payload)
+
+    def _relay(self, kind: str, payload: Any) -> None:
+        """Изменение из воркера: всем воркерам (отправителю — без последствий) и подписчикам супервизора"""
+        self.broadcast(kind, payload)
+        for listener in self.listeners:
+            try:
+                listener(kind, payload)
+            except Exception as e:
+                self.logger.error(f"Worker change listener failed for {kind}: {e}")
+
+    async def _monitor(self) -> None:
+        """Перезапускает упавшие воркеры; очередь остается прежней, обновления не теряются"""
+        while self.is_running:
+            await asyncio.sleep(self.monitor_interval)
+            for index, process in enumerate(self.processes):
+                if process.is_alive() or not self.is_running:
+                    continue
+                self.logger.error(f"Worker {index} exited with code {process.exitcode}, restarting")
+                WORKER_RESTARTS.inc()
+                self._mark_dead(process)
+                self.processes[index] = self._spawn(index)
+
+    @staticmethod
+    def _mark_dead(process) -> None:
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR") and process.pid:
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(process.pid)
+
+    def shard(self, update: Dict[str, Any]) -> int:
+        user_id = update_user_id(update)
+        key = user_id if user_id is not None else update.get("update_id", 0)
+        return key % self.workers
+
+    def dispatch(self, update: Dict[str, Any]) -> None:
+        """Передает обновление воркеру его пользователя"""
+        index = self.shard(update)
+        self.inboxes[index].put(("update", update))
+        UPDATES_ROUTED.labels(worker=str(index)).inc()
+
+    def broadcast(self, kind: str, payload: Any) -> None:
+        """Служебное сообщение всем воркерам (например, сброс кэша раздела каталога)"""
+        for inbox in self.inboxes:
+            inbox.put((kind, payload))
+
+    async def poll(self, bot: Bot, allowed_updates: Optional[List[str]] = None, timeout: int = 30) -> None:
+        """
+        Long polling без разбора обновлений: ответ getUpdates сразу расходится по воркерам
+
+        :param bot: Бот (токен и адрес Bot API)
+        :param allowed_updates: Типы обновлений, которые нужны диспетчеру
+        :param timeout: Таймаут длинного запроса в секундах
+        """
+        url = bot.session.api.api_url(token=bot.token, method="getUpdates")
+        offset = None
+        backoff = 1.0
+        self.logger.info("Polling updates for workers")
+
+        async with aiohttp.ClientSession(trust_env=True) as session:
+            while True:
+                params = {"timeout": timeout, "allowed_updates": allowed_updates or []}
+                if offset is not None:
+                    params["offset"] = offset
+                try:
+                    async with session.post(url, json=params,
+                                            timeout=aiohttp.ClientTimeout(total=timeout + 10)) as response:
+                        payload = await response.json()
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    self.logger.error(f"getUpdates failed: {e}, retrying in {backoff:.0f}s")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30)
+                    continue
+
+                if not payload.get("ok"):
+                    retry_after = (payload.get("parameters") or {}).get("retry_after")
+                    self.logger.error(f"getUpdates error: {payload.get('description')}")
+                    await asyncio.sleep(retry_after or backoff)
+                    backoff = min(backoff * 2, 30)
+                    continue
+
+                backoff = 1.0
+                for update in payload["result"]:
+                    offset = update["update_id"] + 1
+                    self.dispatch(update)